@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+from functools import lru_cache
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    app_name: str = "AI Voice Banking Backend"
+    environment: str = "development"
+
+    redis_url: str = ""
+    # Worker processes per host (uvicorn/gunicorn read the same variable)
+    web_concurrency: int = 1
+    mongodb_uri: str = "mongodb://localhost:27017"
+    mongodb_db_name: str = "ai_voice_banking"
+
+    openai_api_key: str = ""
+    openai_whisper_model: str = "whisper-1"
+
+    elevenlabs_api_key: str = ""
+    elevenlabs_voice_id: str = ""
+    tts_model_id: str = "eleven_multilingual_v2"
+
+    # TTS audio cache: in-memory LRU (0 disables) + optional disk tier
+    tts_cache_max_bytes: int = 64 * 1024 * 1024
+    tts_cache_dir: str = ".cache/tts"
+    tts_cache_disk_max_bytes: int = 512 * 1024 * 1024
+    tts_prewarm_languages: str = "en"
+    tts_stream_chunk_bytes: int = 16 * 1024
+
+    access_token_ttl_minutes: int = 10
+    refresh_token_ttl_minutes: int = 60
+    voice_similarity_threshold: float = 0.78
+    mfa_required_amount: float = 10000.0
+
+    # Dialogue history: recent turns inline on the session, full records in dialog_turns
+    dialog_trace_max_entries: int = 40
+    dialog_turns_ttl_days: int = 30
+
+    # Rolling daily-limit spend counters: "memory" or "redis" (shared, needs REDIS_URL)
+    spend_tracker_backend: str = "memory"
+    spend_window_hours: int = 24
+
+    # /ws/voice connection limits and liveness
+    ws_max_connections: int = 1000
+    ws_auth_timeout_seconds: float = 10.0
+    ws_heartbeat_seconds: float = 30.0
+    ws_idle_timeout_seconds: float = 300.0
+    ws_turn_queue_size: int = 4
+    # Cross-worker delivery for server pushes: "none" (process-local), "local" (in-process stand-in) or "redis"
+    ws_fanout_backend: str = "none"
+    ws_presence_ttl_seconds: float = 60.0
+    ws_fanout_flush_ms: float = 5.0
+    ws_fanout_max_batch: int = 256
+
+    # Reminders: scheduler look-ahead window and the /reminders/due window
+    reminder_horizon_seconds: int = 600
+    reminder_due_window_minutes: int = 5
+
+    # Write-behind queue for trace/audit/metric writes
+    write_behind_max_batch: int = 500
+    write_behind_flush_ms: int = 200
+    write_behind_max_queue: int = 10000
+
+    # Refresh tokens and OTPs: "memory" (single worker) or "redis" (shared, needs REDIS_URL)
+    token_store_backend: str = "memory"
+    otp_ttl_seconds: int = 300
+
+    # Cache of users documents shared by the auth dependency and services
+    user_cache_ttl_seconds: float = 30.0
+    user_cache_max_entries: int = 10000
+    user_cache_redis: bool = False
+
+    mock_bank_api_base: str = "https://mock-bank.local"
+
+    nlu_api_url: str = ""
+    # "remote" calls NLU_API_URL, "local" runs the zero-shot model in-process
+    nlu_backend: str = "remote"
+    nlu_model_path: str = "facebook/bart-large-mnli"
+    nlu_device: str = "cpu"
+    nlu_batch_max_size: int = 16
+    nlu_batch_max_wait_ms: float = 10.0
+    # "fp32", "int8" or "onnx"; non-fp32 formats load from nlu_artifact_path
+    nlu_model_format: str = "fp32"
+    nlu_artifact_path: str = ""
+    # Tiered cascade: cheap stages answer when confident, otherwise escalate
+    nlu_cascade_stages: str = "rules,embedding,model"
+    nlu_rules_threshold: float = 0.85
+    nlu_embedding_model: str = ""
+    nlu_embedding_threshold: float = 0.75
+
+    # Shared outbound HTTP pools used by the STT / NLU / TTS clients
+    http_max_connections: int = 200
+    http_max_keepalive_connections: int = 50
+    http_keepalive_expiry_seconds: float = 30.0
+    stt_timeout_seconds: float = 30.0
+    nlu_timeout_seconds: float = 10.0
+    tts_timeout_seconds: float = 30.0
+
+    # Streaming STT over /ws/voice
+    stt_partial_interval_bytes: int = 32000
+    # Trailing audio sent with each partial (~5 s of 16 kHz 16-bit mono)
+    stt_partial_window_bytes: int = 160000
+    stt_stream_max_bytes: int = 10 * 1024 * 1024
+    # Largest audio accepted by POST /dialogue/voice-turn (decoded) and /voice-turn/raw
+    voice_turn_max_bytes: int = 10 * 1024 * 1024
+
+    # WAV preprocessing before STT / biometrics
+    audio_preprocess_enabled: bool = True
+    audio_target_sample_rate: int = 16000
+    audio_vad_frame_ms: int = 20
+    audio_vad_relative_db: float = -35.0
+    audio_vad_padding_ms: int = 150
+
+    # Executor for blocking app.ml work: thread pool (NumPy/torch), process pool (pure Python),
+    # per-stage concurrency ("stage=limit,..."), and waiting calls per stage before shedding with 503
+    ml_thread_workers: int = 8
+    ml_process_workers: int = 0
+    ml_stage_concurrency: str = "preprocess=4,speaker=2,nlu_embedding=2"
+    ml_stage_default_concurrency: int = 4
+    ml_stage_max_queue: int = 32
+
+
+@lru_cache
+def get_settings() -> Settings:
+    return Settings()
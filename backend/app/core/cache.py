@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+from app.config import get_settings
+from app.core.redis import get_redis
+from app.db import get_database
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """Size-bounded LRU whose entries also expire ``ttl_seconds`` after being stored."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[K, Tuple[float, V]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: K) -> Optional[V]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: K, value: V) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: K) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class UserCache:
+    """Read-through cache of ``users`` documents keyed by ``user_id``.
+
+    A process-local TTL/LRU tier fronts an optional Redis tier shared by all
+    workers. Anything that mutates a user document must call
+    :meth:`invalidate` so the next read goes back to Mongo; with Redis the
+    local TTL bounds how long another worker may serve a stale copy.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, use_redis: bool = False) -> None:
+        self.local: TTLCache[str, Dict] = TTLCache(max_entries, ttl_seconds)
+        self.ttl_seconds = ttl_seconds
+        self.use_redis = use_redis
+        self.redis_hits = 0
+        self.loads = 0
+
+    async def get_user(
+        self, user_id: str, loader: Optional[Callable[[str], Awaitable[Optional[Dict]]]] = None
+    ) -> Optional[Dict]:
+        user = self.local.get(user_id)
+        if user is not None:
+            return dict(user)
+
+        redis = get_redis() if self.use_redis else None
+        if redis is not None:
+            raw = await redis.get(_redis_key(user_id))
+            if raw is not None:
+                user = json.loads(raw)
+                self.redis_hits += 1
+                self.local.set(user_id, user)
+                return dict(user)
+
+        self.loads += 1
+        user = await (loader or _load_user)(user_id)
+        if user is None:
+            return None
+        user = _cacheable(user)
+        self.local.set(user_id, user)
+        if redis is not None:
+            await redis.set(_redis_key(user_id), json.dumps(user, default=str), ex=int(self.ttl_seconds) or 1)
+        return dict(user)
+
+    async def invalidate(self, user_id: str) -> None:
+        self.local.pop(user_id)
+        redis = get_redis() if self.use_redis else None
+        if redis is not None:
+            await redis.delete(_redis_key(user_id))
+
+    async def invalidate_all(self) -> None:
+        self.local.clear()
+        redis = get_redis() if self.use_redis else None
+        if redis is not None:
+            async for key in redis.scan_iter(match=_redis_key("*")):
+                await redis.delete(key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self.local),
+            "local_hits": self.local.hits,
+            "local_misses": self.local.misses,
+            "redis_hits": self.redis_hits,
+            "mongo_loads": self.loads,
+        }
+
+
+def _redis_key(user_id: str) -> str:
+    return f"user:{user_id}"
+
+
+def _cacheable(user: Dict) -> Dict:
+    # Mongo's ObjectId is neither JSON-serialisable nor used by callers.
+    return {key: value for key, value in user.items() if key != "_id"}
+
+
+async def _load_user(user_id: str) -> Optional[Dict]:
+    database = await get_database()
+    return await database.users.find_one({"user_id": user_id})
+
+
+_user_cache: Optional[UserCache] = None
+
+
+def get_user_cache() -> UserCache:
+    global _user_cache
+    if _user_cache is None:
+        settings = get_settings()
+        _user_cache = UserCache(
+            max_entries=settings.user_cache_max_entries,
+            ttl_seconds=settings.user_cache_ttl_seconds,
+            use_redis=settings.user_cache_redis,
+        )
+    return _user_cache
@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from typing import Optional
+
+from redis.asyncio import Redis
+
+from app.config import get_settings
+
+_client: Optional[Redis] = None
+
+
+def get_redis() -> Optional[Redis]:
+    """Shared asyncio Redis client, or ``None`` when ``REDIS_URL`` is not configured."""
+    global _client
+    settings = get_settings()
+    if not settings.redis_url:
+        return None
+    if _client is None:
+        _client = Redis.from_url(settings.redis_url, decode_responses=False)
+    return _client
+
+
+async def close_redis() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -1,27 +1,43 @@
 from __future__ import annotations
 
+import hashlib
 import secrets
 import string
 from datetime import datetime, timedelta, timezone
-from typing import Dict, Tuple
+from typing import Dict, Optional, Tuple
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt
 
 from app.config import get_settings
-from app.db import get_database
+from app.core.cache import get_user_cache
+from app.core.store import ExpiringStore, get_expiring_store
 
 ALGORITHM = "HS256"
+# Values of a users document's ``role`` that may call staff-only endpoints.
+STAFF_ROLES = ("staff", "admin")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
 
 class TokenStore:
-    def __init__(self, secret_key: str) -> None:
+    """Issues JWTs and keeps refresh tokens and OTPs in an :class:`ExpiringStore`.
+
+    Only a hash of each refresh token is stored, with the token's own TTL, so
+    the backend never grows past the set of live credentials.
+    """
+
+    def __init__(self, secret_key: str, store: Optional[ExpiringStore] = None) -> None:
         self.secret_key = secret_key
-        self.refresh_tokens: Dict[str, datetime] = {}
+        self._store = store
+
+    @property
+    def store(self) -> ExpiringStore:
+        if self._store is None:
+            self._store = get_expiring_store()
+        return self._store
 
-    def generate_tokens(self, user_id: str) -> Tuple[str, str]:
+    async def generate_tokens(self, user_id: str) -> Tuple[str, str]:
         settings = get_settings()
         now = datetime.now(timezone.utc)
         payload = {"sub": user_id, "exp": now + timedelta(minutes=settings.access_token_ttl_minutes)}
@@ -31,27 +47,62 @@ class TokenStore:
             "sub": user_id,
             "type": "refresh",
             "exp": now + timedelta(minutes=settings.refresh_token_ttl_minutes),
+            "jti": secrets.token_hex(8),
         }
         refresh_token = jwt.encode(refresh_payload, self.secret_key, algorithm=ALGORITHM)
-        self.refresh_tokens[refresh_token] = refresh_payload["exp"]
+        await self.store.set(
+            _refresh_key(refresh_token), user_id, settings.refresh_token_ttl_minutes * 60
+        )
         return access_token, refresh_token
 
-    def verify_refresh_token(self, token: str) -> str:
-        if token not in self.refresh_tokens:
-            raise ValueError("Unknown refresh token")
+    async def verify_refresh_token(self, token: str) -> str:
+        user_id = await self.store.get(_refresh_key(token))
+        if user_id is None:
+            raise ValueError("Unknown or expired refresh token")
         try:
             payload = jwt.decode(token, self.secret_key, algorithms=[ALGORITHM])
         except Exception as exc:  # pylint: disable=broad-except
             raise ValueError("Invalid refresh token") from exc
-        if datetime.now(timezone.utc) > self.refresh_tokens[token]:
-            raise ValueError("Refresh token expired")
         return payload["sub"]
 
+    async def revoke_refresh_token(self, token: str) -> None:
+        await self.store.delete(_refresh_key(token))
+
+    async def issue_otp(self, user_id: str) -> str:
+        otp = generate_otp()
+        await self.store.set(_otp_key(user_id), otp, get_settings().otp_ttl_seconds)
+        return otp
+
+    async def check_otp(self, user_id: str, otp: str) -> bool:
+        """Non-consuming check, for a step that is followed by :meth:`consume_otp`."""
+        return bool(otp) and await self.store.get(_otp_key(user_id)) == otp
+
+    async def consume_otp(self, user_id: str, otp: str) -> bool:
+        """Atomically redeem ``otp``; a second call with the same code fails."""
+        if not otp:
+            return False
+        return await self.store.compare_and_delete(_otp_key(user_id), otp)
+
+
+def _refresh_key(token: str) -> str:
+    return "refresh:" + hashlib.sha256(token.encode()).hexdigest()
+
+
+def _otp_key(user_id: str) -> str:
+    return f"otp:{user_id}"
+
 
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> Dict:
     return await get_user_from_token(token)
 
 
+async def get_current_staff_user(user: Dict = Depends(get_current_user)) -> Dict:
+    """Current user, provided their ``role`` is one of :data:`STAFF_ROLES`."""
+    if user.get("role") not in STAFF_ROLES:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Staff access required")
+    return user
+
+
 async def get_current_user_with_voice_verify(
     token: str = Depends(oauth2_scheme),
     audio_base64: str | None = None
@@ -61,8 +112,9 @@ async def get_current_user_with_voice_verify(
     
     # If voice verification is provided, verify it
     if audio_base64:
+        from app.ml import AudioPayload
         from app.services import auth as auth_service
-        voice_result = await auth_service.verify_voice(user["user_id"], audio_base64, None)
+        voice_result = await auth_service.verify_voice(user["user_id"], AudioPayload.from_base64(audio_base64), None)
         if not voice_result.get("success"):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -72,22 +124,31 @@ async def get_current_user_with_voice_verify(
     return user
 
 
-async def get_user_from_token(token: str) -> Dict:
+def decode_access_token(token: str) -> Dict:
+    """Validate an access token and return its claims (``sub``, ``exp``)."""
     if not token:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing access token")
     try:
         payload = jwt.decode(token, token_store.secret_key, algorithms=[ALGORITHM])
-        user_id = payload.get("sub")
     except Exception as exc:  # pylint: disable=broad-except
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid access token") from exc
-    if not user_id:
+    if not payload.get("sub"):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid access token")
+    return payload
+
 
-    database = await get_database()
-    user = await database.users.find_one({"user_id": user_id})
+async def get_user_from_token(token: str) -> Dict:
+    user, _ = await authenticate_token(token)
+    return user
+
+
+async def authenticate_token(token: str) -> Tuple[Dict, Dict]:
+    """Resolve an access token to ``(user, claims)``."""
+    claims = decode_access_token(token)
+    user = await get_user_cache().get_user(claims["sub"])
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
-    return user
+    return user, claims
 
 
 def generate_otp(length: int = 6) -> str:
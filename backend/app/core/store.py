@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import heapq
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.config import get_settings
+from app.core.redis import get_redis
+
+
+class ExpiringStore:
+    """Small key/value store whose entries disappear after a TTL.
+
+    Holds short-lived credentials (refresh tokens, OTPs). ``compare_and_delete``
+    is the single-use primitive: it only removes the key when it still holds
+    the expected value, and reports whether it did, in one atomic step.
+    """
+
+    async def set(self, key: str, value: str, ttl_seconds: float) -> None:
+        raise NotImplementedError
+
+    async def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    async def compare_and_delete(self, key: str, expected: str) -> bool:
+        raise NotImplementedError
+
+
+class MemoryExpiringStore(ExpiringStore):
+    """Process-local backend: a dict plus a min-heap of expiry times.
+
+    Expired entries are evicted from the front of the heap on every access,
+    so memory stays proportional to the live entries. Heap entries left
+    behind by overwrites or deletes are skipped when they surface. Only
+    suitable for a single worker.
+    """
+
+    def __init__(self) -> None:
+        self._values: Dict[str, Tuple[float, str]] = {}
+        self._expiry: List[Tuple[float, str]] = []
+
+    def __len__(self) -> int:
+        self._evict()
+        return len(self._values)
+
+    async def set(self, key: str, value: str, ttl_seconds: float) -> None:
+        self._evict()
+        expires_at = time.monotonic() + ttl_seconds
+        self._values[key] = (expires_at, value)
+        heapq.heappush(self._expiry, (expires_at, key))
+
+    async def get(self, key: str) -> Optional[str]:
+        self._evict()
+        entry = self._values.get(key)
+        return entry[1] if entry else None
+
+    async def delete(self, key: str) -> None:
+        self._values.pop(key, None)
+
+    async def compare_and_delete(self, key: str, expected: str) -> bool:
+        # No await between the read and the delete, so this is atomic on the event loop.
+        self._evict()
+        entry = self._values.get(key)
+        if entry is None or entry[1] != expected:
+            return False
+        del self._values[key]
+        return True
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, key = heapq.heappop(self._expiry)
+            entry = self._values.get(key)
+            if entry is not None and entry[0] == expires_at:
+                del self._values[key]
+
+
+# GET + DEL in one server-side step so two workers cannot both redeem the same value.
+_COMPARE_AND_DELETE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisExpiringStore(ExpiringStore):
+    """Shared backend for multi-worker deployments; expiry is Redis' native key TTL."""
+
+    def __init__(self, prefix: str = "auth:") -> None:
+        self.prefix = prefix
+        self._compare_and_delete = None
+
+    async def set(self, key: str, value: str, ttl_seconds: float) -> None:
+        await self._redis().set(self.prefix + key, value, px=max(1, int(ttl_seconds * 1000)))
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self._redis().get(self.prefix + key)
+        return value.decode() if isinstance(value, bytes) else value
+
+    async def delete(self, key: str) -> None:
+        await self._redis().delete(self.prefix + key)
+
+    async def compare_and_delete(self, key: str, expected: str) -> bool:
+        if self._compare_and_delete is None:
+            self._compare_and_delete = self._redis().register_script(_COMPARE_AND_DELETE)
+        deleted = await self._compare_and_delete(keys=[self.prefix + key], args=[expected])
+        return bool(deleted)
+
+    def _redis(self):
+        client = get_redis()
+        if client is None:
+            raise RuntimeError("TOKEN_STORE_BACKEND=redis requires REDIS_URL")
+        return client
+
+
+_store: Optional[ExpiringStore] = None
+
+
+def get_expiring_store() -> ExpiringStore:
+    global _store
+    if _store is None:
+        backend = get_settings().token_store_backend
+        _store = RedisExpiringStore() if backend == "redis" else MemoryExpiringStore()
+    return _store
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, List, Optional
 
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
 
 from app.config import get_settings
 
@@ -18,6 +20,78 @@ async def get_database() -> AsyncIOMotorDatabase:
     return _client[settings.mongodb_db_name]
 
 
+def index_registry() -> Dict[str, List[IndexModel]]:
+    """Every index the services rely on, per collection.
+
+    Applied idempotently by :func:`ensure_indexes`; ``python -m app.explain``
+    checks that each service query is actually served by one of them.
+    """
+    settings = get_settings()
+    return {
+        "users": [
+            IndexModel("user_id", unique=True, name="user_id_unique"),
+            IndexModel("username", unique=True, name="username_unique"),
+        ],
+        "sessions": [
+            IndexModel("user_id", unique=True, name="user_id_unique"),
+        ],
+        "transactions": [
+            # Keyset pagination on (created_at, txn_id), newest first.
+            IndexModel(
+                [("user_id", ASCENDING), ("created_at", DESCENDING), ("txn_id", DESCENDING)],
+                name="user_created_at_txn",
+            ),
+            IndexModel("txn_id", unique=True, name="txn_id_unique"),
+            # Spend tracker rebuild scans the last day across all users.
+            IndexModel("created_at", name="created_at"),
+            # One transaction per client idempotency key (confirm_transfer replays).
+            IndexModel(
+                [("user_id", ASCENDING), ("idempotency_key", ASCENDING)],
+                unique=True,
+                partialFilterExpression={"idempotency_key": {"$type": "string"}},
+                name="user_idempotency_key",
+            ),
+        ],
+        "loans": [
+            IndexModel("user_id", name="user_id"),
+        ],
+        "reminders": [
+            IndexModel([("user_id", ASCENDING), ("next_run", ASCENDING)], name="user_next_run"),
+            IndexModel([("user_id", ASCENDING), ("reminder_id", ASCENDING)], name="user_reminder"),
+            # Scheduler window query across all users.
+            IndexModel("next_run", name="next_run"),
+        ],
+        "dialog_turns": [
+            # These two predate the registry and were created under Mongo's
+            # default names; renaming them would fail with IndexOptionsConflict.
+            # Keyset pagination for the session history reader, newest first.
+            IndexModel([("user_id", ASCENDING), ("_id", DESCENDING)], name="user_id_1__id_-1"),
+            IndexModel(
+                "created_at",
+                expireAfterSeconds=settings.dialog_turns_ttl_days * 86400,
+                name="created_at_1",
+            ),
+        ],
+        "audit_log": [
+            IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_created_at"),
+        ],
+        "turn_metrics": [
+            # Target of the per-minute counter upserts.
+            IndexModel([("minute", ASCENDING), ("intent", ASCENDING)], unique=True, name="minute_intent"),
+        ],
+    }
+
+
+async def ensure_indexes() -> None:
+    """Create any missing registry index. A failure (e.g. duplicates blocking a unique index) is logged, not fatal."""
+    db = await get_database()
+    for collection, indexes in index_registry().items():
+        try:
+            await db[collection].create_indexes(indexes)
+        except OperationFailure as exc:
+            print(f"[DB] Index creation on {collection} failed: {exc}")
+
+
 async def seed_database() -> None:
     db = await get_database()
 
@@ -34,6 +108,9 @@ async def seed_database() -> None:
                 "daily_limit": 50000.0,
             }
         )
+        from app.core.cache import get_user_cache
+
+        await get_user_cache().invalidate("user_001")
 
     if await db.transactions.count_documents({"txn_id": "txn_001"}) == 0:
         await db.transactions.insert_one(
@@ -0,0 +1,130 @@
+"""Run ``explain()`` on every service query and flag collection scans.
+
+Usage (from ``backend/``)::
+
+    python -m app.explain            # apply the index registry first, then explain
+    python -m app.explain --no-create
+
+Exits non-zero when any query's winning plan contains a ``COLLSCAN``. In-memory
+``SORT`` stages are reported as warnings.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.db import ensure_indexes, get_database
+
+_USER = "user_001"
+
+# (name, collection, filter, sort) for each read path in app/services and app/core.
+# Writes are listed by the filter they match on.
+QUERY_SHAPES: List[Tuple[str, str, Dict, Optional[Sequence[Tuple[str, int]]]]] = [
+    ("users by user_id", "users", {"user_id": _USER}, None),
+    ("users by username (login)", "users", {"username": "demo_user"}, None),
+    ("sessions by user_id", "sessions", {"user_id": _USER}, None),
+    (
+        "transaction history",
+        "transactions",
+        {"user_id": _USER, "status": {"$ne": "PENDING"}},
+        [("created_at", -1), ("txn_id", -1)],
+    ),
+    (
+        "transaction history page",
+        "transactions",
+        {
+            "user_id": _USER,
+            "status": {"$ne": "PENDING"},
+            "$or": [
+                {"created_at": {"$lt": datetime(2024, 1, 1)}},
+                {"created_at": datetime(2024, 1, 1), "txn_id": {"$lt": "txn_001"}},
+            ],
+        },
+        [("created_at", -1), ("txn_id", -1)],
+    ),
+    (
+        "transfer claim",
+        "sessions",
+        {"user_id": _USER, "transfer_session.session_id": "transfer_x"},
+        None,
+    ),
+    ("transfer replay lookup", "transactions", {"user_id": _USER, "idempotency_key": "transfer_x"}, None),
+    ("loans by user", "loans", {"user_id": _USER}, None),
+    ("reminders by user", "reminders", {"user_id": _USER}, [("next_run", 1)]),
+    (
+        "due reminders",
+        "reminders",
+        {"user_id": _USER, "next_run": {"$gte": datetime(2024, 1, 1), "$lte": datetime(2024, 1, 1, 0, 5)}},
+        [("next_run", 1)],
+    ),
+    (
+        "scheduler window",
+        "reminders",
+        {"next_run": {"$gte": datetime(2024, 1, 1), "$lte": datetime(2024, 1, 1, 0, 10)}, "notified_at": None},
+        [("next_run", 1)],
+    ),
+    ("reminder delete", "reminders", {"user_id": _USER, "reminder_id": "rem_0"}, None),
+    ("dialogue turns page", "dialog_turns", {"user_id": _USER}, [("_id", -1)]),
+    ("turn metrics upsert", "turn_metrics", {"minute": datetime(2024, 1, 1), "intent": "balance"}, None),
+]
+
+
+def _stages(plan: Dict) -> Iterator[str]:
+    if not isinstance(plan, dict):
+        return
+    if "stage" in plan:
+        yield plan["stage"]
+    for key in ("inputStage", "queryPlan", "innerStage", "outerStage"):
+        if key in plan:
+            yield from _stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _stages(child)
+
+
+async def explain_queries() -> List[Dict]:
+    database = await get_database()
+    report = []
+    for name, collection, query, sort in QUERY_SHAPES:
+        cursor = database[collection].find(query).limit(20)
+        if sort:
+            cursor = cursor.sort(list(sort))
+        plan = await cursor.explain()
+        stages = list(_stages(plan.get("queryPlanner", {}).get("winningPlan", {})))
+        report.append(
+            {
+                "query": name,
+                "collection": collection,
+                "stages": stages,
+                "collscan": "COLLSCAN" in stages,
+                "in_memory_sort": "SORT" in stages,
+            }
+        )
+    return report
+
+
+async def _run(create: bool) -> int:
+    if create:
+        await ensure_indexes()
+    report = await explain_queries()
+    for entry in report:
+        flag = "COLLSCAN" if entry["collscan"] else ("SORT" if entry["in_memory_sort"] else "ok")
+        print(f"{flag:>8}  {entry['collection']:<14} {entry['query']:<28} {' <- '.join(entry['stages'])}")
+    scans = [entry for entry in report if entry["collscan"]]
+    if scans:
+        print(json.dumps({"collscans": [entry["query"] for entry in scans]}))
+    return 1 if scans else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--no-create", action="store_true", help="do not apply the index registry first")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_run(create=not args.no_create)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,26 @@
 from __future__ import annotations
 
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.config import get_settings
-from app.db import seed_database
+from app.core.redis import close_redis
+from app.db import ensure_indexes, seed_database
+from app.ml.clients import close_clients
+from app.ml.executor import get_ml_executor
+from app.ml.intent_embeddings import start_embedding_classifier
+from app.ml.intent_engine import start_intent_engine, stop_intent_engine
 from app.routers import auth as auth_router
 from app.routers import banking as banking_router
 from app.routers import dialogue as dialogue_router
+from app.routers import metrics as metrics_router
+from app.services import auth as auth_service
+from app.services import dialogue as dialogue_service
+from app.services.reminders import backfill_next_run, get_reminder_scheduler
+from app.services.spend import get_spend_tracker
+from app.services.write_behind import get_write_behind
 from app.ws import voice_socket
 
 
@@ -26,6 +39,7 @@ def create_app() -> FastAPI:
     app.include_router(auth_router.router)
     app.include_router(banking_router.router)
     app.include_router(dialogue_router.router)
+    app.include_router(metrics_router.router)
     app.include_router(voice_socket.router)
 
     @app.get("/health")
@@ -34,7 +48,30 @@ def create_app() -> FastAPI:
 
     @app.on_event("startup")
     async def startup_event() -> None:
+        await ensure_indexes()
         await seed_database()
+        get_write_behind().start()
+        await backfill_next_run()
+        await get_spend_tracker().rebuild()
+        await voice_socket.manager.start()
+        get_reminder_scheduler().start(voice_socket.manager.send)
+        await get_ml_executor().start()
+        await auth_service.load_speaker_indexes()
+        await asyncio.to_thread(start_intent_engine)
+        await asyncio.to_thread(start_embedding_classifier)
+        if settings.elevenlabs_api_key and settings.tts_cache_max_bytes > 0:
+            languages = tuple(lang.strip() for lang in settings.tts_prewarm_languages.split(",") if lang.strip())
+            app.state.tts_prewarm = asyncio.create_task(dialogue_service.prewarm_tts_cache(languages))
+
+    @app.on_event("shutdown")
+    async def shutdown_event() -> None:
+        await get_reminder_scheduler().stop()
+        await voice_socket.manager.stop()
+        await get_write_behind().stop()
+        await close_clients()
+        await close_redis()
+        await asyncio.to_thread(stop_intent_engine)
+        get_ml_executor().shutdown()
 
     return app
 
@@ -1,12 +1,32 @@
-from .stt import transcribe_audio
-from .nlu import infer_intent
-from .tts import synthesize_speech
-from .biometrics import extract_embedding, compare_embeddings
+from .audio import AudioPayload, as_audio_payload
+from .preprocess import prepare_audio, preprocess_audio
+from .stt import StreamingTranscription, transcribe_audio, transcribe_bytes
+from .nlu import get_cascade_stats, infer_intent
+from .tts import split_sentences, stream_speech, synthesize_speech
+from .biometrics import (
+    UnsupportedAudioError,
+    compare_embeddings,
+    extract_embedding,
+    extract_embedding_vector,
+    score_embeddings,
+)
 
 __all__ = [
+    "AudioPayload",
+    "as_audio_payload",
+    "prepare_audio",
+    "preprocess_audio",
     "transcribe_audio",
+    "transcribe_bytes",
+    "StreamingTranscription",
     "infer_intent",
+    "get_cascade_stats",
     "synthesize_speech",
+    "stream_speech",
+    "split_sentences",
     "extract_embedding",
     "compare_embeddings",
+    "extract_embedding_vector",
+    "score_embeddings",
+    "UnsupportedAudioError",
 ]
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import base64
+from typing import Union
+
+
+class AudioPayload:
+    """Audio bytes decoded once per request and shared by STT, biometrics and validation.
+
+    Construct it at the edge (router / websocket) with :meth:`from_base64`
+    and pass the same object down through ``app.services`` and ``app.ml``;
+    helpers read ``data`` (or the zero-copy ``view``) instead of decoding the
+    base64 string again.
+    """
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data: bytes) -> None:
+        self._data = bytes(data)
+
+    @classmethod
+    def from_base64(cls, audio_base64: str) -> "AudioPayload":
+        return cls(base64.b64decode(audio_base64, validate=True))
+
+    @property
+    def data(self) -> bytes:
+        return self._data
+
+    @property
+    def view(self) -> memoryview:
+        return memoryview(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __bool__(self) -> bool:
+        return bool(self._data)
+
+
+AudioInput = Union[AudioPayload, str, bytes]
+
+
+def as_audio_payload(audio: AudioInput) -> AudioPayload:
+    """Accept an existing payload, raw bytes or a base64 string (decoded here, once)."""
+    if isinstance(audio, AudioPayload):
+        return audio
+    if isinstance(audio, (bytes, bytearray, memoryview)):
+        return AudioPayload(audio)
+    return AudioPayload.from_base64(audio)
@@ -1,24 +1,149 @@
 from __future__ import annotations
 
-import base64
-import hashlib
-from typing import List
+from functools import lru_cache
+from typing import List, Sequence, Union
 
+import numpy as np
 
-def extract_embedding(audio_base64: str) -> List[float]:
-    decoded = base64.b64decode(audio_base64.encode(), validate=True)
-    digest = hashlib.sha256(decoded).digest()
-    # Convert digest to float vector
-    return [int(b) / 255 for b in digest[:16]]
+from app.ml.audio import AudioInput, as_audio_payload
+from app.ml.preprocess import parse_wav, resample
 
+SAMPLE_RATE = 16000
+FRAME_LENGTH = 400  # 25 ms
+FRAME_HOP = 160  # 10 ms
+N_FFT = 512
+N_MELS = 40
+N_MFCC = 20
+PRE_EMPHASIS = 0.97
+# Frames more than this many dB below the loudest frame are treated as non-speech.
+ENERGY_FLOOR_DB = 30.0
 
-def compare_embeddings(emb_a: List[float], emb_b: List[float]) -> float:
-    if not emb_a or not emb_b:
+# mean + std of MFCC c1..c19, std of their deltas, and the mean log-mel envelope
+EMBEDDING_DIM = (N_MFCC - 1) * 3 + N_MELS
+
+EmbeddingLike = Union[Sequence[float], np.ndarray]
+
+
+class UnsupportedAudioError(ValueError):
+    """The upload is not decodable PCM, so no voiceprint can be taken from it."""
+
+
+def extract_embedding(audio: AudioInput) -> List[float]:
+    """Speaker embedding as a plain list so it can be stored on the user document."""
+    return extract_embedding_vector(audio).tolist()
+
+
+def extract_embedding_vector(audio: AudioInput) -> np.ndarray:
+    """Fixed-length float32 speaker vector from log-mel / MFCC statistics.
+
+    Speech frames (by energy) are described with 19 MFCCs; their mean and
+    standard deviation, the deviation of their deltas, and the mean log-mel
+    envelope are each centred and concatenated, then L2-normalised so that
+    cosine similarity is a plain dot product. Raises
+    :class:`UnsupportedAudioError` for anything but a PCM/float WAV.
+    """
+    signal = _load_signal(as_audio_payload(audio).view)
+    mfcc, log_mel = _mfcc(signal)
+    deltas = np.diff(mfcc, axis=0) if mfcc.shape[0] > 1 else np.zeros_like(mfcc)
+    blocks = [
+        mfcc.mean(axis=0),
+        mfcc.std(axis=0),
+        deltas.std(axis=0),
+        log_mel.mean(axis=0),
+    ]
+    vector = np.concatenate([block - block.mean() for block in blocks]).astype(np.float32)
+    return _normalize(vector)
+
+
+def compare_embeddings(emb_a: EmbeddingLike, emb_b: EmbeddingLike) -> float:
+    if emb_a is None or emb_b is None or len(emb_a) == 0 or len(emb_b) == 0:
         return 0.0
-    numerator = sum(a * b for a, b in zip(emb_a, emb_b))
-    denom_a = sum(a * a for a in emb_a) ** 0.5
-    denom_b = sum(b * b for b in emb_b) ** 0.5
-    if denom_a == 0 or denom_b == 0:
+    a = np.asarray(emb_a, dtype=np.float32)
+    b = np.asarray(emb_b, dtype=np.float32)
+    if a.shape != b.shape:
+        # Profiles enrolled with an older extractor are not comparable.
         return 0.0
-    return numerator / (denom_a * denom_b)
+    return float(score_embeddings(a, b[np.newaxis, :])[0])
+
+
+def score_embeddings(probe: EmbeddingLike, enrolled: np.ndarray) -> np.ndarray:
+    """Cosine similarity of one probe against N enrolled vectors (shape (N, D)) in one matmul."""
+    probe_vec = _normalize(np.asarray(probe, dtype=np.float32))
+    matrix = np.asarray(enrolled, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[np.newaxis, :]
+    norms = np.linalg.norm(matrix, axis=1)
+    norms[norms == 0] = 1.0
+    return (matrix @ probe_vec) / norms
+
+
+def _load_signal(data: memoryview) -> np.ndarray:
+    parsed = parse_wav(data)
+    if parsed is None:
+        # Compressed containers (webm/opus from MediaRecorder) cannot be decoded
+        # without a codec, and features of the raw bytes look alike for everyone.
+        raise UnsupportedAudioError("Voice biometrics need PCM or float WAV audio")
+    samples, sample_rate = parsed
+    if samples.shape[0] == 0:
+        raise UnsupportedAudioError("WAV upload contains no audio")
+    mono = samples.mean(axis=1) if samples.shape[1] > 1 else samples[:, 0]
+    return resample(mono, sample_rate, SAMPLE_RATE)
+
+
+def _mfcc(signal: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    if signal.size < FRAME_LENGTH:
+        signal = np.pad(signal, (0, FRAME_LENGTH - signal.size))
+    emphasized = np.append(signal[0], signal[1:] - PRE_EMPHASIS * signal[:-1])
+
+    frame_count = 1 + (emphasized.size - FRAME_LENGTH) // FRAME_HOP
+    frames = np.lib.stride_tricks.sliding_window_view(emphasized, FRAME_LENGTH)[::FRAME_HOP][:frame_count]
+    frames = frames * np.hamming(FRAME_LENGTH).astype(np.float32)
+
+    power = (np.abs(np.fft.rfft(frames, n=N_FFT)) ** 2) / N_FFT
+    mel_energy = power @ _mel_filterbank().T
+    log_mel = np.log(np.maximum(mel_energy, 1e-10))
+
+    frame_energy = log_mel.sum(axis=1)
+    floor = frame_energy.max() - ENERGY_FLOOR_DB * np.log(10) / 10 * N_MELS
+    voiced = frame_energy >= floor
+    if voiced.sum() >= 3:
+        log_mel = log_mel[voiced]
+
+    mfcc = log_mel @ _dct_matrix().T
+    return mfcc[:, 1:], log_mel
+
+
+@lru_cache(maxsize=1)
+def _mel_filterbank() -> np.ndarray:
+    def hz_to_mel(hz):
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+    def mel_to_hz(mel):
+        return 700.0 * (10 ** (mel / 2595.0) - 1.0)
+
+    mel_points = np.linspace(hz_to_mel(80.0), hz_to_mel(7600.0), N_MELS + 2)
+    bins = np.floor((N_FFT + 1) * mel_to_hz(mel_points) / SAMPLE_RATE).astype(int)
+    bank = np.zeros((N_MELS, N_FFT // 2 + 1), dtype=np.float32)
+    for m in range(1, N_MELS + 1):
+        left, centre, right = bins[m - 1], bins[m], bins[m + 1]
+        if centre > left:
+            bank[m - 1, left:centre] = (np.arange(left, centre) - left) / (centre - left)
+        if right > centre:
+            bank[m - 1, centre:right] = (right - np.arange(centre, right)) / (right - centre)
+    return bank
+
+
+@lru_cache(maxsize=1)
+def _dct_matrix() -> np.ndarray:
+    n = np.arange(N_MELS)
+    k = np.arange(N_MFCC)[:, np.newaxis]
+    basis = np.cos(np.pi * k * (2 * n + 1) / (2 * N_MELS)) * np.sqrt(2.0 / N_MELS)
+    basis[0] /= np.sqrt(2.0)
+    return basis.astype(np.float32)
+
 
+def _normalize(vector: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        return vector
+    return vector / norm
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from typing import Dict, Optional
+
+import httpx
+
+from app.config import get_settings
+
+# One long-lived pool per upstream so keep-alive connections (and their TLS
+# sessions) are reused across voice turns instead of re-handshaking per call.
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def get_client(name: str, base_url: Optional[str] = None, timeout: Optional[float] = None) -> httpx.AsyncClient:
+    client = _clients.get(name)
+    if client is None or client.is_closed:
+        settings = get_settings()
+        limits = httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry_seconds,
+        )
+        client = httpx.AsyncClient(
+            base_url=base_url or "",
+            limits=limits,
+            timeout=httpx.Timeout(timeout or 30.0, connect=5.0),
+        )
+        _clients[name] = client
+    return client
+
+
+async def close_clients() -> None:
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.aclose()
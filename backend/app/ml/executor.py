@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException, status
+
+from app.config import get_settings
+
+
+class _Stage:
+    """Concurrency slot pool for one kind of ML work, with queue-time accounting."""
+
+    def __init__(self, name: str, concurrency: int, max_queue: int) -> None:
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.shed = 0
+        self.queue_ms = 0.0
+        self.max_queue_ms = 0.0
+        self.run_ms = 0.0
+
+    def snapshot(self) -> Dict:
+        started = self.completed + self.failed
+        return {
+            "concurrency": self.concurrency,
+            "running": self.running,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "failed": self.failed,
+            "shed": self.shed,
+            "avg_queue_ms": self.queue_ms / started if started else 0.0,
+            "max_queue_ms": self.max_queue_ms,
+            "avg_run_ms": self.run_ms / started if started else 0.0,
+        }
+
+
+class MLExecutor:
+    """Runs blocking ``app.ml`` work off the event loop, per stage.
+
+    GIL-releasing work (NumPy, torch) goes to a thread pool via
+    :meth:`run_in_thread`; pure-Python CPU work goes to a process pool via
+    :meth:`run_in_process` (the thread pool when ``process_workers`` is 0).
+    Each stage admits ``concurrency`` calls at a time and lets at most
+    ``max_queue`` more wait; beyond that the call is shed with a 503 so a burst
+    of heavy turns cannot starve cheap requests on the same worker.
+    """
+
+    def __init__(
+        self,
+        thread_workers: int,
+        process_workers: int,
+        stage_concurrency: Dict[str, int],
+        default_concurrency: int,
+        max_queue: int,
+    ) -> None:
+        self.thread_workers = thread_workers
+        self.process_workers = process_workers
+        self.stage_concurrency = stage_concurrency
+        self.default_concurrency = default_concurrency
+        self.max_queue = max_queue
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self._stages: Dict[str, _Stage] = {}
+
+    async def start(self) -> None:
+        """Create the pools and spawn the worker processes before the first turn needs them."""
+        self._thread_pool()
+        if self.process_workers > 0:
+            loop = asyncio.get_running_loop()
+            pool = self._process_pool()
+            await asyncio.gather(*(loop.run_in_executor(pool, _noop) for _ in range(self.process_workers)))
+
+    def shutdown(self) -> None:
+        if self._threads is not None:
+            self._threads.shutdown(wait=False, cancel_futures=True)
+            self._threads = None
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)
+            self._processes = None
+
+    async def run_in_thread(self, stage: str, fn: Callable[..., Any], *args: Any) -> Any:
+        return await self._run(stage, self._thread_pool(), fn, args)
+
+    async def run_in_process(self, stage: str, fn: Callable[..., Any], *args: Any) -> Any:
+        """``fn`` and its arguments must be picklable (module-level function, plain data)."""
+        pool = self._process_pool() if self.process_workers > 0 else self._thread_pool()
+        return await self._run(stage, pool, fn, args)
+
+    async def _run(self, name: str, pool: Executor, fn: Callable[..., Any], args: tuple) -> Any:
+        stage = self._stage(name)
+        if stage.semaphore.locked() and stage.waiting >= stage.max_queue:
+            stage.shed += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"ML stage '{name}' is overloaded, retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        queued_at = time.perf_counter()
+        stage.waiting += 1
+        try:
+            await stage.semaphore.acquire()
+        finally:
+            stage.waiting -= 1
+        started = time.perf_counter()
+        queue_ms = (started - queued_at) * 1000
+        stage.queue_ms += queue_ms
+        stage.max_queue_ms = max(stage.max_queue_ms, queue_ms)
+        stage.running += 1
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+        except BaseException:
+            stage.failed += 1
+            raise
+        else:
+            stage.completed += 1
+            return result
+        finally:
+            stage.running -= 1
+            stage.run_ms += (time.perf_counter() - started) * 1000
+            stage.semaphore.release()
+
+    def _stage(self, name: str) -> _Stage:
+        stage = self._stages.get(name)
+        if stage is None:
+            concurrency = self.stage_concurrency.get(name, self.default_concurrency)
+            stage = self._stages[name] = _Stage(name, max(1, concurrency), self.max_queue)
+        return stage
+
+    def _thread_pool(self) -> ThreadPoolExecutor:
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(max_workers=self.thread_workers, thread_name_prefix="ml")
+        return self._threads
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        if self._processes is None:
+            # spawn, not fork: the parent already runs an event loop and model threads.
+            self._processes = ProcessPoolExecutor(
+                max_workers=self.process_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._processes
+
+    def stats(self) -> Dict:
+        return {
+            "thread_workers": self.thread_workers,
+            "process_workers": self.process_workers,
+            "stages": {name: stage.snapshot() for name, stage in self._stages.items()},
+        }
+
+
+def _noop() -> None:
+    return None
+
+
+def _parse_concurrency(value: str) -> Dict[str, int]:
+    limits = {}
+    for item in value.split(","):
+        name, _, limit = item.partition("=")
+        if name.strip() and limit.strip():
+            limits[name.strip()] = int(limit)
+    return limits
+
+
+_executor: Optional[MLExecutor] = None
+
+
+def get_ml_executor() -> MLExecutor:
+    global _executor
+    if _executor is None:
+        settings = get_settings()
+        _executor = MLExecutor(
+            thread_workers=settings.ml_thread_workers,
+            process_workers=settings.ml_process_workers,
+            stage_concurrency=_parse_concurrency(settings.ml_stage_concurrency),
+            default_concurrency=settings.ml_stage_default_concurrency,
+            max_queue=settings.ml_stage_max_queue,
+        )
+    return _executor
+
+
+async def run_in_thread(stage: str, fn: Callable[..., Any], *args: Any) -> Any:
+    return await get_ml_executor().run_in_thread(stage, fn, *args)
+
+
+async def run_in_process(stage: str, fn: Callable[..., Any], *args: Any) -> Any:
+    return await get_ml_executor().run_in_process(stage, fn, *args)
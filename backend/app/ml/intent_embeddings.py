@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import threading
+from typing import Dict, List, Optional
+
+from app.config import get_settings
+
+# A handful of exemplars per intent; centroids are the mean of their embeddings.
+INTENT_EXEMPLARS: Dict[str, List[str]] = {
+    "transfer": [
+        "transfer money to my friend",
+        "send five thousand rupees to Rajesh",
+        "pay Alice two thousand",
+        "I want to make a payment",
+        "move money to another account",
+    ],
+    "balance": [
+        "check my balance",
+        "how much money do I have",
+        "what is my account balance",
+        "show my available funds",
+    ],
+    "history": [
+        "show my recent transactions",
+        "what did I spend last week",
+        "list my past payments",
+        "open my transaction history",
+    ],
+    "loan": [
+        "show my loan details",
+        "when is my next EMI due",
+        "what is the interest rate on my loan",
+        "how much loan is outstanding",
+    ],
+    "reminder": [
+        "remind me to pay my bill",
+        "set an alert for rent",
+        "create a payment reminder",
+        "notify me before my credit card is due",
+    ],
+}
+
+
+class NearestCentroidClassifier:
+    """Small sentence-embedding intent classifier.
+
+    Utterances are mean-pooled through a compact encoder (MiniLM by default),
+    L2-normalised and compared to one centroid per intent. Scores are a
+    temperature-scaled softmax over the cosine similarities, so they can be
+    thresholded the same way as the zero-shot model scores.
+    """
+
+    def __init__(self, model_path: str, temperature: float = 20.0, device: str = "cpu") -> None:
+        self.model_path = model_path
+        self.temperature = temperature
+        self.device = device
+        self._tokenizer = None
+        self._model = None
+        self._labels: List[str] = []
+        self._centroids = None
+        # Tokenizers are not safe to share across concurrent threads.
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._centroids is not None
+
+    def load(self, exemplars: Dict[str, List[str]] = INTENT_EXEMPLARS) -> None:
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        self._tokenizer = AutoTokenizer.from_pretrained(self.model_path)
+        model = AutoModel.from_pretrained(self.model_path)
+        model.to(self.device)
+        model.eval()
+        self._model = model
+
+        self._labels = list(exemplars)
+        centroids = []
+        for label in self._labels:
+            vectors = self._embed(exemplars[label])
+            centroids.append(torch.nn.functional.normalize(vectors.mean(dim=0), dim=0))
+        self._centroids = torch.stack(centroids)
+
+    def classify(self, text: str) -> Dict:
+        import torch
+
+        with self._lock:
+            vector = self._embed([text])[0]
+        similarities = self._centroids @ vector
+        scores = torch.softmax(similarities * self.temperature, dim=0).tolist()
+        ranked = sorted(zip(self._labels, scores), key=lambda pair: pair[1], reverse=True)
+        return {
+            "sequence": text,
+            "labels": [label for label, _ in ranked],
+            "scores": [score for _, score in ranked],
+        }
+
+    def _embed(self, texts: List[str]):
+        import torch
+
+        encoded = self._tokenizer(texts, padding=True, truncation=True, return_tensors="pt").to(self.device)
+        with torch.inference_mode():
+            hidden = self._model(**encoded).last_hidden_state
+        mask = encoded["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+        pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+        return torch.nn.functional.normalize(pooled, dim=1)
+
+
+_classifier: Optional[NearestCentroidClassifier] = None
+
+
+def get_embedding_classifier() -> Optional[NearestCentroidClassifier]:
+    return _classifier
+
+
+def start_embedding_classifier() -> Optional[NearestCentroidClassifier]:
+    """Load the stage-2 classifier when ``nlu_embedding_model`` is configured."""
+    global _classifier
+    settings = get_settings()
+    if not settings.nlu_embedding_model or "embedding" not in settings.nlu_cascade_stages:
+        return None
+    if _classifier is None:
+        _classifier = NearestCentroidClassifier(settings.nlu_embedding_model, device=settings.nlu_device)
+        _classifier.load()
+    return _classifier
@@ -0,0 +1,315 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+from app.config import get_settings
+
+_HYPOTHESIS_TEMPLATE = "This example is {}."
+
+MODEL_FORMATS = ("fp32", "int8", "onnx")
+INT8_WEIGHTS_FILE = "model_int8.pt"
+ONNX_GRAPH_FILE = "model.onnx"
+
+
+class TorchNLIRunner:
+    """Scores premise/hypothesis pairs with a torch sequence-classification model."""
+
+    def __init__(self, model, tokenizer, device: str = "cpu", model_format: str = "fp32") -> None:
+        self.model = model
+        self.tokenizer = tokenizer
+        self.device = device
+        self.model_format = model_format
+        self.entailment_id = _entailment_index(model.config.label2id)
+
+    def entailment_logits(self, premises: List[str], hypotheses: List[str]) -> List[float]:
+        import torch
+
+        encoded = self.tokenizer(
+            premises,
+            hypotheses,
+            padding=True,
+            truncation="only_first",
+            return_tensors="pt",
+        ).to(self.device)
+        with torch.inference_mode():
+            logits = self.model(**encoded).logits
+        return logits[:, self.entailment_id].tolist()
+
+
+class OnnxNLIRunner:
+    """Scores premise/hypothesis pairs with an exported ONNX graph via onnxruntime."""
+
+    model_format = "onnx"
+
+    def __init__(self, session, tokenizer, entailment_id: int) -> None:
+        self.session = session
+        self.tokenizer = tokenizer
+        self.entailment_id = entailment_id
+        self._input_names = {node.name for node in session.get_inputs()}
+
+    def entailment_logits(self, premises: List[str], hypotheses: List[str]) -> List[float]:
+        encoded = self.tokenizer(
+            premises,
+            hypotheses,
+            padding=True,
+            truncation="only_first",
+            return_tensors="np",
+        )
+        feeds = {name: value for name, value in encoded.items() if name in self._input_names}
+        (logits,) = self.session.run(["logits"], feeds)
+        return logits[:, self.entailment_id].tolist()
+
+
+def load_runner(
+    model_path: str,
+    model_format: str = "fp32",
+    artifact_path: str = "",
+    device: str = "cpu",
+    require_artifact: bool = False,
+):
+    """Load the NLI runner for ``model_format``.
+
+    ``int8`` and ``onnx`` read the artifact written by ``app.ml.nlu_export``
+    from ``artifact_path``; when it is missing the full fp32 model is used,
+    or ``FileNotFoundError`` is raised with ``require_artifact``.
+    """
+    if model_format not in MODEL_FORMATS:
+        raise ValueError(f"Unknown NLU model format: {model_format}")
+
+    from transformers import AutoConfig, AutoModelForSequenceClassification, AutoTokenizer
+
+    if model_format == "int8" and artifact_path and os.path.isfile(os.path.join(artifact_path, INT8_WEIGHTS_FILE)):
+        import torch
+
+        model = torch.load(os.path.join(artifact_path, INT8_WEIGHTS_FILE), weights_only=False)
+        model.eval()
+        tokenizer = AutoTokenizer.from_pretrained(artifact_path)
+        return TorchNLIRunner(model, tokenizer, device="cpu", model_format="int8")
+
+    if model_format == "onnx" and artifact_path and os.path.isfile(os.path.join(artifact_path, ONNX_GRAPH_FILE)):
+        import onnxruntime
+
+        session = onnxruntime.InferenceSession(
+            os.path.join(artifact_path, ONNX_GRAPH_FILE), providers=["CPUExecutionProvider"]
+        )
+        tokenizer = AutoTokenizer.from_pretrained(artifact_path)
+        config = AutoConfig.from_pretrained(artifact_path)
+        return OnnxNLIRunner(session, tokenizer, _entailment_index(config.label2id))
+
+    if model_format != "fp32":
+        if require_artifact:
+            raise FileNotFoundError(f"No {model_format} NLU artifact at '{artifact_path}'")
+        print(f"[NLU] {model_format} artifact not found at '{artifact_path}', falling back to fp32 model")
+
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    model = AutoModelForSequenceClassification.from_pretrained(model_path)
+    model.to(device)
+    model.eval()
+    return TorchNLIRunner(model, tokenizer, device=device)
+
+
+def zero_shot_scores(runner, texts: Sequence[str], labels: Sequence[str]) -> List[Dict]:
+    """Single-label zero-shot scores for every text, computed in one forward pass."""
+    premises: List[str] = []
+    hypotheses: List[str] = []
+    for text in texts:
+        for label in labels:
+            premises.append(text)
+            hypotheses.append(_HYPOTHESIS_TEMPLATE.format(label))
+    entailment = runner.entailment_logits(premises, hypotheses)
+
+    results: List[Dict] = []
+    count = len(labels)
+    for i, text in enumerate(texts):
+        row = entailment[i * count : (i + 1) * count]
+        peak = max(row)
+        exps = [math.exp(value - peak) for value in row]
+        total = sum(exps)
+        ranked = sorted(zip(labels, (value / total for value in exps)), key=lambda pair: pair[1], reverse=True)
+        results.append(
+            {
+                "sequence": text,
+                "labels": [label for label, _ in ranked],
+                "scores": [score for _, score in ranked],
+            }
+        )
+    return results
+
+
+@dataclass
+class _PendingRequest:
+    text: str
+    labels: Sequence[str]
+    future: asyncio.Future
+    loop: asyncio.AbstractEventLoop
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+
+class ZeroShotIntentEngine:
+    """In-process zero-shot classifier with dynamic micro-batching.
+
+    Callers on the event loop submit utterances through ``classify``. A single
+    inference thread drains the request queue, waiting at most
+    ``max_wait_ms`` for up to ``max_batch_size`` utterances, and scores every
+    (utterance, label) NLI pair of the batch in one forward pass. Results use
+    the same ``{"labels", "scores"}`` shape as the Colab ``/classify`` server.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        max_batch_size: int = 16,
+        max_wait_ms: float = 10.0,
+        device: str = "cpu",
+        model_format: str = "fp32",
+        artifact_path: str = "",
+    ) -> None:
+        self.model_path = model_path
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.device = device
+        self.model_format = model_format
+        self.artifact_path = artifact_path
+        self._queue: "queue.Queue[Optional[_PendingRequest]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._runner = None
+        self.batches_run = 0
+        self.requests_served = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def loaded_format(self) -> Optional[str]:
+        return self._runner.model_format if self._runner is not None else None
+
+    def load(self) -> None:
+        self._runner = load_runner(self.model_path, self.model_format, self.artifact_path, self.device)
+
+    def start(self) -> None:
+        if self.running:
+            return
+        if self._runner is None:
+            self.load()
+        self._thread = threading.Thread(target=self._run, name="nlu-inference", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if not self.running:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    async def classify(self, text: str, labels: Sequence[str]) -> Dict:
+        if not self.running:
+            raise RuntimeError("Intent engine is not running")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.put(_PendingRequest(text=text, labels=list(labels), future=future, loop=loop))
+        return await future
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = time.perf_counter() + self.max_wait_ms / 1000
+            stop_after_batch = False
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop_after_batch = True
+                    break
+                batch.append(item)
+            self._process(batch)
+            if stop_after_batch:
+                return
+
+    def _process(self, batch: List[_PendingRequest]) -> None:
+        try:
+            results = self._forward(batch)
+        except Exception as exc:  # pylint: disable=broad-except
+            for request in batch:
+                request.loop.call_soon_threadsafe(_set_exception, request.future, exc)
+            return
+        self.batches_run += 1
+        self.requests_served += len(batch)
+        for request, result in zip(batch, results):
+            request.loop.call_soon_threadsafe(_set_result, request.future, result)
+
+    def _forward(self, batch: List[_PendingRequest]) -> List[Dict]:
+        # Requests in one batch normally share the intent label set; group by
+        # label tuple so each group is still a single forward pass.
+        groups: Dict[tuple, List[int]] = {}
+        for idx, request in enumerate(batch):
+            groups.setdefault(tuple(request.labels), []).append(idx)
+        results: List[Optional[Dict]] = [None] * len(batch)
+        for labels, indices in groups.items():
+            scored = zero_shot_scores(self._runner, [batch[i].text for i in indices], labels)
+            for idx, result in zip(indices, scored):
+                results[idx] = result
+        return results
+
+
+def _entailment_index(label2id: Dict[str, int]) -> int:
+    for label, idx in label2id.items():
+        if label.lower().startswith("entail"):
+            return idx
+    return 2
+
+
+def _set_result(future: asyncio.Future, result: Dict) -> None:
+    if not future.done():
+        future.set_result(result)
+
+
+def _set_exception(future: asyncio.Future, exc: BaseException) -> None:
+    if not future.done():
+        future.set_exception(exc)
+
+
+_engine: Optional[ZeroShotIntentEngine] = None
+
+
+def get_intent_engine() -> Optional[ZeroShotIntentEngine]:
+    return _engine
+
+
+def start_intent_engine() -> Optional[ZeroShotIntentEngine]:
+    """Load the local model and start the inference thread when enabled in settings."""
+    global _engine
+    settings = get_settings()
+    if settings.nlu_backend != "local":
+        return None
+    if _engine is None:
+        _engine = ZeroShotIntentEngine(
+            model_path=settings.nlu_model_path,
+            max_batch_size=settings.nlu_batch_max_size,
+            max_wait_ms=settings.nlu_batch_max_wait_ms,
+            device=settings.nlu_device,
+            model_format=settings.nlu_model_format,
+            artifact_path=settings.nlu_artifact_path,
+        )
+    _engine.start()
+    return _engine
+
+
+def stop_intent_engine() -> None:
+    if _engine is not None:
+        _engine.stop()
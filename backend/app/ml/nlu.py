@@ -1,11 +1,14 @@
 from __future__ import annotations
 
 import re
-from typing import Dict, Optional
-
-import httpx
+from collections import Counter
+from typing import Dict, List, Optional
 
 from app.config import get_settings
+from app.ml.clients import get_client
+from app.ml.executor import run_in_thread
+from app.ml.intent_embeddings import get_embedding_classifier
+from app.ml.intent_engine import get_intent_engine
 
 _FALLBACK_KEYWORDS = {
     "transfer": ["transfer", "send", "pay"],
@@ -18,25 +21,123 @@ _FALLBACK_KEYWORDS = {
 # Intent classification labels
 _INTENT_LABELS = ["Transfer", "balance", "history", "loan", "reminder"]
 
+# Stage-1 patterns: an utterance matching exactly one intent is answered
+# without touching a model.
+_RULE_PATTERNS = {
+    "transfer": re.compile(r"\b(transfer|send|pay|remit)\b"),
+    "balance": re.compile(r"\b(balance|funds|how much (money )?do i have)\b"),
+    "history": re.compile(r"\b(history|transactions?|statement|spent|spend)\b"),
+    "loan": re.compile(r"\b(loans?|emi|interest rate|outstanding)\b"),
+    "reminder": re.compile(r"\b(remind(er)?|alert|notify)\b"),
+}
+
+CASCADE_STAGES = ("rules", "embedding", "model")
+
+# Which stage answered each request; "fallback" means every enabled stage
+# was skipped or failed and the keyword fallback was used.
+_stage_hits: Counter = Counter()
+
+
+async def infer_intent(transcript: str) -> Dict:
+    """Classify ``transcript`` through the configured NLU cascade.
+
+    Stages run cheapest first (rules → embedding centroids → zero-shot model).
+    A stage answers when its confidence reaches that stage's threshold;
+    otherwise the request escalates. The returned dict records the answering
+    ``stage``; if no stage is confident the most confident result is used.
+    """
+    settings = get_settings()
+    stages = [stage.strip() for stage in settings.nlu_cascade_stages.split(",") if stage.strip()]
+    thresholds = {
+        "rules": settings.nlu_rules_threshold,
+        "embedding": settings.nlu_embedding_threshold,
+        "model": 0.0,
+    }
+    best: Optional[Dict] = None
+    for stage in stages:
+        if stage not in CASCADE_STAGES:
+            continue
+        result = await _run_stage(stage, transcript)
+        if not result:
+            continue
+        result["stage"] = stage
+        if result["confidence"] >= thresholds[stage]:
+            _stage_hits[stage] += 1
+            return result
+        if best is None or result["confidence"] > best["confidence"]:
+            best = result
+
+    if best is not None:
+        _stage_hits[best["stage"]] += 1
+        return best
+    _stage_hits["fallback"] += 1
+    return {**_fallback_inference(transcript), "stage": "fallback"}
+
+
+def get_cascade_stats() -> Dict:
+    total = sum(_stage_hits.values())
+    return {
+        "requests": total,
+        "hits": dict(_stage_hits),
+        "hit_ratio": {stage: count / total for stage, count in _stage_hits.items()} if total else {},
+    }
+
 
-def infer_intent(transcript: str) -> Dict:
-    """Use Facebook BART model for intent classification with scoring."""
-    # Use Facebook model as primary method
+async def _run_stage(stage: str, transcript: str) -> Optional[Dict]:
+    if stage == "rules":
+        # A few regexes over one utterance: cheaper inline than any executor hop.
+        return _classify_rules(transcript)
+    if stage == "embedding":
+        classifier = get_embedding_classifier()
+        if classifier is None or not classifier.loaded:
+            return None
+        result = await run_in_thread("nlu_embedding", classifier.classify, transcript)
+        return _build_result(transcript, result["labels"], result["scores"])
+    return await _classify_with_model(transcript)
+
+
+def _classify_rules(transcript: str) -> Optional[Dict]:
+    """Keyword/regex stage. Confident only when exactly one intent matches."""
+    lower = transcript.lower()
+    matched: List[str] = [intent for intent, pattern in _RULE_PATTERNS.items() if pattern.search(lower)]
+    if not matched:
+        return None
+    slots = _extract_slots(transcript)
+    if "amount" not in slots:
+        amount = _extract_amount_from_words(transcript)
+        if amount:
+            slots["amount"] = amount
+    if len(matched) == 1:
+        confidence = 0.9
+        if matched[0] == "transfer" and slots:
+            confidence = 0.95
+    else:
+        confidence = 0.5
+    return {
+        "intent": matched[0],
+        "slots": slots,
+        "confidence": confidence,
+        "all_scores": {intent: confidence if intent == matched[0] else 0.5 for intent in matched},
+    }
+
+
+async def _classify_with_model(transcript: str) -> Optional[Dict]:
+    """Zero-shot BART stage: the in-process engine when running, else the remote API."""
     try:
-        result = _call_facebook_model(transcript)
+        engine = get_intent_engine()
+        if engine is not None and engine.running:
+            result = await _call_local_model(transcript)
+        else:
+            result = await _call_facebook_model(transcript)
         if result:
             print(f"nlu result (facebook): {result}")
-            return result
+        return result
     except Exception as e:
         print(f"Facebook model error: {e}")
-        # Fallback to keyword matching if model fails
-        return _fallback_inference(transcript)
-    
-    # Fallback if no result
-    return _fallback_inference(transcript)
+        return None
 
 
-def _call_facebook_model(transcript: str) -> Optional[Dict]:
+async def _call_facebook_model(transcript: str) -> Optional[Dict]:
     """Call external NLU API for intent classification with scoring.
     
     Returns format: {'sequence': '...', 'labels': [...], 'scores': [...]}
@@ -47,14 +148,15 @@ def _call_facebook_model(transcript: str) -> Optional[Dict]:
     settings = get_settings()
     try:
         # Call the external API endpoint
-        response = httpx.post(
+        client = get_client("nlu", timeout=settings.nlu_timeout_seconds)
+        response = await client.post(
             settings.nlu_api_url,
             json={
                 "text": transcript,
                 "labels": _INTENT_LABELS
             },
             headers={"Content-Type": "application/json"},
-            timeout=10.0
+            timeout=settings.nlu_timeout_seconds
         )
         response.raise_for_status()
         result = response.json()
@@ -80,41 +182,54 @@ def _call_facebook_model(transcript: str) -> Optional[Dict]:
                 return None
         else:
             return None
-        
-        # Get the highest scoring intent
-        if not labels or not scores:
-            return None
-        
-        best_idx = 0
-        best_score = scores[0]
-        for i, score in enumerate(scores):
-            if score > best_score:
-                best_score = score
-                best_idx = i
-        
-        intent_label = labels[best_idx].lower()
-        
-        # Extract slots
-        slots = {}
-        amount = _extract_amount(transcript)
-        if amount:
-            slots["amount"] = amount
-        
-        counterparty = _extract_counterparty(transcript)
-        if counterparty:
-            slots["counterparty"] = counterparty
-        
-        return {
-            "intent": intent_label,
-            "slots": slots,
-            "confidence": best_score,
-            "all_scores": {label: score for label, score in zip(labels, scores)}
-        }
+
+        return _build_result(transcript, labels, scores)
     except Exception as e:
         print(f"Error calling NLU API: {e}")
         return None
 
 
+async def _call_local_model(transcript: str) -> Optional[Dict]:
+    """Classify with the in-process, micro-batched zero-shot engine."""
+    result = await get_intent_engine().classify(transcript, _INTENT_LABELS)
+    return _build_result(transcript, result["labels"], result["scores"])
+
+
+def _build_result(transcript: str, labels: list, scores: list) -> Optional[Dict]:
+    """Pick the best scoring label and attach the extracted slots."""
+    # Get the highest scoring intent
+    if not labels or not scores:
+        return None
+    
+    best_idx = 0
+    best_score = scores[0]
+    for i, score in enumerate(scores):
+        if score > best_score:
+            best_score = score
+            best_idx = i
+    
+    intent_label = labels[best_idx].lower()
+    
+    return {
+        "intent": intent_label,
+        "slots": _extract_slots(transcript),
+        "confidence": best_score,
+        "all_scores": {label: score for label, score in zip(labels, scores)}
+    }
+
+
+def _extract_slots(transcript: str) -> Dict:
+    slots = {}
+    amount = _extract_amount(transcript)
+    if amount:
+        slots["amount"] = amount
+    
+    counterparty = _extract_counterparty(transcript)
+    if counterparty:
+        slots["counterparty"] = counterparty
+    return slots
+
+
 def _fallback_inference(transcript: str) -> Dict:
     """
     Enhanced fallback inference that provides hardcoded responses for complete transaction flow.
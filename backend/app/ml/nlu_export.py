@@ -0,0 +1,162 @@
+"""Export the zero-shot NLU model for CPU serving and check accuracy parity.
+
+Usage (from ``backend/``)::
+
+    python -m app.ml.nlu_export int8 --output artifacts/nlu-int8
+    python -m app.ml.nlu_export onnx --output artifacts/nlu-onnx
+    python -m app.ml.nlu_export parity --format int8 --artifact artifacts/nlu-int8
+
+Point ``NLU_MODEL_FORMAT`` / ``NLU_ARTIFACT_PATH`` at the output directory to
+serve the artifact from the in-process intent engine.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import time
+from typing import Dict, List, Sequence, Tuple
+
+from app.config import get_settings
+from app.ml.intent_engine import INT8_WEIGHTS_FILE, ONNX_GRAPH_FILE, load_runner, zero_shot_scores
+from app.ml.nlu import _INTENT_LABELS
+
+# Labeled utterances covering every intent; extend with production samples.
+PARITY_SAMPLES: List[Tuple[str, str]] = [
+    ("transfer five thousand rupees to Rajesh", "transfer"),
+    ("send ten thousand to Alice", "transfer"),
+    ("pay Bob two thousand five hundred", "transfer"),
+    ("I want to send money to my brother", "transfer"),
+    ("what is my account balance", "balance"),
+    ("how much money do I have", "balance"),
+    ("check my savings funds", "balance"),
+    ("show my recent transactions", "history"),
+    ("what did I spend last week", "history"),
+    ("list my past payments", "history"),
+    ("when is my next EMI due", "loan"),
+    ("show my personal loan details", "loan"),
+    ("what is the interest rate on my home loan", "loan"),
+    ("remind me to pay the electricity bill tomorrow", "reminder"),
+    ("set an alert for my credit card payment", "reminder"),
+    ("create a reminder for rent on the first", "reminder"),
+]
+
+
+def export_int8(model_path: str, output_dir: str) -> str:
+    """Dynamically quantize every ``nn.Linear`` to int8 and save the whole module."""
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    model = AutoModelForSequenceClassification.from_pretrained(model_path)
+    model.eval()
+    quantized = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    target = os.path.join(output_dir, INT8_WEIGHTS_FILE)
+    torch.save(quantized, target)
+    tokenizer.save_pretrained(output_dir)
+    model.config.save_pretrained(output_dir)
+    return target
+
+
+def export_onnx(model_path: str, output_dir: str, opset: int = 17) -> str:
+    """Trace the model to an ONNX graph with dynamic batch and sequence axes."""
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    model = AutoModelForSequenceClassification.from_pretrained(model_path)
+    model.eval()
+    model.config.return_dict = False
+
+    sample = tokenizer(["check balance"], ["This example is balance."], return_tensors="pt")
+    target = os.path.join(output_dir, ONNX_GRAPH_FILE)
+    dynamic_axes = {
+        "input_ids": {0: "batch", 1: "sequence"},
+        "attention_mask": {0: "batch", 1: "sequence"},
+        "logits": {0: "batch"},
+    }
+    with torch.inference_mode():
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"]),
+            target,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+        )
+    tokenizer.save_pretrained(output_dir)
+    model.config.save_pretrained(output_dir)
+    return target
+
+
+def _evaluate(runner, samples: Sequence[Tuple[str, str]], labels: Sequence[str]) -> Dict:
+    predictions: List[str] = []
+    latencies_ms: List[float] = []
+    for text, _ in samples:
+        started = time.perf_counter()
+        result = zero_shot_scores(runner, [text], labels)[0]
+        latencies_ms.append((time.perf_counter() - started) * 1000)
+        predictions.append(result["labels"][0].lower())
+    correct = sum(1 for prediction, (_, expected) in zip(predictions, samples) if prediction == expected)
+    return {
+        "format": runner.model_format,
+        "accuracy": correct / len(samples),
+        "p50_ms": statistics.median(latencies_ms),
+        "mean_ms": statistics.fmean(latencies_ms),
+        "predictions": predictions,
+    }
+
+
+def check_parity(
+    model_path: str,
+    model_format: str,
+    artifact_path: str,
+    samples: Sequence[Tuple[str, str]] = PARITY_SAMPLES,
+    labels: Sequence[str] = _INTENT_LABELS,
+) -> Dict:
+    """Compare intent accuracy and per-utterance latency of an artifact against fp32.
+
+    Raises ``FileNotFoundError`` when the artifact is missing, rather than
+    comparing the fp32 fallback with itself.
+    """
+    candidate_runner = load_runner(model_path, model_format, artifact_path, require_artifact=True)
+    reference = _evaluate(load_runner(model_path, "fp32"), samples, labels)
+    candidate = _evaluate(candidate_runner, samples, labels)
+    agreement = sum(
+        1 for a, b in zip(reference["predictions"], candidate["predictions"]) if a == b
+    ) / len(samples)
+    return {
+        "samples": len(samples),
+        "reference": reference,
+        "candidate": candidate,
+        "agreement": agreement,
+        "accuracy_delta": candidate["accuracy"] - reference["accuracy"],
+        "speedup": reference["p50_ms"] / candidate["p50_ms"] if candidate["p50_ms"] else None,
+    }
+
+
+def main() -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["int8", "onnx", "parity"])
+    parser.add_argument("--model", default=settings.nlu_model_path)
+    parser.add_argument("--output", default=settings.nlu_artifact_path)
+    parser.add_argument("--format", default="int8", choices=["int8", "onnx"])
+    parser.add_argument("--artifact", default=settings.nlu_artifact_path)
+    args = parser.parse_args()
+
+    if args.command == "int8":
+        print(export_int8(args.model, args.output))
+    elif args.command == "onnx":
+        print(export_onnx(args.model, args.output))
+    else:
+        report = check_parity(args.model, args.format, args.artifact)
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
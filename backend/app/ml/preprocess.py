@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import struct
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from app.config import get_settings
+from app.ml.audio import AudioInput, AudioPayload, as_audio_payload
+from app.ml.executor import run_in_thread
+
+_WAVE_FORMAT_PCM = 1
+_WAVE_FORMAT_IEEE_FLOAT = 3
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+@dataclass
+class PreprocessResult:
+    audio: AudioPayload
+    original_bytes: int
+    processed_bytes: int
+    original_sample_rate: Optional[int]
+    duration_seconds: float
+    elapsed_ms: float
+    skipped: bool = False
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_bytes - self.processed_bytes
+
+    def summary(self) -> Dict:
+        return {
+            "original_bytes": self.original_bytes,
+            "processed_bytes": self.processed_bytes,
+            "bytes_saved": self.bytes_saved,
+            "original_sample_rate": self.original_sample_rate,
+            "duration_seconds": round(self.duration_seconds, 3),
+            "elapsed_ms": round(self.elapsed_ms, 3),
+            "skipped": self.skipped,
+        }
+
+
+class PreprocessStats:
+    def __init__(self) -> None:
+        self.turns = 0
+        self.skipped = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.total_ms = 0.0
+
+    def record(self, result: PreprocessResult) -> None:
+        self.turns += 1
+        self.skipped += int(result.skipped)
+        self.bytes_in += result.original_bytes
+        self.bytes_out += result.processed_bytes
+        self.total_ms += result.elapsed_ms
+
+    def snapshot(self) -> Dict:
+        return {
+            "turns": self.turns,
+            "skipped": self.skipped,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "bytes_saved": self.bytes_in - self.bytes_out,
+            "avg_ms": self.total_ms / self.turns if self.turns else 0.0,
+        }
+
+
+preprocess_stats = PreprocessStats()
+
+
+async def prepare_audio(audio: AudioInput) -> PreprocessResult:
+    """Run :func:`preprocess_audio` off the event loop (pass-through when disabled)."""
+    payload = as_audio_payload(audio)
+    if not get_settings().audio_preprocess_enabled:
+        return PreprocessResult(
+            audio=payload,
+            original_bytes=len(payload),
+            processed_bytes=len(payload),
+            original_sample_rate=None,
+            duration_seconds=0.0,
+            elapsed_ms=0.0,
+            skipped=True,
+        )
+    return await run_in_thread("preprocess", preprocess_audio, payload)
+
+
+def preprocess_audio(audio: AudioInput) -> PreprocessResult:
+    """Parse a WAV upload, downmix to mono, resample and trim silence.
+
+    Output is 16-bit PCM mono WAV at ``audio_target_sample_rate``. Anything
+    that is not a parseable PCM/float WAV (e.g. a webm clip) passes through
+    untouched with ``skipped=True``. Every call is recorded in
+    ``preprocess_stats``.
+    """
+    started = time.perf_counter()
+    payload = as_audio_payload(audio)
+    settings = get_settings()
+
+    parsed = parse_wav(payload.view)
+    if parsed is None:
+        result = PreprocessResult(
+            audio=payload,
+            original_bytes=len(payload),
+            processed_bytes=len(payload),
+            original_sample_rate=None,
+            duration_seconds=0.0,
+            elapsed_ms=(time.perf_counter() - started) * 1000,
+            skipped=True,
+        )
+        preprocess_stats.record(result)
+        return result
+
+    samples, sample_rate = parsed
+    target_rate = settings.audio_target_sample_rate
+    mono = samples.mean(axis=1) if samples.shape[1] > 1 else samples[:, 0]
+    mono = resample(mono, sample_rate, target_rate)
+    mono = _trim_silence(
+        mono,
+        target_rate,
+        frame_ms=settings.audio_vad_frame_ms,
+        relative_db=settings.audio_vad_relative_db,
+        padding_ms=settings.audio_vad_padding_ms,
+    )
+    encoded = _encode_wav(mono, target_rate)
+    result = PreprocessResult(
+        audio=AudioPayload(encoded),
+        original_bytes=len(payload),
+        processed_bytes=len(encoded),
+        original_sample_rate=sample_rate,
+        duration_seconds=len(mono) / target_rate,
+        elapsed_ms=(time.perf_counter() - started) * 1000,
+    )
+    preprocess_stats.record(result)
+    return result
+
+
+def parse_wav(data: memoryview) -> Optional[Tuple[np.ndarray, int]]:
+    """Return float32 samples shaped (frames, channels) in [-1, 1] and the sample rate.
+
+    ``None`` for anything that is not a well-formed PCM/float WAV, including
+    truncated or corrupt headers.
+    """
+    try:
+        return _parse_wav(data)
+    except (struct.error, ValueError):
+        return None
+
+
+def _parse_wav(data: memoryview) -> Optional[Tuple[np.ndarray, int]]:
+    if len(data) < 12 or bytes(data[0:4]) != b"RIFF" or bytes(data[8:12]) != b"WAVE":
+        return None
+    offset = 12
+    fmt = None
+    while offset + 8 <= len(data):
+        chunk_id = bytes(data[offset : offset + 4])
+        (chunk_size,) = struct.unpack_from("<I", data, offset + 4)
+        body = offset + 8
+        if chunk_id == b"data":
+            if fmt is None:
+                return None
+            # Streaming recorders often leave the size as 0 or 0xFFFFFFFF.
+            end = len(data) if chunk_size in (0, 0xFFFFFFFF) else min(len(data), body + chunk_size)
+            return _decode_samples(data[body:end], fmt)
+        if body + chunk_size > len(data):
+            # Only the data chunk may run past the end of a truncated upload.
+            return None
+        if chunk_id == b"fmt ":
+            if chunk_size < 16:
+                return None
+            fmt = struct.unpack_from("<HHIIHH", data, body)
+            if fmt[0] == _WAVE_FORMAT_EXTENSIBLE and chunk_size >= 26:
+                # Real format tag lives in the first two bytes of the SubFormat GUID.
+                (sub_format,) = struct.unpack_from("<H", data, body + 24)
+                fmt = (sub_format,) + fmt[1:]
+        offset = body + chunk_size + (chunk_size & 1)
+    return None
+
+
+def _decode_samples(raw: memoryview, fmt: tuple) -> Optional[Tuple[np.ndarray, int]]:
+    format_tag, channels, sample_rate, _, block_align, bits = fmt
+    if channels < 1 or sample_rate < 1 or bits % 8 or block_align != channels * (bits // 8):
+        return None
+    usable = len(raw) - len(raw) % block_align
+    raw = raw[:usable]
+
+    if format_tag == _WAVE_FORMAT_PCM and bits == 16:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif format_tag == _WAVE_FORMAT_PCM and bits == 32:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+    elif format_tag == _WAVE_FORMAT_PCM and bits == 8:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif format_tag == _WAVE_FORMAT_PCM and bits == 24:
+        triplets = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        values = triplets[:, 0] | (triplets[:, 1] << 8) | (triplets[:, 2] << 16)
+        values = np.where(values & 0x800000, values - 0x1000000, values)
+        samples = values.astype(np.float32) / 8388608.0
+    elif format_tag == _WAVE_FORMAT_IEEE_FLOAT and bits == 32:
+        samples = np.frombuffer(raw, dtype="<f4").astype(np.float32)
+    elif format_tag == _WAVE_FORMAT_IEEE_FLOAT and bits == 64:
+        samples = np.frombuffer(raw, dtype="<f8").astype(np.float32)
+    else:
+        return None
+    return samples.reshape(-1, channels), sample_rate
+
+
+def resample(samples: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
+    if source_rate == target_rate or samples.size == 0:
+        return samples
+    if source_rate > target_rate:
+        # Box-filter before decimating to keep the worst aliasing out of the speech band.
+        width = int(source_rate // target_rate)
+        if width > 1:
+            kernel = np.full(width, 1.0 / width, dtype=np.float32)
+            samples = np.convolve(samples, kernel, mode="same")
+    target_length = int(round(samples.size * target_rate / source_rate))
+    source_positions = np.arange(target_length, dtype=np.float64) * (source_rate / target_rate)
+    return np.interp(source_positions, np.arange(samples.size), samples).astype(np.float32)
+
+
+def _trim_silence(
+    samples: np.ndarray,
+    sample_rate: int,
+    frame_ms: int = 20,
+    relative_db: float = -35.0,
+    padding_ms: int = 150,
+) -> np.ndarray:
+    """Energy VAD: drop leading/trailing frames quieter than ``relative_db`` below the loudest frame."""
+    frame = max(1, sample_rate * frame_ms // 1000)
+    frames = samples.size // frame
+    if frames == 0:
+        return samples
+    energy = np.sqrt(np.mean(samples[: frames * frame].reshape(frames, frame) ** 2, axis=1))
+    peak = float(energy.max())
+    if peak <= 1e-6:
+        return samples[:0]
+    voiced = np.flatnonzero(energy >= peak * 10 ** (relative_db / 20))
+    pad = sample_rate * padding_ms // 1000
+    start = max(0, int(voiced[0]) * frame - pad)
+    end = min(samples.size, (int(voiced[-1]) + 1) * frame + pad)
+    return samples[start:end]
+
+
+def _encode_wav(samples: np.ndarray, sample_rate: int) -> bytes:
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767.0).astype("<i2").tobytes()
+    header = struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF",
+        36 + len(pcm),
+        b"WAVE",
+        b"fmt ",
+        16,
+        _WAVE_FORMAT_PCM,
+        1,
+        sample_rate,
+        sample_rate * 2,
+        2,
+        16,
+        b"data",
+        len(pcm),
+    )
+    return header + pcm
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.ml.biometrics import EMBEDDING_DIM
+
+
+class SpeakerIndex:
+    """In-memory 1:N index over enrolled speaker embeddings.
+
+    Vectors live L2-normalised in one contiguous float32 matrix (rows are
+    reused on update, the matrix doubles when full), so exact top-k cosine
+    search is a single matrix-vector product. For very large populations an
+    approximate inverted-file mode clusters the rows with k-means and only
+    scores the ``nprobe`` closest clusters.
+
+    ``search`` runs on the ML thread pool while enrolment updates the index
+    on the event loop, so every method that touches the rows, the matrix or
+    the IVF state holds ``_lock``.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM, capacity: int = 1024) -> None:
+        self.dim = dim
+        self._matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self._ids: List[Optional[str]] = [None] * capacity
+        self._rows: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._size = 0
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments: Optional[np.ndarray] = None
+        self._ivf_dirty = True
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, speaker_id: str) -> bool:
+        return speaker_id in self._rows
+
+    def upsert(self, speaker_id: str, embedding: Sequence[float]) -> bool:
+        vector = np.asarray(embedding, dtype=np.float32)
+        if vector.shape != (self.dim,):
+            return False
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return False
+        with self._lock:
+            row = self._rows.get(speaker_id)
+            if row is None:
+                row = self._free.pop() if self._free else self._next_row()
+                self._rows[speaker_id] = row
+                self._ids[row] = speaker_id
+            self._matrix[row] = vector / norm
+            self._ivf_dirty = True
+        return True
+
+    def remove(self, speaker_id: str) -> None:
+        with self._lock:
+            row = self._rows.pop(speaker_id, None)
+            if row is None:
+                return
+            self._matrix[row] = 0.0
+            self._ids[row] = None
+            self._free.append(row)
+            self._ivf_dirty = True
+
+    def search(
+        self,
+        probe: Sequence[float],
+        k: int = 5,
+        approximate: bool = False,
+        nlist: int = 64,
+        nprobe: int = 4,
+    ) -> List[Tuple[str, float]]:
+        query = np.asarray(probe, dtype=np.float32)
+        if query.shape != (self.dim,):
+            return []
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+        query = query / norm
+
+        with self._lock:
+            if not self._rows:
+                return []
+            if approximate and len(self._rows) > nlist * 4:
+                candidates = self._ivf_candidates(query, nlist, nprobe)
+            else:
+                candidates = self._occupied_rows()
+            if candidates.size == 0:
+                return []
+
+            scores = self._matrix[candidates] @ query
+            k = min(k, scores.size)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(self._ids[candidates[i]], float(scores[i])) for i in top]
+
+    def _next_row(self) -> int:
+        if self._size == self._matrix.shape[0]:
+            grown = np.zeros((self._matrix.shape[0] * 2, self.dim), dtype=np.float32)
+            grown[: self._size] = self._matrix[: self._size]
+            self._matrix = grown
+            self._ids.extend([None] * (grown.shape[0] - len(self._ids)))
+        row = self._size
+        self._size += 1
+        return row
+
+    # The helpers below expect ``_lock`` to be held.
+
+    def _ivf_candidates(self, query: np.ndarray, nlist: int, nprobe: int) -> np.ndarray:
+        if self._ivf_dirty or self._centroids is None or self._centroids.shape[0] != nlist:
+            self._build_ivf(nlist)
+        nearest = np.argsort(-(self._centroids @ query))[:nprobe]
+        return self._occupied_rows()[np.isin(self._assignments, nearest)]
+
+    def _build_ivf(self, nlist: int, iterations: int = 10) -> None:
+        rows = self._occupied_rows()
+        data = self._matrix[rows]
+        rng = np.random.default_rng(0)
+        centroids = data[rng.choice(data.shape[0], size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignments = np.argmax(data @ centroids.T, axis=1)
+            for cluster in range(nlist):
+                members = data[assignments == cluster]
+                if members.size:
+                    mean = members.mean(axis=0)
+                    centroids[cluster] = mean / (np.linalg.norm(mean) or 1.0)
+        self._centroids = centroids
+        self._assignments = np.argmax(data @ centroids.T, axis=1)
+        self._ivf_dirty = False
+
+    def _occupied_rows(self) -> np.ndarray:
+        return np.fromiter(self._rows.values(), dtype=np.int64, count=len(self._rows))
+
+
+# Named indexes: "users" holds enrolled customers, "fraud" known fraudster voiceprints.
+_indexes: Dict[str, SpeakerIndex] = {}
+
+
+def get_speaker_index(name: str = "users") -> SpeakerIndex:
+    index = _indexes.get(name)
+    if index is None:
+        index = SpeakerIndex()
+        _indexes[name] = index
+    return index
@@ -1,37 +1,42 @@
 from __future__ import annotations
 
-import base64
-import io
-from typing import Dict
-
-import httpx
+from typing import Dict, Optional
 
 from app.config import get_settings
+from app.ml.audio import AudioInput, as_audio_payload
+from app.ml.clients import get_client
+
+_OPENAI_BASE_URL = "https://api.openai.com/v1"
+_SAMPLE_ALIGNMENT = 12
+
+
+async def transcribe_audio(audio: AudioInput, language: str = "en") -> Dict:
+    return await transcribe_bytes(as_audio_payload(audio).data, language)
 
 
-def transcribe_audio(audio_base64: str, language: str = "en") -> Dict:
+async def transcribe_bytes(audio_bytes: bytes, language: str = "en") -> Dict:
     settings = get_settings()
     api_key = (settings.openai_api_key or "").strip()
 
-    audio_bytes = base64.b64decode(audio_base64.encode(), validate=True)
-
     # If no API key → fallback
     if not api_key:
         return _fallback_transcript(audio_bytes, language)
 
     try:
         files = {
-            "file": ("audio.wav", io.BytesIO(audio_bytes), "audio/wav"),
+            # Upload straight from the shared buffer; no extra BytesIO copy.
+            "file": ("audio.wav", audio_bytes, "audio/wav"),
         }
         data = {"model": settings.openai_whisper_model, "language": language}
         headers = {"Authorization": f"Bearer {api_key}"}
 
-        response = httpx.post(
-            "https://api.openai.com/v1/audio/transcriptions",
+        client = get_client("openai", _OPENAI_BASE_URL, settings.stt_timeout_seconds)
+        response = await client.post(
+            "/audio/transcriptions",
             data=data,
             files=files,
             headers=headers,
-            timeout=30,
+            timeout=settings.stt_timeout_seconds,
         )
         response.raise_for_status()
 
@@ -46,6 +51,71 @@ def transcribe_audio(audio_base64: str, language: str = "en") -> Dict:
         return _fallback_transcript(audio_bytes, language)
 
 
+class StreamingTranscription:
+    """Per-utterance STT stream fed with audio chunks as they arrive.
+
+    Chunks are appended to an in-memory buffer. Once at least
+    ``partial_interval_bytes`` of new audio has accumulated, ``feed`` reports
+    that a partial transcript is due and ``partial`` transcribes the leading
+    container header plus the last ``partial_window_bytes`` of audio, so each
+    partial costs the same however long the utterance gets. ``finalize``
+    transcribes the complete utterance.
+    """
+
+    def __init__(
+        self,
+        language: str = "en",
+        partial_interval_bytes: Optional[int] = None,
+        partial_window_bytes: Optional[int] = None,
+    ) -> None:
+        settings = get_settings()
+        self.language = language
+        self.partial_interval_bytes = partial_interval_bytes or settings.stt_partial_interval_bytes
+        self.partial_window_bytes = partial_window_bytes or settings.stt_partial_window_bytes
+        self.max_bytes = settings.stt_stream_max_bytes
+        self._buffer = bytearray()
+        # The first chunk carries the container header (WAV header, webm init segment).
+        self._head_size = 0
+        self._last_partial_size = 0
+
+    @property
+    def size(self) -> int:
+        return len(self._buffer)
+
+    def feed(self, chunk: bytes) -> bool:
+        """Append ``chunk``; raises ``ValueError`` past ``stt_stream_max_bytes``."""
+        if len(self._buffer) + len(chunk) > self.max_bytes:
+            raise ValueError("Audio stream exceeds maximum utterance size")
+        if not self._buffer:
+            self._head_size = len(chunk)
+        self._buffer.extend(chunk)
+        return len(self._buffer) - self._last_partial_size >= self.partial_interval_bytes
+
+    def partial_window(self) -> bytes:
+        """Header chunk plus the trailing window of audio (the whole buffer while it is short)."""
+        head = self._head_size
+        if len(self._buffer) <= head + self.partial_window_bytes:
+            return bytes(self._buffer)
+        start = len(self._buffer) - self.partial_window_bytes
+        # Keep the tail on the same sample alignment it had in the original
+        # stream (12 covers every 8/16/24/32-bit mono or stereo block size).
+        start += (head - start) % _SAMPLE_ALIGNMENT
+        return bytes(self._buffer[:head]) + bytes(self._buffer[start:])
+
+    async def partial(self) -> Dict:
+        self._last_partial_size = len(self._buffer)
+        result = await transcribe_bytes(self.partial_window(), self.language)
+        return {**result, "bytes_received": self._last_partial_size, "final": False}
+
+    def discard(self) -> None:
+        self._buffer = bytearray()
+        self._head_size = 0
+        self._last_partial_size = 0
+
+    async def finalize(self) -> Dict:
+        result = await transcribe_bytes(bytes(self._buffer), self.language)
+        return {**result, "bytes_received": len(self._buffer), "final": True}
+
 
 def _fallback_transcript(audio_bytes: bytes, language: str) -> Dict:
     """
@@ -1,41 +1,126 @@
 from __future__ import annotations
 
 import base64
-from typing import Dict
-
-import httpx
+import re
+from typing import AsyncIterator, Dict, List, Tuple
 
 from app.config import get_settings
+from app.ml.clients import get_client
+from app.ml.tts_cache import CachedAudio, cache_key, get_tts_cache
+
+_ELEVENLABS_BASE_URL = "https://api.elevenlabs.io/v1"
+
+# Sentence boundary: terminal punctuation followed by whitespace.
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
 
 
-def synthesize_speech(text: str, language: str = "en") -> Dict:
+async def synthesize_speech(text: str, language: str = "en") -> Dict:
     settings = get_settings()
     if not settings.elevenlabs_api_key:
         return _fallback_tts(text, language)
 
-    url = f"https://api.elevenlabs.io/v1/text-to-speech/{settings.elevenlabs_voice_id}"
-    payload = {
-        "text": text,
-        "model_id": "eleven_multilingual_v2",
-        "voice_settings": {"stability": 0.4, "similarity_boost": 0.85},
-    }
-    headers = {
-        "xi-api-key": settings.elevenlabs_api_key,
-        "Content-Type": "application/json",
-        "Accept": "audio/mpeg",
-    }
+    cache = get_tts_cache()
+    key = cache_key(text, language, settings.elevenlabs_voice_id, settings.tts_model_id)
+    if cache is not None:
+        cached = await cache.get(key)
+        if cached is not None:
+            return {
+                "audio_base64": base64.b64encode(cached.audio).decode(),
+                "duration_seconds": cached.duration_seconds,
+            }
+
+    url, payload, headers = _elevenlabs_request(text)
 
     try:
-        response = httpx.post(url, json=payload, headers=headers, timeout=30)
+        client = get_client("elevenlabs", _ELEVENLABS_BASE_URL, settings.tts_timeout_seconds)
+        response = await client.post(url, json=payload, headers=headers, timeout=settings.tts_timeout_seconds)
         response.raise_for_status()
         audio_b64 = base64.b64encode(response.content).decode()
         duration = max(1.0, len(text) / 12)
+        if cache is not None:
+            await cache.put(key, CachedAudio(audio=response.content, duration_seconds=duration))
         print("ElevenLabs is speaking")
         return {"audio_base64": audio_b64, "duration_seconds": duration}
     except Exception:  # pragma: no cover - fallback
         return _fallback_tts(text, language)
 
 
+async def stream_speech(text: str, language: str = "en") -> AsyncIterator[Tuple[int, bytes]]:
+    """Yield ``(segment_index, audio_chunk)`` pairs for ``text`` as audio becomes available.
+
+    Long replies are split into sentences and each sentence is streamed from
+    ElevenLabs' streaming endpoint in order, so playback of the first
+    sentence can begin while later ones are still rendering. Each sentence is
+    cached individually; without an API key the local stand-in is chunked.
+    """
+    settings = get_settings()
+    chunk_size = settings.tts_stream_chunk_bytes
+    for index, sentence in enumerate(split_sentences(text)):
+        if not settings.elevenlabs_api_key:
+            audio = base64.b64decode(_fallback_tts(sentence, language)["audio_base64"])
+            for start in range(0, len(audio), chunk_size):
+                yield index, audio[start : start + chunk_size]
+            continue
+        async for chunk in _stream_sentence(sentence, language, chunk_size):
+            yield index, chunk
+
+
+def split_sentences(text: str) -> List[str]:
+    return [part for part in _SENTENCE_BOUNDARY.split(text.strip()) if part]
+
+
+async def _stream_sentence(sentence: str, language: str, chunk_size: int) -> AsyncIterator[bytes]:
+    settings = get_settings()
+    cache = get_tts_cache()
+    key = cache_key(sentence, language, settings.elevenlabs_voice_id, settings.tts_model_id)
+    if cache is not None:
+        cached = await cache.get(key)
+        if cached is not None:
+            for start in range(0, len(cached.audio), chunk_size):
+                yield cached.audio[start : start + chunk_size]
+            return
+
+    url, payload, headers = _elevenlabs_request(sentence)
+    received = bytearray()
+    try:
+        client = get_client("elevenlabs", _ELEVENLABS_BASE_URL, settings.tts_timeout_seconds)
+        async with client.stream(
+            "POST", f"{url}/stream", json=payload, headers=headers, timeout=settings.tts_timeout_seconds
+        ) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes(chunk_size):
+                received.extend(chunk)
+                yield chunk
+    except Exception:  # pragma: no cover - fallback
+        if received:
+            # Part of the sentence already went out; don't replay it.
+            return
+        audio = base64.b64decode(_fallback_tts(sentence, language)["audio_base64"])
+        for start in range(0, len(audio), chunk_size):
+            yield audio[start : start + chunk_size]
+        return
+
+    if cache is not None and received:
+        duration = max(1.0, len(sentence) / 12)
+        await cache.put(key, CachedAudio(audio=bytes(received), duration_seconds=duration))
+
+
+def _elevenlabs_request(text: str) -> Tuple[str, Dict, Dict]:
+    settings = get_settings()
+    url = f"/text-to-speech/{settings.elevenlabs_voice_id}"
+    payload = {
+        "text": text,
+        "model_id": settings.tts_model_id,
+        "voice_settings": {"stability": 0.4, "similarity_boost": 0.85},
+    }
+    headers = {
+        "xi-api-key": settings.elevenlabs_api_key,
+        "Content-Type": "application/json",
+        "Accept": "audio/mpeg",
+    }
+    return url, payload, headers
+
+
 def _fallback_tts(text: str, language: str) -> Dict:
     audio_payload = base64.b64encode(f"{language}:{text}".encode()).decode()
     return {"audio_base64": audio_payload, "duration_seconds": max(1.0, len(text) / 10)}
@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import struct
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from app.config import get_settings
+
+# Disk entries are "<duration float64><audio bytes>" so a hit is one read.
+_DISK_HEADER = struct.Struct("<d")
+
+
+@dataclass
+class CachedAudio:
+    audio: bytes
+    duration_seconds: float
+
+
+def cache_key(text: str, language: str, voice_id: str, model_id: str) -> str:
+    material = "\x1f".join((text, language, voice_id, model_id)).encode()
+    return hashlib.sha256(material).hexdigest()
+
+
+class TTSCache:
+    """Content-addressed TTS audio cache.
+
+    A byte-bounded in-memory LRU sits in front of an optional disk tier
+    (``directory``) that survives restarts. Disk hits are promoted back into
+    memory. The disk tier holds at most ``disk_max_bytes``; when a write goes
+    over, the least recently used files (by mtime, refreshed on each disk
+    hit) are deleted down to 90% of the cap. Keys come from :func:`cache_key`.
+    """
+
+    def __init__(self, max_bytes: int, directory: str = "", disk_max_bytes: int = 512 * 1024 * 1024) -> None:
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.disk_max_bytes = disk_max_bytes
+        self._entries: "OrderedDict[str, CachedAudio]" = OrderedDict()
+        self._bytes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        # Disk writes run on worker threads; the byte count and pruning share this lock.
+        self._disk_lock = threading.Lock()
+        self._disk_bytes = 0
+        if directory:
+            try:
+                os.makedirs(directory, exist_ok=True)
+                self._disk_bytes = sum(size for _, _, size in self._disk_files())
+            except OSError as exc:
+                print(f"[TTS CACHE] Disk tier disabled: {exc}")
+                self.directory = ""
+
+    async def get(self, key: str) -> Optional[CachedAudio]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.memory_hits += 1
+            return entry
+        if self.directory:
+            entry = await asyncio.to_thread(self._read_disk, key)
+            if entry is not None:
+                self.disk_hits += 1
+                self._remember(key, entry)
+                return entry
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, entry: CachedAudio) -> None:
+        self._remember(key, entry)
+        if self.directory:
+            try:
+                await asyncio.to_thread(self._write_disk, key, entry)
+            except OSError as exc:
+                print(f"[TTS CACHE] Disk write failed: {exc}")
+
+    def _remember(self, key: str, entry: CachedAudio) -> None:
+        size = len(entry.audio)
+        if size > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous.audio)
+        self._entries[key] = entry
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted.audio)
+            self.evictions += 1
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.bin")
+
+    def _read_disk(self, key: str) -> Optional[CachedAudio]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as handle:
+                data = handle.read()
+            # Reads count as use for the disk tier's LRU pruning.
+            os.utime(path)
+        except OSError:
+            # Missing, unreadable or just pruned: a miss, not a failed turn.
+            return None
+        if len(data) < _DISK_HEADER.size:
+            return None
+        (duration,) = _DISK_HEADER.unpack_from(data)
+        return CachedAudio(audio=data[_DISK_HEADER.size :], duration_seconds=duration)
+
+    def _write_disk(self, key: str, entry: CachedAudio) -> None:
+        # Write-then-rename so concurrent readers never see a partial file. Each
+        # write gets its own temp file: the same sentence is often rendered twice at once.
+        target = self._path(key)
+        with tempfile.NamedTemporaryFile(dir=self.directory, prefix=f"{key}.", suffix=".tmp", delete=False) as handle:
+            tmp = handle.name
+            try:
+                handle.write(_DISK_HEADER.pack(entry.duration_seconds))
+                handle.write(entry.audio)
+            except OSError:
+                handle.close()
+                os.unlink(tmp)
+                raise
+        size = _DISK_HEADER.size + len(entry.audio)
+        with self._disk_lock:
+            try:
+                replaced = os.path.getsize(target)
+            except OSError:
+                replaced = 0
+            os.replace(tmp, target)
+            self._disk_bytes += size - replaced
+            if self._disk_bytes > self.disk_max_bytes:
+                self._prune_disk()
+
+    def _prune_disk(self) -> None:
+        """Delete the least recently used files down to 90% of ``disk_max_bytes``."""
+        files = sorted(self._disk_files())
+        total = sum(size for _, _, size in files)
+        target = self.disk_max_bytes * 0.9
+        for _, path, size in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.disk_evictions += 1
+        # Recounted from the directory, so drift from other processes sharing it is corrected.
+        self._disk_bytes = total
+
+    def _disk_files(self) -> List[Tuple[float, str, int]]:
+        files = []
+        with os.scandir(self.directory) as entries:
+            for item in entries:
+                if not item.name.endswith(".bin"):
+                    continue
+                try:
+                    stat = item.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, item.path, stat.st_size))
+        return files
+
+    def stats(self) -> Dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "disk_bytes": self._disk_bytes,
+            "disk_max_bytes": self.disk_max_bytes,
+            "disk_evictions": self.disk_evictions,
+            "hit_ratio": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+
+_cache: Optional[TTSCache] = None
+
+
+def get_tts_cache() -> Optional[TTSCache]:
+    global _cache
+    settings = get_settings()
+    if settings.tts_cache_max_bytes <= 0:
+        return None
+    if _cache is None:
+        _cache = TTSCache(settings.tts_cache_max_bytes, settings.tts_cache_dir, settings.tts_cache_disk_max_bytes)
+    return _cache
+
+
+def get_tts_cache_stats() -> Dict:
+    cache = get_tts_cache()
+    return cache.stats() if cache is not None else {"enabled": False}
+
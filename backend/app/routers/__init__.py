@@ -1,3 +1,3 @@
-from . import auth, banking, dialogue
+from . import auth, banking, dialogue, metrics
 
-__all__ = ["auth", "banking", "dialogue"]
+__all__ = ["auth", "banking", "dialogue", "metrics"]
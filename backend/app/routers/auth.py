@@ -1,7 +1,9 @@
 from __future__ import annotations
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 
+from app.core.security import get_current_staff_user
+from app.ml import AudioPayload
 from app.services import auth as auth_service
 from app.schemas.auth import (
     LoginRequest,
@@ -9,6 +11,8 @@ from app.schemas.auth import (
     TokenRequest,
     TokenResponse,
     VoiceEnrollRequest,
+    VoiceIdentifyRequest,
+    VoiceIdentifyResponse,
     VoiceVerifyRequest,
     VoiceVerifyResponse,
 )
@@ -40,7 +44,9 @@ async def issue_token(payload: TokenRequest) -> TokenResponse:
         )
     
     # Verify voice first
-    voice_result = await auth_service.verify_voice(payload.user_id, payload.audio_base64, payload.otp)
+    voice_result = await auth_service.verify_voice(
+        payload.user_id, AudioPayload.from_base64(payload.audio_base64), payload.otp, consume_otp=False
+    )
     if not voice_result.get("success"):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -54,12 +60,24 @@ async def issue_token(payload: TokenRequest) -> TokenResponse:
 
 @router.post("/voice/enroll")
 async def enroll_voice(payload: VoiceEnrollRequest) -> dict:
-    await auth_service.enroll_voice(payload.user_id, payload.audio_base64)
+    await auth_service.enroll_voice(payload.user_id, AudioPayload.from_base64(payload.audio_base64))
     return {"status": "enrolled"}
 
 
 @router.post("/voice/verify", response_model=VoiceVerifyResponse)
 async def verify_voice(payload: VoiceVerifyRequest) -> VoiceVerifyResponse:
-    result = await auth_service.verify_voice(payload.user_id, payload.audio_base64, payload.otp)
+    result = await auth_service.verify_voice(
+        payload.user_id, AudioPayload.from_base64(payload.audio_base64), payload.otp
+    )
     return VoiceVerifyResponse(**result)
 
+
+@router.post("/voice/identify", response_model=VoiceIdentifyResponse)
+async def identify_voice(
+    payload: VoiceIdentifyRequest, staff_user: dict = Depends(get_current_staff_user)
+) -> VoiceIdentifyResponse:
+    """Staff only: the matches name other customers and the fraud watchlist."""
+    result = await auth_service.identify_speaker(
+        AudioPayload.from_base64(payload.audio_base64), payload.top_k, payload.index, payload.approximate
+    )
+    return VoiceIdentifyResponse(**result)
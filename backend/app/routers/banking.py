@@ -1,6 +1,10 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 
 from app.core.security import get_current_user
 from app.schemas.banking import (
@@ -37,21 +41,50 @@ async def init_transfer(
 
 @router.post("/transfer/confirm", response_model=TransferConfirmResponse)
 async def confirm_transfer(
-    payload: TransferConfirmRequest, current_user: dict = Depends(get_current_user)
+    payload: TransferConfirmRequest,
+    current_user: dict = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
 ) -> TransferConfirmResponse:
     if payload.user_id and payload.user_id != current_user["user_id"]:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User mismatch")
     txn = await banking_service.confirm_transfer(
-        current_user["user_id"], payload.session_id, payload.otp, payload.voice_verified
+        current_user["user_id"],
+        payload.session_id,
+        payload.otp,
+        payload.voice_verified,
+        idempotency_key or payload.idempotency_key,
     )
     return TransferConfirmResponse(status=txn["status"], txn_id=txn["txn_id"])
 
 
 @router.get("/transactions", response_model=TransactionHistoryResponse)
 async def get_transactions(
-    limit: int = 5, current_user: dict = Depends(get_current_user)
+    limit: int = Query(default=5, ge=1, le=100),
+    cursor: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    counterparty: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
 ) -> TransactionHistoryResponse:
-    return await banking_service.get_transactions(current_user["user_id"], limit)
+    return await banking_service.get_transactions(
+        current_user["user_id"], limit, cursor, start, end, counterparty
+    )
+
+
+@router.get("/transactions/export")
+async def export_transactions(
+    format: str = Query(default="ndjson", pattern="^(ndjson|csv)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    counterparty: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
+) -> StreamingResponse:
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        banking_service.export_transactions(current_user["user_id"], format, start, end, counterparty),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="transactions.{format}"'},
+    )
 
 
 @router.get("/loans", response_model=LoansResponse)
@@ -1,29 +1,78 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
 
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+
+from app.config import get_settings
 from app.core.security import get_current_user
+from app.ml import AudioPayload
 from app.schemas.auth import SessionState
-from app.schemas.dialogue import VoiceTurnRequest
+from app.schemas.dialogue import DialogueTurnPage, VoiceTurnRequest
 from app.services import auth as auth_service
 from app.services import dialogue as dialogue_service
 
 router = APIRouter(prefix="/dialogue", tags=["dialogue"])
 
 
+def _check_audio_size(size: int) -> None:
+    limit = get_settings().voice_turn_max_bytes
+    if size > limit:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Audio exceeds {limit} bytes",
+        )
+
+
 @router.post("/voice-turn")
 async def voice_turn(payload: VoiceTurnRequest, current_user: dict = Depends(get_current_user)) -> dict:
+    # Every 4 base64 characters decode to at most 3 bytes.
+    _check_audio_size(len(payload.audio_base64) // 4 * 3)
     return await dialogue_service.process_voice_turn(
         current_user["user_id"], 
-        payload.audio_base64, 
+        AudioPayload.from_base64(payload.audio_base64),
         payload.language,
         payload.context
     )
 
 
+@router.post("/voice-turn/raw")
+async def voice_turn_raw(
+    request: Request,
+    language: str = "en",
+    context: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
+) -> dict:
+    """Same as ``/voice-turn`` but the request body is the audio itself (no base64/JSON)."""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit():
+        _check_audio_size(int(content_length))
+    # Chunked uploads carry no length, so the cap is enforced while reading too.
+    audio = bytearray()
+    async for chunk in request.stream():
+        audio.extend(chunk)
+        _check_audio_size(len(audio))
+    audio = bytes(audio)
+    if not audio:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Empty audio body")
+    return await dialogue_service.process_voice_turn(current_user["user_id"], AudioPayload(audio), language, context)
+
+
 @router.get("/session/{user_id}", response_model=SessionState)
 async def get_session(user_id: str, current_user: dict = Depends(get_current_user)) -> SessionState:
     if user_id != current_user["user_id"]:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Cannot access other sessions")
     return await auth_service.get_session_state(user_id)
 
+
+
+@router.get("/session/{user_id}/turns", response_model=DialogueTurnPage)
+async def get_session_turns(
+    user_id: str,
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
+) -> DialogueTurnPage:
+    if user_id != current_user["user_id"]:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Cannot access other sessions")
+    return await dialogue_service.get_dialogue_turns(user_id, limit, cursor)
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from fastapi import APIRouter
+
+from app.core.cache import get_user_cache
+from app.ml import get_cascade_stats
+from app.ml.executor import get_ml_executor
+from app.ml.preprocess import preprocess_stats
+from app.ml.tts_cache import get_tts_cache_stats
+from app.services.reminders import get_reminder_scheduler
+from app.services.write_behind import get_write_behind
+from app.ws.voice_socket import manager as voice_manager
+from app.ws.voice_socket import turn_queue_stats
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+@router.get("")
+async def get_metrics() -> dict:
+    return {
+        "nlu": get_cascade_stats(),
+        "tts_cache": get_tts_cache_stats(),
+        "audio_preprocess": preprocess_stats.snapshot(),
+        "ml_executor": get_ml_executor().stats(),
+        "user_cache": get_user_cache().stats(),
+        "write_behind": get_write_behind().stats(),
+        "reminders": get_reminder_scheduler().stats(),
+        "voice_connections": voice_manager.stats(),
+        "voice_turns": turn_queue_stats.snapshot(),
+    }
@@ -47,6 +47,24 @@ class VoiceVerifyResponse(BaseModel):
     fallback_required: bool
 
 
+class VoiceIdentifyRequest(BaseModel):
+    audio_base64: str
+    top_k: int = Field(default=5, ge=1, le=100)
+    index: str = Field(default="users", pattern="^(users|fraud)$")
+    approximate: bool = False
+
+
+class SpeakerMatch(BaseModel):
+    speaker_id: str
+    similarity: float
+
+
+class VoiceIdentifyResponse(BaseModel):
+    matches: List[SpeakerMatch]
+    best_match: Optional[str] = None
+    index_size: int
+
+
 class SessionState(BaseModel):
     session_id: str
     user_id: str
@@ -26,6 +26,7 @@ class TransferInitResponse(BaseModel):
     summary: str
     mfa_required: bool
     session_id: str
+    remaining_limit: Optional[float] = None
 
 
 class TransferConfirmRequest(BaseModel):
@@ -33,6 +34,7 @@ class TransferConfirmRequest(BaseModel):
     user_id: Optional[str] = None
     otp: Optional[str] = None
     voice_verified: bool = False
+    idempotency_key: Optional[str] = None
 
 
 class TransferConfirmResponse(BaseModel):
@@ -51,6 +53,7 @@ class TransactionItem(BaseModel):
 
 class TransactionHistoryResponse(BaseModel):
     transactions: List[TransactionItem]
+    next_cursor: Optional[str] = None
 
 
 class LoansResponseItem(BaseModel):
@@ -84,6 +87,7 @@ class ReminderItem(BaseModel):
     schedule_iso: str
     channel: str
     created_at: datetime
+    next_run: Optional[datetime] = None
 
 
 class ReminderListResponse(BaseModel):
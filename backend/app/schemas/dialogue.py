@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from datetime import datetime
 from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel
@@ -9,6 +10,14 @@ class DialogueTurn(BaseModel):
     role: str
     text: str
     confidence: float = 1.0
+    intent: Optional[str] = None
+    timings_ms: Dict[str, float] = {}
+    created_at: Optional[datetime] = None
+
+
+class DialogueTurnPage(BaseModel):
+    turns: List[DialogueTurn]
+    next_cursor: Optional[str] = None
 
 
 class DialogueResponse(BaseModel):
@@ -1,25 +1,26 @@
 from __future__ import annotations
 
-from datetime import datetime, timedelta
-from typing import Dict, Optional
+import functools
+from datetime import datetime
+from typing import Dict, List, Optional
 
 from fastapi import HTTPException, status
 
 from app.config import get_settings
-from app.core.security import generate_otp, token_store
+from app.core.cache import get_user_cache
+from app.core.security import token_store
 from app.db import get_database
-from app.ml import compare_embeddings, extract_embedding
+from app.ml import AudioPayload, UnsupportedAudioError, compare_embeddings, extract_embedding, prepare_audio
+from app.ml.executor import run_in_thread
+from app.ml.speaker_index import get_speaker_index
 from app.schemas.auth import SessionState
 
-OTP_EXPIRY_MINUTES = 5
-
-
 async def login(username: str, password: str) -> Dict:
     database = await get_database()
     user = await database.users.find_one({"username": username})
     if not user or password != "bank-demo":
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
-    otp = generate_otp()
+    otp = await token_store.issue_otp(user["user_id"])
     print(otp)
     state = SessionState(
         session_id=f"session_{user['user_id']}",
@@ -30,58 +31,97 @@ async def login(username: str, password: str) -> Dict:
     )
     await database.sessions.update_one(
         {"user_id": user["user_id"]},
-        {
-            "$set": {
-                "user_id": user["user_id"],
-                "otp": otp,
-                "otp_expires": datetime.utcnow() + timedelta(minutes=OTP_EXPIRY_MINUTES),
-                "state": state.model_dump(),
-            }
-        },
+        {"$set": {"user_id": user["user_id"], "state": state.model_dump()}},
         upsert=True,
     )
     return user
 
 
 async def verify_otp_and_issue_tokens(user_id: str, otp: str) -> tuple[str, str]:
-    database = await get_database()
-    session = await database.sessions.find_one({"user_id": user_id})
-    if (
-        not session
-        or session.get("otp") != otp
-        or session.get("otp_expires") is None
-        or session["otp_expires"] < datetime.utcnow()
-    ):
+    if not await token_store.consume_otp(user_id, otp):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid OTP")
-    access_token, refresh_token = token_store.generate_tokens(user_id)
+    access_token, refresh_token = await token_store.generate_tokens(user_id)
     return access_token, refresh_token
 
 
-async def enroll_voice(user_id: str, audio_base64: str) -> None:
+async def enroll_voice(user_id: str, audio: AudioPayload | str) -> None:
     database = await get_database()
-    user = await database.users.find_one({"user_id": user_id})
+    user = await get_user_cache().get_user(user_id)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-    embedding = extract_embedding(audio_base64)
+    embedding = await _voice_embedding(audio, required=True)
     await database.users.update_one({"user_id": user_id}, {"$set": {"voice_embedding": embedding}})
+    await get_user_cache().invalidate(user_id)
+    get_speaker_index("users").upsert(user_id, embedding)
 
 
-async def verify_voice(user_id: str, audio_base64: str, otp: Optional[str]) -> dict:
-    database = await get_database()
-    user = await database.users.find_one({"user_id": user_id})
+async def verify_voice(
+    user_id: str, audio: AudioPayload | str, otp: Optional[str], consume_otp: bool = True
+) -> dict:
+    """Match ``audio`` against the enrolled voiceprint, falling back to the OTP.
+
+    The OTP fallback redeems the code unless ``consume_otp`` is False, which
+    callers use when a later step (token issuance) consumes it instead.
+    """
+    user = await get_user_cache().get_user(user_id)
     if not user or not user.get("voice_embedding"):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Voice profile missing")
-    new_embedding = extract_embedding(audio_base64)
-    similarity = compare_embeddings(user["voice_embedding"], new_embedding)
+    new_embedding = await _voice_embedding(audio)
+    # Audio without a usable voiceprint can only pass through the OTP.
+    similarity = compare_embeddings(user["voice_embedding"], new_embedding) if new_embedding else 0.0
     settings = get_settings()
     fallback_required = similarity < settings.voice_similarity_threshold or not otp
-    session = await database.sessions.find_one({"user_id": user_id})
-    session_otp = session.get("otp") if session else None
-    if fallback_required and (not otp or otp != session_otp):
-        return {"success": False, "similarity": similarity, "fallback_required": True}
+    if fallback_required:
+        check = token_store.consume_otp if consume_otp else token_store.check_otp
+        if not otp or not await check(user_id, otp):
+            return {"success": False, "similarity": similarity, "fallback_required": True}
     return {"success": True, "similarity": similarity, "fallback_required": fallback_required}
 
 
+async def _voice_embedding(audio: AudioPayload | str, required: bool = False) -> Optional[List[float]]:
+    """Speaker embedding of ``audio``; ``None`` (or 415 when ``required``) if it is not PCM WAV."""
+    prepared = await prepare_audio(audio)
+    try:
+        return await run_in_thread("speaker", extract_embedding, prepared.audio)
+    except UnsupportedAudioError as exc:
+        if required:
+            raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=str(exc)) from exc
+        return None
+
+
+async def load_speaker_indexes() -> dict:
+    """Fill the in-memory speaker indexes from Mongo (enrolled users and fraud voiceprints)."""
+    database = await get_database()
+    users = get_speaker_index("users")
+    cursor = database.users.find(
+        {"voice_embedding": {"$ne": None}}, projection={"_id": 0, "user_id": 1, "voice_embedding": 1}
+    )
+    async for doc in cursor:
+        users.upsert(doc["user_id"], doc["voice_embedding"])
+
+    fraud = get_speaker_index("fraud")
+    cursor = database.fraud_voiceprints.find({}, projection={"_id": 0, "profile_id": 1, "voice_embedding": 1})
+    async for doc in cursor:
+        fraud.upsert(doc["profile_id"], doc["voice_embedding"])
+    return {"users": len(users), "fraud": len(fraud)}
+
+
+async def identify_speaker(
+    audio: AudioPayload | str, top_k: int = 5, index_name: str = "users", approximate: bool = False
+) -> dict:
+    """1:N search: who is this voice, or does it match a known fraudster voiceprint."""
+    probe = await _voice_embedding(audio, required=True)
+    index = get_speaker_index(index_name)
+    matches = await run_in_thread("speaker", functools.partial(index.search, probe, k=top_k, approximate=approximate))
+    settings = get_settings()
+    best_match = matches[0][0] if matches and matches[0][1] >= settings.voice_similarity_threshold else None
+    return {
+        "matches": [{"speaker_id": speaker_id, "similarity": score} for speaker_id, score in matches],
+        "best_match": best_match,
+        "index_size": len(index),
+    }
+
+
 async def upsert_session_state(state: SessionState) -> SessionState:
     database = await get_database()
     await database.sessions.update_one(
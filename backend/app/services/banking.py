@@ -1,11 +1,19 @@
 from __future__ import annotations
 
-from datetime import datetime
-from typing import List
+import base64
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from typing import AsyncIterator, List, Optional, Tuple
 
+from bson import ObjectId
 from fastapi import HTTPException, status
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
 
 from app.config import get_settings
+from app.core.cache import get_user_cache
 from app.db import get_database
 from app.schemas.banking import (
     BalanceResponse,
@@ -19,6 +27,8 @@ from app.schemas.banking import (
     TransferInitRequest,
     TransferInitResponse,
 )
+from app.services.reminders import get_reminder_scheduler, parse_schedule
+from app.services.spend import get_spend_tracker
 
 
 async def get_balance(user_id: str, account_type: str = "savings") -> BalanceResponse:
@@ -39,8 +49,12 @@ async def init_transfer(payload: TransferInitRequest) -> TransferInitResponse:
     user = await database.users.find_one({"user_id": payload.user_id})
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-    if payload.amount > user.get("daily_limit", 0):
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Amount exceeds limit")
+    remaining = await get_spend_tracker().remaining(payload.user_id, user.get("daily_limit", 0))
+    if payload.amount > remaining:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Amount exceeds your remaining daily limit of ₹{remaining:.2f}",
+        )
     mfa_required = payload.amount >= settings.mfa_required_amount
     session_id = f"transfer_{payload.user_id}_{datetime.utcnow().timestamp()}"
     session_payload = {
@@ -55,55 +69,240 @@ async def init_transfer(payload: TransferInitRequest) -> TransferInitResponse:
     )
     if update_result.matched_count == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session missing")
-    summary = f"{payload.amount} to {payload.counterparty} via {payload.channel}"
-    return TransferInitResponse(summary=summary, mfa_required=mfa_required, session_id=session_id)
+    remaining_after = remaining - payload.amount
+    summary = (
+        f"{payload.amount} to {payload.counterparty} via {payload.channel}. "
+        f"Your remaining daily limit after this transfer will be ₹{remaining_after:.2f}."
+    )
+    return TransferInitResponse(
+        summary=summary, mfa_required=mfa_required, session_id=session_id, remaining_limit=remaining_after
+    )
+
 
+async def confirm_transfer(
+    user_id: str,
+    session_id: str,
+    otp: str | None,
+    voice_verified: bool,
+    idempotency_key: Optional[str] = None,
+) -> dict:
+    """Execute a transfer exactly once, in three writes on the happy path.
 
-async def confirm_transfer(user_id: str, session_id: str, otp: str | None, voice_verified: bool) -> dict:
+    The transfer session is claimed (and removed) with a single
+    ``find_one_and_update``, so only one request per session gets further; a
+    replay finds no session and gets the recorded transaction back. The
+    complete ``SUCCESS`` transaction is then inserted under the unique
+    ``(user_id, idempotency_key)`` index (key defaults to the session id), and
+    the debit is a conditional ``$inc`` that only matches while the balance
+    and the remaining daily limit (see ``app/services/spend.py``) cover the
+    amount. When the key is already taken or the debit does not match, the
+    record, the session and the spend reservation are rolled back. If Mongo
+    fails mid-debit the record is marked ``PENDING`` so the outcome can be
+    reconciled instead of retried.
+    """
     database = await get_database()
-    session = await database.sessions.find_one({"user_id": user_id})
-    transfer_session = session.get("transfer_session") if session else None
-    if not transfer_session or transfer_session.get("session_id") != session_id:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Transfer session missing")
-    if transfer_session.get("mfa_required") and not (voice_verified or otp):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="MFA required")
-    payload_dict = transfer_session["payload"]
-    payload = TransferInitRequest(**payload_dict)
-    txn_id = f"txn_{int(datetime.utcnow().timestamp())}"
+    key = idempotency_key or session_id
+    claim_filter: dict = {"user_id": user_id, "transfer_session.session_id": session_id}
+    if not (voice_verified or otp):
+        claim_filter["transfer_session.mfa_required"] = {"$ne": True}
+    session = await database.sessions.find_one_and_update(
+        claim_filter,
+        {"$unset": {"transfer_session": ""}},
+        projection={"_id": 0, "transfer_session": 1},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if session is None:
+        return await _resolve_unclaimed_transfer(database, user_id, session_id, key)
+
+    transfer_session = session["transfer_session"]
+    payload = TransferInitRequest(**transfer_session["payload"])
     txn_doc = {
-        "txn_id": txn_id,
+        "txn_id": new_txn_id(),
         "user_id": user_id,
         "amount": payload.amount,
         "counterparty": payload.counterparty,
         "channel": payload.channel,
         "status": "SUCCESS",
+        "idempotency_key": key,
+        "session_id": session_id,
         "created_at": datetime.utcnow(),
     }
-    await database.transactions.insert_one(txn_doc)
-    await database.users.update_one({"user_id": user_id}, {"$inc": {"balances.savings": -payload.amount}})
-    await database.sessions.update_one({"user_id": user_id}, {"$unset": {"transfer_session": ""}})
+    try:
+        await database.transactions.insert_one(txn_doc)
+    except DuplicateKeyError:
+        await _restore_session(database, user_id, transfer_session)
+        return await _existing_transfer(database, user_id, session_id, key)
+    except PyMongoError:
+        await _restore_session(database, user_id, transfer_session)
+        raise
+
+    tracker = get_spend_tracker()
+    # Reserve the amount in the spend window first so concurrent confirms see
+    # each other; the daily_limit guard is then on the window total.
+    await tracker.record(user_id, payload.amount)
+    spent = await tracker.spent(user_id)
+    try:
+        debit = await database.users.update_one(
+            {
+                "user_id": user_id,
+                "balances.savings": {"$gte": payload.amount},
+                "daily_limit": {"$gte": spent},
+            },
+            {"$inc": {"balances.savings": -payload.amount}},
+        )
+    except PyMongoError:
+        # The debit may or may not have landed: keep the key claimed for reconciliation.
+        await database.transactions.update_one({"txn_id": txn_doc["txn_id"]}, {"$set": {"status": "PENDING"}})
+        raise
+    if debit.modified_count == 0:
+        await tracker.record(user_id, -payload.amount)
+        await database.transactions.delete_one({"txn_id": txn_doc["txn_id"]})
+        await _restore_session(database, user_id, transfer_session)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Insufficient funds or limit exceeded")
+    await get_user_cache().invalidate(user_id)
     return txn_doc
 
 
-async def get_transactions(user_id: str, limit: int = 5) -> TransactionHistoryResponse:
+def new_txn_id() -> str:
+    """Unique, roughly time-ordered transaction id."""
+    return f"txn_{ObjectId()}"
+
+
+async def _restore_session(database, user_id: str, transfer_session: dict) -> None:
+    """Give a claimed session back so a confirm that did not debit can be retried."""
+    await database.sessions.update_one({"user_id": user_id}, {"$set": {"transfer_session": transfer_session}})
+
+
+async def _existing_transfer(database, user_id: str, session_id: str, key: str) -> dict:
+    """The transaction already recorded under ``key``: a replay, or a key reused for another transfer."""
+    existing = await database.transactions.find_one({"user_id": user_id, "idempotency_key": key})
+    if existing is None:
+        # The other attempt rolled back before we could read its record.
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Transfer in progress, retry")
+    if existing.get("session_id") not in (None, session_id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="Idempotency key already used for another transfer"
+        )
+    return existing
+
+
+async def _resolve_unclaimed_transfer(database, user_id: str, session_id: str, key: str) -> dict:
+    """Slow path when the session claim matched nothing: a replay, a missing session or missing MFA."""
+    existing = await database.transactions.find_one({"user_id": user_id, "idempotency_key": key})
+    if existing:
+        return existing
+    session = await database.sessions.find_one(
+        {"user_id": user_id, "transfer_session.session_id": session_id}, projection={"_id": 1}
+    )
+    if session:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="MFA required")
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Transfer session missing")
+
+
+_TRANSACTION_FIELDS = ("txn_id", "amount", "counterparty", "channel", "status", "created_at")
+_TRANSACTION_PROJECTION = {"_id": 0, **{field: 1 for field in _TRANSACTION_FIELDS}}
+# Newest first; txn_id breaks ties between transactions created in the same instant.
+_TRANSACTION_SORT = [("created_at", -1), ("txn_id", -1)]
+
+
+def _transaction_query(
+    user_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    counterparty: Optional[str] = None,
+) -> dict:
+    # PENDING records are in-flight confirms (or ones awaiting reconciliation).
+    query: dict = {"user_id": user_id, "status": {"$ne": "PENDING"}}
+    if start or end:
+        query["created_at"] = {}
+        if start:
+            query["created_at"]["$gte"] = start
+        if end:
+            query["created_at"]["$lt"] = end
+    if counterparty:
+        query["counterparty"] = counterparty
+    return query
+
+
+def _encode_cursor(doc: dict) -> str:
+    raw = json.dumps({"c": doc["created_at"].isoformat(), "t": doc["txn_id"]}).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(data["c"]), str(data["t"])
+    except (ValueError, KeyError, TypeError) as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor") from exc
+
+
+async def get_transactions(
+    user_id: str,
+    limit: int = 5,
+    cursor: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    counterparty: Optional[str] = None,
+) -> TransactionHistoryResponse:
+    """One page of history, newest first; pass ``next_cursor`` back for the next page.
+
+    Keyset pagination on ``(created_at, txn_id)`` so every page is an index
+    range scan regardless of how far back the user has paged.
+    """
     database = await get_database()
-    cursor = (
-        database.transactions.find({"user_id": user_id})
-        .sort("created_at", -1)
-        .limit(limit)
+    query = _transaction_query(user_id, start, end, counterparty)
+    if cursor:
+        created_at, txn_id = _decode_cursor(cursor)
+        query = {
+            "$and": [
+                query,
+                {"$or": [{"created_at": {"$lt": created_at}}, {"created_at": created_at, "txn_id": {"$lt": txn_id}}]},
+            ]
+        }
+    docs = (
+        await database.transactions.find(query, projection=_TRANSACTION_PROJECTION)
+        .sort(_TRANSACTION_SORT)
+        .limit(limit + 1)
+        .to_list(length=limit + 1)
     )
-    items: List[TransactionItem] = [
-        TransactionItem(
-            txn_id=doc["txn_id"],
-            amount=doc["amount"],
-            counterparty=doc["counterparty"],
-            channel=doc["channel"],
-            status=doc["status"],
-            created_at=doc["created_at"],
+    items: List[TransactionItem] = [TransactionItem(**doc) for doc in docs[:limit]]
+    next_cursor = _encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return TransactionHistoryResponse(transactions=items, next_cursor=next_cursor)
+
+
+async def export_transactions(
+    user_id: str,
+    export_format: str = "ndjson",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    counterparty: Optional[str] = None,
+) -> AsyncIterator[str]:
+    """Stream the full (filtered) history as NDJSON or CSV lines straight off the Motor cursor."""
+    database = await get_database()
+    cursor = (
+        database.transactions.find(
+            _transaction_query(user_id, start, end, counterparty), projection=_TRANSACTION_PROJECTION
         )
-        async for doc in cursor
-    ]
-    return TransactionHistoryResponse(transactions=items)
+        .sort(_TRANSACTION_SORT)
+        .batch_size(500)
+    )
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if export_format == "csv":
+        writer.writerow(_TRANSACTION_FIELDS)
+    async for doc in cursor:
+        doc["created_at"] = doc["created_at"].isoformat()
+        if export_format == "csv":
+            writer.writerow([doc.get(field) for field in _TRANSACTION_FIELDS])
+        else:
+            buffer.write(json.dumps(doc) + "\n")
+        if buffer.tell() >= 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
 
 
 async def get_loans(user_id: str) -> LoansResponse:
@@ -124,88 +323,70 @@ async def get_loans(user_id: str) -> LoansResponse:
 
 
 async def create_reminder(user_id: str, title: str, schedule_iso: str, channel: str) -> ReminderResponse:
+    try:
+        next_run = parse_schedule(schedule_iso)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid schedule_iso") from exc
     database = await get_database()
-    reminder_id = f"rem_{int(datetime.utcnow().timestamp())}"
+    reminder_id = f"rem_{ObjectId()}"
     reminder_doc = {
         "reminder_id": reminder_id,
         "user_id": user_id,
         "title": title,
         "schedule_iso": schedule_iso,
+        "next_run": next_run,
         "channel": channel,
         "created_at": datetime.utcnow(),
     }
     await database.reminders.insert_one(reminder_doc)
+    get_reminder_scheduler().schedule(reminder_doc)
     return ReminderResponse(reminder_id=reminder_id, next_run=schedule_iso)
 
 
 async def get_reminders(user_id: str) -> ReminderListResponse:
     database = await get_database()
-    cursor = database.reminders.find({"user_id": user_id}).sort("schedule_iso", 1)
-    reminders: List[ReminderItem] = [
-        ReminderItem(
-            reminder_id=doc["reminder_id"],
-            title=doc["title"],
-            schedule_iso=doc["schedule_iso"],
-            channel=doc["channel"],
-            created_at=doc["created_at"],
-        )
-        async for doc in cursor
-    ]
+    cursor = database.reminders.find({"user_id": user_id}).sort("next_run", 1)
+    reminders: List[ReminderItem] = [_reminder_item(doc) async for doc in cursor]
     return ReminderListResponse(reminders=reminders)
 
 
 async def delete_reminder(user_id: str, reminder_id: str) -> None:
     database = await get_database()
-    result = await database.reminders.delete_one({"user_id": user_id, "reminder_id": reminder_id})
-    if result.deleted_count == 0:
+    deleted = await database.reminders.find_one_and_delete(
+        {"user_id": user_id, "reminder_id": reminder_id}, projection={"_id": 1}
+    )
+    if deleted is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Reminder not found")
+    get_reminder_scheduler().cancel(deleted["_id"])
 
 
 async def get_due_reminders(user_id: str) -> dict:
-    """Get reminders that are due now or in the next few minutes (for demo purposes)."""
-    from datetime import timedelta
-    
+    """Get reminders that are due now or in the next few minutes (for demo purposes).
+
+    Connected clients also receive ``reminder_due`` events over ``/ws/voice``
+    from the reminder scheduler, so this is only needed as a fallback.
+    """
     database = await get_database()
     now = datetime.utcnow()
-    # Check reminders due in the next 5 minutes (for demo, we check within 5 minutes)
-    future_time = now + timedelta(minutes=5)
-    
-    cursor = database.reminders.find({"user_id": user_id}).sort("schedule_iso", 1)
-    
-    due_reminders: List[ReminderItem] = []
-    async for doc in cursor:
-        try:
-            # Parse the schedule_iso string to datetime
-            schedule_str = doc["schedule_iso"]
-            # Handle both with and without timezone
-            if schedule_str.endswith("Z"):
-                schedule_str = schedule_str[:-1] + "+00:00"
-            elif "+" not in schedule_str and "Z" not in schedule_str:
-                # Assume UTC if no timezone
-                schedule_str = schedule_str + "+00:00"
-            
-            schedule_time = datetime.fromisoformat(schedule_str)
-            # Convert to naive UTC datetime for comparison
-            if schedule_time.tzinfo:
-                from datetime import timezone
-                schedule_time = schedule_time.astimezone(timezone.utc).replace(tzinfo=None)
-            
-            # Check if reminder is due (within 5 minutes window)
-            if now <= schedule_time <= future_time:
-                due_reminders.append(ReminderItem(
-                    reminder_id=doc["reminder_id"],
-                    title=doc["title"],
-                    schedule_iso=doc["schedule_iso"],
-                    channel=doc["channel"],
-                    created_at=doc["created_at"],
-                ))
-        except Exception as e:
-            print(f"Error parsing reminder schedule: {e}")
-            continue
-    
+    window = timedelta(minutes=get_settings().reminder_due_window_minutes)
+    cursor = database.reminders.find(
+        {"user_id": user_id, "next_run": {"$gte": now, "$lte": now + window}}
+    ).sort("next_run", 1)
+    due_reminders: List[ReminderItem] = [_reminder_item(doc) async for doc in cursor]
     return {"reminders": due_reminders, "count": len(due_reminders)}
 
 
+def _reminder_item(doc: dict) -> ReminderItem:
+    return ReminderItem(
+        reminder_id=doc["reminder_id"],
+        title=doc["title"],
+        schedule_iso=doc["schedule_iso"],
+        channel=doc["channel"],
+        created_at=doc["created_at"],
+        next_run=doc.get("next_run"),
+    )
+
+
 async def get_eligible_offers(user_id: str) -> dict:
     """Get eligible loans and bank offers for the user."""
     database = await get_database()
@@ -1,23 +1,99 @@
 from __future__ import annotations
 
+import asyncio
+import time
 from datetime import datetime
-from typing import Dict
+from typing import Dict, Optional
 
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException, status
+
+from app.config import get_settings
 from app.db import get_database
-from app.ml import infer_intent, synthesize_speech, transcribe_audio
-from app.schemas.auth import SessionState
-from app.schemas.dialogue import DialogueResponse
+from app.ml import AudioPayload, infer_intent, prepare_audio, split_sentences, synthesize_speech, transcribe_audio
+from app.schemas.dialogue import DialogueResponse, DialogueTurn, DialogueTurnPage
+from app.services.write_behind import increment_later, insert_later, update_later
+
+_DEMO_RECIPIENT_UPI = "rajesh@paytm"
+
+# Fixed replies. Kept as constants so the TTS cache can be pre-warmed with them.
+_AMOUNT_FIELD_HELP = "This is the amount field. You can say an amount like 'one thousand rupees' or 'five thousand'. For example, I'll suggest ₹1000 as a demo amount. Please speak your desired amount."
+_RECIPIENT_FIELD_HELP = f"This is the recipient field for UPI ID. You can say a name like 'rajesh' or 'alice'. I'll fill a demo UPI ID: {_DEMO_RECIPIENT_UPI} as an example. Please speak the recipient name or UPI ID."
+_TRANSFER_PROMPT = "I'm ready to help you transfer money. Please tell me the amount and recipient, or use the voice buttons on each field. For example, say 'five thousand rupees' for amount or 'send to John' for recipient."
+_BALANCE_REPLY = "I'm checking your account balance now. One moment please..."
+_HISTORY_REPLY = "I'll fetch your recent transaction history right away. This page shows all your past transactions including transfers, payments, and deposits. You can see the amount, recipient, payment method, and status of each transaction."
+_LOAN_REPLY = "Let me retrieve your current loan details and EMI schedule. This page displays all your active loans including home loans, car loans, and personal loans. You can see the outstanding amount, EMI due, interest rate, and next due date for each loan."
+_REMINDER_REPLY = "I can help you set up a payment reminder. Please tell me what you'd like to be reminded about and when. Reminders help you never miss important payments like credit card bills, loan EMIs, or utility bills."
+_SMALLTALK_REPLY = "I'm here to help with your banking needs. You can transfer money, check your balance, view transactions, manage loans, or set reminders. What would you like to do?"
+
+STATIC_RESPONSES = (
+    _AMOUNT_FIELD_HELP,
+    _RECIPIENT_FIELD_HELP,
+    _TRANSFER_PROMPT,
+    _BALANCE_REPLY,
+    _HISTORY_REPLY,
+    _LOAN_REPLY,
+    _REMINDER_REPLY,
+    _SMALLTALK_REPLY,
+)
+
+
+async def prewarm_tts_cache(languages: tuple[str, ...] = ("en",)) -> int:
+    """Render every static reply through TTS so the cache serves them from the first turn.
+
+    Each reply is cached whole (``synthesize_speech``) and sentence by
+    sentence, which is how ``stream_speech`` looks audio up.
+    """
+    texts = dict.fromkeys(
+        [*STATIC_RESPONSES, *(sentence for text in STATIC_RESPONSES for sentence in split_sentences(text))]
+    )
+    tasks = [synthesize_speech(text, language) for language in languages for text in texts]
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return len(tasks)
+
+
+async def process_voice_turn(
+    user_id: str,
+    audio: AudioPayload | str,
+    language: str = "en",
+    context: str | None = None,
+    synthesize: bool = True,
+) -> Dict:
+    prepared = await prepare_audio(audio)
+    started = time.perf_counter()
+    stt_result = await transcribe_audio(prepared.audio, language)
+    timings = {
+        "preprocess": round(prepared.elapsed_ms, 3),
+        "stt": round((time.perf_counter() - started) * 1000, 3),
+    }
+    result = await process_transcript(
+        user_id, stt_result["transcript"], language, context, synthesize, timings=timings
+    )
+    result["audio"] = prepared.summary()
+    return result
+
 
+async def process_transcript(
+    user_id: str,
+    transcript: str,
+    language: str = "en",
+    context: str | None = None,
+    synthesize: bool = True,
+    timings: Optional[Dict[str, float]] = None,
+) -> Dict:
+    """Run NLU, response generation and TTS for an already transcribed utterance.
 
-async def process_voice_turn(user_id: str, audio_base64: str, language: str = "en", context: str | None = None) -> Dict:
-    stt_result = transcribe_audio(audio_base64, language)
-    transcript = stt_result["transcript"]
+    With ``synthesize=False`` the ``tts`` field is ``None`` and the caller is
+    expected to stream the reply audio itself (see ``stream_speech``).
+    ``timings`` carries upstream stage durations (ms) into the turn record.
+    """
     print(f"[DIALOGUE] Context: {context}, Transcript: {transcript}")
     
     # If context is provided for field-specific queries, provide immediate field explanations
     if context == "amount":
-        response_text = "This is the amount field. You can say an amount like 'one thousand rupees' or 'five thousand'. For example, I'll suggest ₹1000 as a demo amount. Please speak your desired amount."
-        tts = synthesize_speech(response_text, language)
+        response_text = _AMOUNT_FIELD_HELP
+        tts = await synthesize_speech(response_text, language) if synthesize else None
         return {
             "transcript": transcript,
             "intent": "transfer",
@@ -33,9 +109,9 @@ async def process_voice_turn(user_id: str, audio_base64: str, language: str = "e
         }
     elif context == "recipient":
         # Auto-fill demo UPI ID for recipient field
-        demo_upi = "rajesh@paytm"
-        response_text = f"This is the recipient field for UPI ID. You can say a name like 'rajesh' or 'alice'. I'll fill a demo UPI ID: {demo_upi} as an example. Please speak the recipient name or UPI ID."
-        tts = synthesize_speech(response_text, language)
+        demo_upi = _DEMO_RECIPIENT_UPI
+        response_text = _RECIPIENT_FIELD_HELP
+        tts = await synthesize_speech(response_text, language) if synthesize else None
         return {
             "transcript": transcript,
             "intent": "transfer",
@@ -50,7 +126,10 @@ async def process_voice_turn(user_id: str, audio_base64: str, language: str = "e
             "confidence": 1.0,
         }
     
-    nlu = infer_intent(transcript)
+    timings = dict(timings or {})
+    started = time.perf_counter()
+    nlu = await infer_intent(transcript)
+    timings["nlu"] = round((time.perf_counter() - started) * 1000, 3)
     
     # Handle new NLU format with confidence scores
     intent = nlu.get("intent", "smalltalk")
@@ -59,8 +138,11 @@ async def process_voice_turn(user_id: str, audio_base64: str, language: str = "e
     
     next_action = _decide_action(intent)
     response_text = _generate_response({"intent": intent, "slots": slots}, next_action, context)
-    tts = synthesize_speech(response_text, language)
-    await _append_trace(user_id, transcript, response_text)
+    started = time.perf_counter()
+    tts = await synthesize_speech(response_text, language) if synthesize else None
+    if synthesize:
+        timings["tts"] = round((time.perf_counter() - started) * 1000, 3)
+    await _append_trace(user_id, transcript, response_text, intent, confidence, timings)
     dialogue = DialogueResponse(
         text=response_text,
         next_action=next_action,
@@ -129,26 +211,26 @@ def _generate_response(nlu: Dict, action: str, context: str | None = None) -> st
             demo_upi = demo_upi_ids.get(counterparty_lower, "demo@paytm")
             return f"Got it! I'll help you send money to {counterparty}. For the recipient field, I've filled a demo UPI ID: {demo_upi}. Please fill a similar UPI ID for {counterparty} (like {counterparty_lower}@paytm or {counterparty_lower}@phonepe). Now, please tell me the amount you want to transfer, or click the voice button on the amount field."
         else:
-            return "I'm ready to help you transfer money. Please tell me the amount and recipient, or use the voice buttons on each field. For example, say 'five thousand rupees' for amount or 'send to John' for recipient."
+            return _TRANSFER_PROMPT
     
     # Balance intent
     if intent == "balance":
-        return "I'm checking your account balance now. One moment please..."
+        return _BALANCE_REPLY
     
     # History intent
     if intent == "history":
-        return "I'll fetch your recent transaction history right away. This page shows all your past transactions including transfers, payments, and deposits. You can see the amount, recipient, payment method, and status of each transaction."
+        return _HISTORY_REPLY
     
     # Loan intent
     if intent == "loan":
-        return "Let me retrieve your current loan details and EMI schedule. This page displays all your active loans including home loans, car loans, and personal loans. You can see the outstanding amount, EMI due, interest rate, and next due date for each loan."
+        return _LOAN_REPLY
     
     # Reminder intent
     if intent == "reminder":
-        return "I can help you set up a payment reminder. Please tell me what you'd like to be reminded about and when. Reminders help you never miss important payments like credit card bills, loan EMIs, or utility bills."
+        return _REMINDER_REPLY
     
     # Default smalltalk
-    return "I'm here to help with your banking needs. You can transfer money, check your balance, view transactions, manage loans, or set reminders. What would you like to do?"
+    return _SMALLTALK_REPLY
 
 
 def _route_for_intent(intent: str) -> str:
@@ -171,25 +253,77 @@ def _suggestions_for_intent(intent: str) -> list[str]:
     }.get(intent, ["Transfer money", "Check balance"])
 
 
-async def _append_trace(user_id: str, user_utterance: str, assistant_reply: str) -> None:
+async def get_dialogue_turns(user_id: str, limit: int = 20, cursor: Optional[str] = None) -> DialogueTurnPage:
+    """Newest-first page of structured turns; pass ``next_cursor`` back to continue."""
     database = await get_database()
-    session_doc = await database.sessions.find_one({"user_id": user_id})
-    if session_doc and session_doc.get("state"):
-        session = SessionState(**session_doc["state"])
-    else:
-        session = SessionState(
-            session_id=f"session_{user_id}",
-            user_id=user_id,
-            route="/",
-            updated_at=datetime.utcnow(),
-            dialog_trace=[],
+    query: Dict = {"user_id": user_id}
+    if cursor:
+        try:
+            query["_id"] = {"$lt": ObjectId(cursor)}
+        except InvalidId as exc:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor") from exc
+    docs = await database.dialog_turns.find(query).sort("_id", -1).limit(limit + 1).to_list(length=limit + 1)
+    next_cursor = str(docs[limit - 1]["_id"]) if len(docs) > limit else None
+    return DialogueTurnPage(turns=[DialogueTurn(**doc) for doc in docs[:limit]], next_cursor=next_cursor)
+
+
+async def _append_trace(
+    user_id: str,
+    user_utterance: str,
+    assistant_reply: str,
+    intent: str,
+    confidence: float,
+    timings: Dict[str, float],
+) -> None:
+    """Queue the turn's trace, audit and metric writes without waiting for Mongo.
+
+    Full structured records go to ``dialog_turns`` (TTL-expired); the session
+    only keeps the last ``dialog_trace_max_entries`` lines via ``$push``/``$slice``,
+    so each write is constant-size and concurrent turns cannot overwrite each other.
+    The write-behind queue flushes all of them as ``bulk_write`` batches.
+    """
+    settings = get_settings()
+    now = datetime.utcnow()
+    for role, text, turn_timings in (("user", user_utterance, {}), ("assistant", assistant_reply, timings)):
+        await insert_later(
+            "dialog_turns",
+            {
+                "user_id": user_id,
+                "role": role,
+                "text": text,
+                "intent": intent,
+                "confidence": confidence,
+                "timings_ms": turn_timings,
+                "created_at": now,
+            },
         )
-    session.dialog_trace.append(f"user:{user_utterance}")
-    session.dialog_trace.append(f"assistant:{assistant_reply}")
-    session.updated_at = datetime.utcnow()
-    await database.sessions.update_one(
+    await update_later(
+        "sessions",
         {"user_id": user_id},
-        {"$set": {"state": session.model_dump()}},
+        {
+            "$push": {
+                "state.dialog_trace": {
+                    "$each": [f"user:{user_utterance}", f"assistant:{assistant_reply}"],
+                    "$slice": -settings.dialog_trace_max_entries,
+                }
+            },
+            "$set": {"state.updated_at": now},
+            "$setOnInsert": {
+                "state.session_id": f"session_{user_id}",
+                "state.user_id": user_id,
+                "state.route": "/",
+            },
+        },
         upsert=True,
     )
-
+    await insert_later(
+        "audit_log",
+        {"user_id": user_id, "event": "dialogue_turn", "intent": intent, "confidence": confidence, "created_at": now},
+    )
+    # Per-minute, per-intent counters; the queue sums the turns of one flush
+    # into one upsert per bucket.
+    await increment_later(
+        "turn_metrics",
+        {"minute": now.replace(second=0, microsecond=0), "intent": intent},
+        {"turns": 1, **{f"total_ms.{stage}": value for stage, value in timings.items()}},
+    )
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from bson import ObjectId
+
+from app.config import get_settings
+from app.db import get_database
+
+Notify = Callable[[str, dict], Awaitable[bool]]
+
+
+def parse_schedule(schedule_iso: str) -> datetime:
+    """Parse an ISO-8601 schedule into a naive UTC datetime (no offset means UTC)."""
+    value = schedule_iso.strip()
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def reminder_event(doc: Dict) -> dict:
+    return {
+        "type": "reminder_due",
+        "reminder_id": doc["reminder_id"],
+        "title": doc["title"],
+        "schedule_iso": doc["schedule_iso"],
+        "channel": doc["channel"],
+        "next_run": doc["next_run"].isoformat(),
+    }
+
+
+class ReminderScheduler:
+    """Pushes reminders to connected users when they fall due.
+
+    Reminders due within ``horizon`` are loaded from Mongo with one range
+    query on the ``next_run`` index and kept in a min-heap; the loop sleeps
+    until the earliest one (or until new reminders are scheduled), claims it
+    by setting ``notified_at`` and fires it through ``notify``. The window is
+    reloaded every ``horizon / 2`` so reminders from other workers are picked
+    up. Every worker runs a scheduler over the same window; the claim is a
+    conditional update, so only one of them fires each reminder.
+
+    Reminders are tracked by their Mongo ``_id``: ``reminder_id`` is only
+    unique per user.
+    """
+
+    def __init__(self, horizon_seconds: float) -> None:
+        self.horizon = timedelta(seconds=horizon_seconds)
+        # (next_run, insertion counter, _id, doc); the counter keeps docs out of comparisons.
+        self._heap: List[Tuple[datetime, int, ObjectId, Dict]] = []
+        self._counter = itertools.count()
+        self._scheduled: Set[ObjectId] = set()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._notify: Optional[Notify] = None
+        self.fired = 0
+        self.delivered = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, notify: Notify) -> None:
+        self._notify = notify
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def schedule(self, doc: Dict) -> None:
+        """Track a newly created (already inserted) reminder if it falls inside the loaded window."""
+        if not self.running or doc["_id"] in self._scheduled:
+            return
+        if doc["next_run"] > datetime.utcnow() + self.horizon:
+            return
+        self._push(doc)
+        self._wakeup.set()
+
+    def cancel(self, reminder_oid: ObjectId) -> None:
+        # The heap entry stays; it is skipped when popped.
+        self._scheduled.discard(reminder_oid)
+
+    def _push(self, doc: Dict) -> None:
+        self._scheduled.add(doc["_id"])
+        heapq.heappush(self._heap, (doc["next_run"], next(self._counter), doc["_id"], doc))
+
+    async def _run(self) -> None:
+        reload_every = self.horizon.total_seconds() / 2
+        loop = asyncio.get_running_loop()
+        next_reload = 0.0
+        while True:
+            try:
+                if loop.time() >= next_reload:
+                    await self._load_window()
+                    next_reload = loop.time() + reload_every
+                await self._fire_due()
+            except Exception as exc:  # pylint: disable=broad-except
+                print(f"[REMINDERS] Scheduler error: {exc}")
+            timeout = next_reload - loop.time()
+            if self._heap:
+                until_next = (self._heap[0][0] - datetime.utcnow()).total_seconds()
+                timeout = min(timeout, until_next)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), max(0.0, timeout))
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _load_window(self) -> None:
+        database = await get_database()
+        now = datetime.utcnow()
+        cursor = database.reminders.find(
+            {"next_run": {"$gte": now - timedelta(minutes=1), "$lte": now + self.horizon}, "notified_at": None}
+        ).sort("next_run", 1)
+        async for doc in cursor:
+            if doc["_id"] not in self._scheduled:
+                self._push(doc)
+
+    async def _fire_due(self) -> None:
+        now = datetime.utcnow()
+        database = None
+        due: List[Dict] = []
+        while self._heap and self._heap[0][0] <= now:
+            _, _, reminder_oid, doc = heapq.heappop(self._heap)
+            if reminder_oid not in self._scheduled:
+                continue
+            self._scheduled.discard(reminder_oid)
+            database = database or await get_database()
+            claimed = await database.reminders.find_one_and_update(
+                {"_id": reminder_oid, "notified_at": None},
+                {"$set": {"notified_at": now}},
+                projection={"_id": 1},
+            )
+            if claimed is None:
+                # Another worker fired it, or it was deleted.
+                continue
+            self.fired += 1
+            due.append(doc)
+        if self._notify is None or not due:
+            return
+        # Notify concurrently so one tick's fan-out publishes share a batch.
+        results = await asyncio.gather(
+            *(self._notify(doc["user_id"], reminder_event(doc)) for doc in due), return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"[REMINDERS] Notify failed: {result}")
+            elif result:
+                self.delivered += 1
+
+    def stats(self) -> Dict:
+        return {
+            "running": self.running,
+            "pending": len(self._scheduled),
+            "fired": self.fired,
+            "delivered": self.delivered,
+        }
+
+
+async def backfill_next_run() -> int:
+    """Give reminders created before ``next_run`` existed a parsed schedule."""
+    database = await get_database()
+    updated = 0
+    async for doc in database.reminders.find({"next_run": {"$exists": False}}):
+        try:
+            next_run = parse_schedule(doc["schedule_iso"])
+        except (KeyError, ValueError) as exc:
+            print(f"Error parsing reminder schedule: {exc}")
+            continue
+        await database.reminders.update_one({"_id": doc["_id"]}, {"$set": {"next_run": next_run}})
+        updated += 1
+    return updated
+
+
+_scheduler: Optional[ReminderScheduler] = None
+
+
+def get_reminder_scheduler() -> ReminderScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = ReminderScheduler(get_settings().reminder_horizon_seconds)
+    return _scheduler
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from app.config import get_settings
+from app.core.redis import get_redis
+from app.db import get_database
+
+_BUCKET_SECONDS = 3600
+
+# Seed one user's hash without losing buckets a worker incremented mid-rebuild:
+# each field keeps the larger of its live and seeded value.
+_SEED_BUCKETS = """
+for i = 2, #ARGV, 2 do
+    local current = tonumber(redis.call('HGET', KEYS[1], ARGV[i]) or '0')
+    if tonumber(ARGV[i + 1]) > current then
+        redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+    end
+end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+
+
+def _bucket(at: Optional[datetime] = None) -> int:
+    seconds = (at - datetime(1970, 1, 1)).total_seconds() if at else time.time()
+    return int(seconds // _BUCKET_SECONDS)
+
+
+class SpendTracker:
+    """Per-user spend over a sliding window of hourly buckets.
+
+    ``spent`` sums at most ``window_hours`` buckets, so the daily-limit check
+    in ``init_transfer`` costs the same no matter how many transactions the
+    user has. ``confirm_transfer`` calls ``record`` after each debit, and
+    ``rebuild`` seeds the buckets from ``transactions`` on a cold start.
+    """
+
+    def __init__(self, window_hours: int) -> None:
+        self.window_hours = window_hours
+
+    async def record(self, user_id: str, amount: float, at: Optional[datetime] = None) -> None:
+        raise NotImplementedError
+
+    async def spent(self, user_id: str) -> float:
+        raise NotImplementedError
+
+    async def remaining(self, user_id: str, daily_limit: float) -> float:
+        return max(0.0, daily_limit - await self.spent(user_id))
+
+    async def rebuild(self) -> int:
+        """Load the current window from Mongo; returns the number of users seeded."""
+        database = await get_database()
+        since = datetime.utcnow() - timedelta(hours=self.window_hours)
+        bucket_ms = _BUCKET_SECONDS * 1000
+        pipeline = [
+            {"$match": {"created_at": {"$gte": since}, "status": "SUCCESS"}},
+            {
+                "$group": {
+                    "_id": {
+                        "user_id": "$user_id",
+                        "bucket": {"$floor": {"$divide": [{"$toLong": "$created_at"}, bucket_ms]}},
+                    },
+                    "total": {"$sum": "$amount"},
+                }
+            },
+        ]
+        totals: Dict[str, Dict[int, float]] = defaultdict(dict)
+        async for doc in database.transactions.aggregate(pipeline):
+            totals[doc["_id"]["user_id"]][int(doc["_id"]["bucket"])] = doc["total"]
+        await self._load(totals)
+        return len(totals)
+
+    async def _load(self, totals: Dict[str, Dict[int, float]]) -> None:
+        raise NotImplementedError
+
+
+class MemorySpendTracker(SpendTracker):
+    def __init__(self, window_hours: int) -> None:
+        super().__init__(window_hours)
+        self._buckets: Dict[str, Dict[int, float]] = {}
+
+    async def record(self, user_id: str, amount: float, at: Optional[datetime] = None) -> None:
+        buckets = self._buckets.setdefault(user_id, {})
+        bucket = _bucket(at)
+        buckets[bucket] = buckets.get(bucket, 0.0) + amount
+        self._prune(buckets, bucket)
+
+    async def spent(self, user_id: str) -> float:
+        buckets = self._buckets.get(user_id)
+        if not buckets:
+            return 0.0
+        self._prune(buckets, _bucket())
+        return sum(buckets.values())
+
+    async def _load(self, totals: Dict[str, Dict[int, float]]) -> None:
+        self._buckets = {user_id: dict(buckets) for user_id, buckets in totals.items()}
+
+    def _prune(self, buckets: Dict[int, float], current: int) -> None:
+        oldest = current - self.window_hours + 1
+        for bucket in [bucket for bucket in buckets if bucket < oldest]:
+            del buckets[bucket]
+
+
+class RedisSpendTracker(SpendTracker):
+    """Shared across workers: one hash per user, field per bucket, ``HINCRBYFLOAT`` updates."""
+
+    _REBUILT_KEY = "spend:rebuilt"
+
+    def __init__(self, window_hours: int) -> None:
+        super().__init__(window_hours)
+        self._seed_buckets = None
+
+    async def record(self, user_id: str, amount: float, at: Optional[datetime] = None) -> None:
+        redis = self._redis()
+        key = f"spend:{user_id}"
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.hincrbyfloat(key, str(_bucket(at)), amount)
+            pipe.expire(key, (self.window_hours + 1) * _BUCKET_SECONDS)
+            await pipe.execute()
+
+    async def spent(self, user_id: str) -> float:
+        oldest = _bucket() - self.window_hours + 1
+        values = await self._redis().hgetall(f"spend:{user_id}")
+        return sum(float(amount) for bucket, amount in values.items() if int(bucket) >= oldest)
+
+    async def rebuild(self) -> int:
+        # Only the first worker to start after the counters expired seeds them.
+        if not await self._redis().set(self._REBUILT_KEY, "1", nx=True, ex=self.window_hours * _BUCKET_SECONDS):
+            return 0
+        return await super().rebuild()
+
+    async def _load(self, totals: Dict[str, Dict[int, float]]) -> None:
+        if self._seed_buckets is None:
+            self._seed_buckets = self._redis().register_script(_SEED_BUCKETS)
+        ttl = (self.window_hours + 1) * _BUCKET_SECONDS
+        for user_id, buckets in totals.items():
+            args = [ttl]
+            for bucket, amount in buckets.items():
+                args.extend((str(bucket), amount))
+            await self._seed_buckets(keys=[f"spend:{user_id}"], args=args)
+
+    def _redis(self):
+        client = get_redis()
+        if client is None:
+            raise RuntimeError("SPEND_TRACKER_BACKEND=redis requires REDIS_URL")
+        return client
+
+
+_tracker: Optional[SpendTracker] = None
+
+
+def get_spend_tracker() -> SpendTracker:
+    global _tracker
+    if _tracker is None:
+        settings = get_settings()
+        if settings.spend_tracker_backend == "redis":
+            _tracker = RedisSpendTracker(settings.spend_window_hours)
+        elif settings.web_concurrency > 1:
+            # Per-process counters would let each worker spend the full daily limit.
+            raise RuntimeError("SPEND_TRACKER_BACKEND=memory is per process; use redis when WEB_CONCURRENCY > 1")
+        else:
+            _tracker = MemorySpendTracker(settings.spend_window_hours)
+    return _tracker
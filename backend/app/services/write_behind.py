@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import InsertOne, UpdateOne
+
+from app.config import get_settings
+from app.db import get_database
+
+WriteOp = Tuple[str, object]  # (collection name, pymongo write model or Increment)
+
+
+@dataclass
+class Increment:
+    """A counter ``$inc``; increments to the same document in one batch become one update."""
+
+    filter: Dict
+    inc: Dict[str, float]
+    upsert: bool = True
+
+
+class WriteBehindQueue:
+    """Buffers fire-and-forget Mongo writes and flushes them as ``bulk_write`` batches.
+
+    A batch is flushed when it reaches ``max_batch`` operations or
+    ``flush_interval`` seconds after its first operation, whichever comes
+    first. The queue is bounded: when it is full, :meth:`enqueue` waits,
+    which pushes back on producers instead of growing memory. Operations are
+    grouped per collection and written in enqueue order, so ``$push`` updates
+    to the same document keep their order. :class:`Increment` operations on
+    the same filter are summed into a single upsert per batch, so they should
+    not be mixed with other writes to that document.
+    """
+
+    def __init__(self, max_batch: int, flush_interval: float, max_queue: int) -> None:
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self._queue: "asyncio.Queue[Optional[WriteOp]]" = asyncio.Queue(maxsize=max_queue)
+        self._task: Optional[asyncio.Task] = None
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.errors = 0
+        self.merged = 0
+        self.backpressure_waits = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Flush everything already queued, then stop the worker."""
+        if not self.running:
+            return
+        try:
+            # The sentinel shares the timeout: with a full queue and a stuck worker, put() never returns.
+            await asyncio.wait_for(self._drain(), timeout)
+        except asyncio.TimeoutError:
+            print(f"[WRITE BEHIND] Drain timed out with {self._queue.qsize()} writes pending")
+            self._task.cancel()
+        self._task = None
+
+    async def _drain(self) -> None:
+        await self._queue.put(None)
+        await self._task
+
+    async def enqueue(self, collection: str, operation: object) -> None:
+        if not self.running:
+            # Nothing to drain us (startup, scripts): write straight through.
+            await self._write([(collection, operation)])
+            return
+        if self._queue.full():
+            self.backpressure_waits += 1
+        await self._queue.put((collection, operation))
+        self.enqueued += 1
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                await self._write(batch)
+            except Exception as exc:  # pylint: disable=broad-except
+                # Dropping one batch beats a dead worker that blocks every producer on a full queue.
+                self.errors += 1
+                print(f"[WRITE BEHIND] Dropped a batch of {len(batch)} writes: {exc}")
+
+    async def _write(self, batch: List[WriteOp]) -> None:
+        grouped = self._group(batch)
+        database = await get_database()
+        for collection, operations in grouped.items():
+            try:
+                await database[collection].bulk_write(operations, ordered=True)
+                self.written += len(operations)
+            except Exception as exc:  # pylint: disable=broad-except
+                self.errors += 1
+                print(f"[WRITE BEHIND] bulk_write to {collection} failed: {exc}")
+        self.batches += 1
+
+    def _group(self, batch: List[WriteOp]) -> Dict[str, List[object]]:
+        """Per-collection write models in enqueue order, with same-filter increments summed."""
+        grouped: Dict[str, List[object]] = {}
+        increments: Dict[Tuple[str, str, bool], Increment] = {}
+        for collection, operation in batch:
+            if isinstance(operation, Increment):
+                key = (collection, json.dumps(operation.filter, sort_keys=True, default=str), operation.upsert)
+                pending = increments.get(key)
+                if pending is not None:
+                    for field, value in operation.inc.items():
+                        pending.inc[field] = pending.inc.get(field, 0) + value
+                    self.merged += 1
+                    continue
+                operation = increments[key] = Increment(operation.filter, dict(operation.inc), operation.upsert)
+            grouped.setdefault(collection, []).append(operation)
+        return {
+            collection: [
+                UpdateOne(op.filter, {"$inc": op.inc}, upsert=op.upsert) if isinstance(op, Increment) else op
+                for op in operations
+            ]
+            for collection, operations in grouped.items()
+        }
+
+    def stats(self) -> Dict:
+        return {
+            "running": self.running,
+            "queue_depth": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "batches": self.batches,
+            "avg_batch": self.written / self.batches if self.batches else 0.0,
+            "errors": self.errors,
+            "merged": self.merged,
+            "backpressure_waits": self.backpressure_waits,
+        }
+
+
+_queue: Optional[WriteBehindQueue] = None
+
+
+def get_write_behind() -> WriteBehindQueue:
+    global _queue
+    if _queue is None:
+        settings = get_settings()
+        _queue = WriteBehindQueue(
+            max_batch=settings.write_behind_max_batch,
+            flush_interval=settings.write_behind_flush_ms / 1000,
+            max_queue=settings.write_behind_max_queue,
+        )
+    return _queue
+
+
+async def insert_later(collection: str, document: Dict) -> None:
+    await get_write_behind().enqueue(collection, InsertOne(document))
+
+
+async def update_later(collection: str, filter_: Dict, update: Dict, upsert: bool = False) -> None:
+    await get_write_behind().enqueue(collection, UpdateOne(filter_, update, upsert=upsert))
+
+
+async def increment_later(collection: str, filter_: Dict, inc: Dict[str, float], upsert: bool = True) -> None:
+    await get_write_behind().enqueue(collection, Increment(filter_, inc, upsert))
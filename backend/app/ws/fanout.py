@@ -0,0 +1,323 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import secrets
+import socket
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.config import get_settings
+from app.core.redis import get_redis
+
+# Called with (user_id, envelope) for every message routed to this worker.
+MessageHandler = Callable[[str, dict], Awaitable[None]]
+
+# (owning worker, user_id, envelope)
+Routed = Tuple[str, str, dict]
+
+
+def new_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(3)}"
+
+
+class FanoutBackend:
+    """Per-worker message channels plus a presence registry (user -> owning worker)."""
+
+    async def start(self, on_message: MessageHandler) -> None:
+        raise NotImplementedError
+
+    async def stop(self) -> None:
+        raise NotImplementedError
+
+    async def publish_many(self, messages: List[Routed]) -> List[int]:
+        """Publish a batch to the owning workers; returns how many received each message."""
+        raise NotImplementedError
+
+    async def refresh_presence(self, user_ids: List[str], worker_id: str, ttl_seconds: float) -> None:
+        raise NotImplementedError
+
+    async def clear_presence(self, user_id: str, worker_id: str) -> None:
+        raise NotImplementedError
+
+    async def presence_many(self, user_ids: List[str]) -> List[Optional[str]]:
+        """Owning worker of each user, ``None`` for users offline everywhere."""
+        raise NotImplementedError
+
+
+class LocalFanoutBackend(FanoutBackend):
+    """In-process stand-in for Redis.
+
+    Several managers sharing one ``LocalHub`` behave like workers sharing a
+    Redis server, which is enough to exercise cross-worker delivery in tests
+    and on a single machine.
+    """
+
+    def __init__(self, worker_id: str, hub: Optional["LocalHub"] = None) -> None:
+        self.worker_id = worker_id
+        self.hub = hub or _default_hub
+        self._on_message: Optional[MessageHandler] = None
+
+    async def start(self, on_message: MessageHandler) -> None:
+        self._on_message = on_message
+        self.hub.workers[self.worker_id] = self
+
+    async def stop(self) -> None:
+        self.hub.workers.pop(self.worker_id, None)
+
+    async def publish_many(self, messages: List[Routed]) -> List[int]:
+        counts = []
+        for worker_id, user_id, envelope in messages:
+            worker = self.hub.workers.get(worker_id)
+            if worker is not None and worker._on_message is not None:
+                await worker._on_message(user_id, envelope)
+            counts.append(1 if worker is not None else 0)
+        return counts
+
+    async def refresh_presence(self, user_ids: List[str], worker_id: str, ttl_seconds: float) -> None:
+        expires_at = time.monotonic() + ttl_seconds
+        for user_id in user_ids:
+            self.hub.presence[user_id] = (worker_id, expires_at)
+
+    async def clear_presence(self, user_id: str, worker_id: str) -> None:
+        entry = self.hub.presence.get(user_id)
+        if entry and entry[0] == worker_id:
+            del self.hub.presence[user_id]
+
+    async def presence_many(self, user_ids: List[str]) -> List[Optional[str]]:
+        now = time.monotonic()
+        owners: List[Optional[str]] = []
+        for user_id in user_ids:
+            entry = self.hub.presence.get(user_id)
+            owners.append(entry[0] if entry is not None and entry[1] >= now else None)
+        return owners
+
+
+class LocalHub:
+    def __init__(self) -> None:
+        self.workers: Dict[str, LocalFanoutBackend] = {}
+        self.presence: Dict[str, Tuple[str, float]] = {}
+
+
+_default_hub = LocalHub()
+
+_COMPARE_AND_DELETE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisFanoutBackend(FanoutBackend):
+    """Redis pub/sub on one ``ws:worker:<id>`` channel per worker; presence keys
+    ``ws:presence:<id>`` with TTL say which worker to publish to."""
+
+    def __init__(self, worker_id: str) -> None:
+        self.worker_id = worker_id
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+        self._on_message: Optional[MessageHandler] = None
+        self._compare_and_delete = None
+
+    async def start(self, on_message: MessageHandler) -> None:
+        self._on_message = on_message
+        self._pubsub = self._redis().pubsub(ignore_subscribe_messages=True)
+        # Subscribing opens the pub/sub connection before the reader polls it.
+        await self._pubsub.subscribe(_worker_channel(self.worker_id))
+        self._reader = asyncio.create_task(self._read())
+
+    async def stop(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+
+    async def publish_many(self, messages: List[Routed]) -> List[int]:
+        async with self._redis().pipeline(transaction=False) as pipe:
+            for worker_id, user_id, envelope in messages:
+                pipe.publish(_worker_channel(worker_id), json.dumps({"user_id": user_id, "envelope": envelope}))
+            return [int(count) for count in await pipe.execute()]
+
+    async def refresh_presence(self, user_ids: List[str], worker_id: str, ttl_seconds: float) -> None:
+        if not user_ids:
+            return
+        async with self._redis().pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                pipe.set(_presence_key(user_id), worker_id, ex=max(1, int(ttl_seconds)))
+            await pipe.execute()
+
+    async def clear_presence(self, user_id: str, worker_id: str) -> None:
+        # Only delete our own key; the user may already be registered on another worker.
+        if self._compare_and_delete is None:
+            self._compare_and_delete = self._redis().register_script(_COMPARE_AND_DELETE)
+        await self._compare_and_delete(keys=[_presence_key(user_id)], args=[worker_id])
+
+    async def presence_many(self, user_ids: List[str]) -> List[Optional[str]]:
+        values = await self._redis().mget([_presence_key(user_id) for user_id in user_ids])
+        return [value.decode() if isinstance(value, bytes) else value for value in values]
+
+    async def _read(self) -> None:
+        while True:
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+                if message is None or message["type"] != "message":
+                    continue
+                routed = json.loads(message["data"])
+                await self._on_message(routed["user_id"], routed["envelope"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:  # pylint: disable=broad-except
+                print(f"[WS FANOUT] Subscriber error: {exc}")
+                await asyncio.sleep(1.0)
+
+    def _redis(self):
+        client = get_redis()
+        if client is None:
+            raise RuntimeError("WS_FANOUT_BACKEND=redis requires REDIS_URL")
+        return client
+
+
+def _worker_channel(worker_id: str) -> str:
+    return f"ws:worker:{worker_id}"
+
+
+def _presence_key(user_id: str) -> str:
+    return f"ws:presence:{user_id}"
+
+
+class Fanout:
+    """Batches cross-worker publishes and keeps this worker's presence fresh.
+
+    :meth:`publish` resolves once its batch has been written; the result says
+    whether the message reached the worker holding the user. Each batch looks
+    up presence once: users offline everywhere are skipped without publishing,
+    the rest go straight to their owner's channel. Batches are flushed every
+    ``flush_interval`` seconds or at ``max_batch`` messages.
+    """
+
+    def __init__(
+        self,
+        backend: FanoutBackend,
+        worker_id: str,
+        presence_ttl: float,
+        flush_interval: float,
+        max_batch: int,
+    ) -> None:
+        self.backend = backend
+        self.worker_id = worker_id
+        self.presence_ttl = presence_ttl
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.local_users: Callable[[], List[str]] = list
+        self._pending: List[Tuple[str, dict, asyncio.Future]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._presence_task: Optional[asyncio.Task] = None
+        self.published = 0
+        self.batches = 0
+        self.delivered_remote = 0
+        self.offline = 0
+        self.undelivered = 0
+
+    async def start(self, on_message: MessageHandler, local_users: Callable[[], List[str]]) -> None:
+        self.local_users = local_users
+        await self.backend.start(on_message)
+        self._presence_task = asyncio.create_task(self._keep_presence())
+
+    async def stop(self) -> None:
+        for task in (self._presence_task, self._flush_task):
+            if task is not None:
+                task.cancel()
+        await self._flush()
+        await self.backend.stop()
+
+    async def register(self, user_id: str) -> None:
+        # Tell whichever worker held this user before to drop its socket, then take over.
+        await self.publish(user_id, {"evict": self.worker_id})
+        await self.backend.refresh_presence([user_id], self.worker_id, self.presence_ttl)
+
+    async def unregister(self, user_id: str) -> None:
+        await self.backend.clear_presence(user_id, self.worker_id)
+
+    async def publish(self, user_id: str, envelope: dict) -> bool:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((user_id, envelope, future))
+        if len(self._pending) >= self.max_batch:
+            await self._flush()
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+        return await future
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.flush_interval)
+        await self._flush()
+
+    async def _flush(self) -> None:
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        results = [False] * len(batch)
+        try:
+            owners = await self.backend.presence_many([user_id for user_id, _, _ in batch])
+            routed = [index for index, owner in enumerate(owners) if owner is not None]
+            self.offline += len(batch) - len(routed)
+            if routed:
+                counts = await self.backend.publish_many(
+                    [(owners[index], batch[index][0], batch[index][1]) for index in routed]
+                )
+                for index, count in zip(routed, counts):
+                    results[index] = count > 0
+                    if count:
+                        self.delivered_remote += 1
+                    else:
+                        self.undelivered += 1
+        except Exception as exc:  # pylint: disable=broad-except
+            print(f"[WS FANOUT] Publish failed: {exc}")
+        self.batches += 1
+        self.published += len(batch)
+        for (_, _, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _keep_presence(self) -> None:
+        while True:
+            await asyncio.sleep(self.presence_ttl / 3)
+            try:
+                await self.backend.refresh_presence(self.local_users(), self.worker_id, self.presence_ttl)
+            except Exception as exc:  # pylint: disable=broad-except
+                print(f"[WS FANOUT] Presence refresh failed: {exc}")
+
+    def stats(self) -> Dict:
+        return {
+            "worker_id": self.worker_id,
+            "published": self.published,
+            "batches": self.batches,
+            "avg_batch": self.published / self.batches if self.batches else 0.0,
+            "delivered_remote": self.delivered_remote,
+            "offline": self.offline,
+            "undelivered": self.undelivered,
+        }
+
+
+def create_fanout() -> Optional[Fanout]:
+    """Fanout for ``ws_fanout_backend`` ("redis" or "local"); ``None`` keeps delivery process-local."""
+    settings = get_settings()
+    worker_id = new_worker_id()
+    if settings.ws_fanout_backend == "redis":
+        backend: FanoutBackend = RedisFanoutBackend(worker_id)
+    elif settings.ws_fanout_backend == "local":
+        backend = LocalFanoutBackend(worker_id)
+    else:
+        return None
+    return Fanout(
+        backend,
+        worker_id,
+        presence_ttl=settings.ws_presence_ttl_seconds,
+        flush_interval=settings.ws_fanout_flush_ms / 1000,
+        max_batch=settings.ws_fanout_max_batch,
+    )
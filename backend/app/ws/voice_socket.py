@@ -1,57 +1,613 @@
 from __future__ import annotations
 
-from typing import Dict
+import asyncio
+import base64
+import functools
+import json
+import struct
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple, Union
 
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
 
-from app.core.security import get_user_from_token
+from app.config import get_settings
+from app.core.security import authenticate_token
+from app.ml import AudioPayload, StreamingTranscription, stream_speech
 from app.services import dialogue as dialogue_service
+from app.ws.fanout import Fanout, create_fanout
 
 
 router = APIRouter()
 
 
 class VoiceConnectionManager:
-    def __init__(self) -> None:
+    """Authenticated voice sockets, one per user.
+
+    A new connection for a user evicts the previous one. Once
+    ``max_connections`` sockets are open, further handshakes are refused.
+
+    With a :class:`~app.ws.fanout.Fanout`, the manager also registers each
+    user's presence, so :meth:`send` reaches the user on whichever worker
+    holds the socket and a connection on one worker evicts the user's socket
+    on another. Unregistering runs in the background after a disconnect; a
+    reconnect of the same user waits for it so it cannot clear the new
+    registration.
+    """
+
+    def __init__(self, max_connections: int, fanout: Optional[Fanout] = None) -> None:
+        self.max_connections = max_connections
+        self.fanout = fanout
         self.connections: Dict[str, WebSocket] = {}
+        self._unregistering: Dict[str, asyncio.Task] = {}
+        self.evicted = 0
+        self.rejected = 0
+
+    async def start(self) -> None:
+        if self.fanout is not None:
+            await self.fanout.start(self._deliver, lambda: list(self.connections))
+
+    async def stop(self) -> None:
+        if self.fanout is not None:
+            await asyncio.gather(*self._unregistering.values(), return_exceptions=True)
+            await self.fanout.stop()
 
-    async def connect(self, user_id: str, websocket: WebSocket) -> None:
-        await websocket.accept()
+    async def connect(self, user_id: str, websocket: WebSocket) -> bool:
+        previous = self.connections.get(user_id)
+        if previous is None and len(self.connections) >= self.max_connections:
+            self.rejected += 1
+            return False
         self.connections[user_id] = websocket
+        if previous is not None and previous is not websocket:
+            self.evicted += 1
+            await _close_quietly(previous, code=4409, reason="Replaced by a newer connection")
+        if self.fanout is not None and previous is None:
+            pending = self._unregistering.get(user_id)
+            if pending is not None:
+                await asyncio.gather(pending, return_exceptions=True)
+            await self.fanout.register(user_id)
+        return True
 
-    def disconnect(self, user_id: str) -> None:
-        self.connections.pop(user_id, None)
+    def disconnect(self, user_id: str, websocket: Optional[WebSocket] = None) -> None:
+        # An evicted socket must not remove the connection that replaced it.
+        if websocket is None or self.connections.get(user_id) is websocket:
+            if self.connections.pop(user_id, None) is not None and self.fanout is not None:
+                task = asyncio.create_task(self._unregister(user_id, self._unregistering.get(user_id)))
+                self._unregistering[user_id] = task
+                task.add_done_callback(functools.partial(self._unregistered, user_id))
 
-    async def send(self, user_id: str, payload: dict) -> None:
+    async def _unregister(self, user_id: str, previous: Optional[asyncio.Task]) -> None:
+        # Unregisters of one user run in order.
+        if previous is not None:
+            await asyncio.gather(previous, return_exceptions=True)
+        try:
+            await self.fanout.unregister(user_id)
+        except Exception as exc:  # pylint: disable=broad-except
+            print(f"[WS FANOUT] Unregister failed for {user_id}: {exc}")
+
+    def _unregistered(self, user_id: str, task: asyncio.Task) -> None:
+        if self._unregistering.get(user_id) is task:
+            del self._unregistering[user_id]
+
+    async def send(self, user_id: str, payload: dict) -> bool:
+        """Send to the user's socket; ``False`` when they are not connected to any worker."""
         websocket = self.connections.get(user_id)
         if websocket:
             await websocket.send_json(payload)
+            return True
+        if self.fanout is None:
+            return False
+        return await self.fanout.publish(user_id, {"payload": payload})
+
+    async def send_bytes(self, user_id: str, data: bytes) -> bool:
+        # Binary TTS frames come from the turn pipeline, which runs next to the socket.
+        websocket = self.connections.get(user_id)
+        if not websocket:
+            return False
+        await websocket.send_bytes(data)
+        return True
+
+    async def _deliver(self, user_id: str, envelope: dict) -> None:
+        websocket = self.connections.get(user_id)
+        if websocket is None:
+            return
+        if "evict" in envelope:
+            if envelope["evict"] != self.fanout.worker_id:
+                self.evicted += 1
+                self.disconnect(user_id, websocket)
+                await _close_quietly(websocket, code=4409, reason="Replaced by a newer connection")
+            return
+        try:
+            await websocket.send_json(envelope["payload"])
+        except (RuntimeError, WebSocketDisconnect):
+            self.disconnect(user_id, websocket)
+
+    def stats(self) -> Dict:
+        stats = {
+            "connections": len(self.connections),
+            "max_connections": self.max_connections,
+            "evicted": self.evicted,
+            "rejected": self.rejected,
+        }
+        if self.fanout is not None:
+            stats["fanout"] = self.fanout.stats()
+        return stats
+
+
+async def _close_quietly(websocket: WebSocket, code: int, reason: str = "") -> None:
+    try:
+        await websocket.close(code=code, reason=reason)
+    except RuntimeError:
+        # Already closed by the peer.
+        pass
+
+
+manager = VoiceConnectionManager(get_settings().ws_max_connections, create_fanout())
+
+
+class AudioStream:
+    """Per-connection state for a chunked utterance.
+
+    Partial transcripts are produced in a background task so chunk ingestion
+    never waits on STT; at most one partial is in flight at a time.
+    """
 
+    def __init__(
+        self,
+        user_id: str,
+        language: str,
+        context: Optional[str],
+        tts_stream: bool = False,
+        binary: bool = False,
+    ) -> None:
+        self.user_id = user_id
+        self.context = context
+        # Binary clients always get the reply as streamed binary TTS frames.
+        self.binary = binary
+        self.tts_stream = tts_stream or binary
+        self.transcription = StreamingTranscription(language)
+        self._partial_task: Optional[asyncio.Task] = None
+        # Set once the utterance is rejected; its remaining chunks are ignored.
+        self.error: Optional[str] = None
 
-manager = VoiceConnectionManager()
+    @property
+    def language(self) -> str:
+        return self.transcription.language
+
+    def feed(self, chunk: bytes) -> None:
+        if self.error is not None:
+            return
+        partial_due = self.transcription.feed(chunk)
+        if partial_due and (self._partial_task is None or self._partial_task.done()):
+            self._partial_task = asyncio.create_task(self._emit_partial())
+
+    async def _emit_partial(self) -> None:
+        result = await self.transcription.partial()
+        await manager.send(
+            self.user_id,
+            {
+                "type": "partial_transcript",
+                "transcript": result["transcript"],
+                "confidence": result["confidence"],
+                "bytes_received": result["bytes_received"],
+            },
+        )
+
+    def cancel(self) -> None:
+        if self._partial_task and not self._partial_task.done():
+            self._partial_task.cancel()
+
+    def reject(self, detail: str) -> None:
+        self.cancel()
+        self.error = detail
+        self.transcription.discard()
+
+    async def finish(self) -> Dict:
+        self.cancel()
+        return await self.transcription.finalize()
+
+
+# Binary TTS frames: big-endian (segment, seq) header followed by the audio bytes.
+TTS_FRAME_HEADER = struct.Struct(">II")
+
+
+async def _feed_audio(
+    user_id: str, payload: dict, streams: Dict[str, AudioStream], chunk: Optional[bytes] = None
+) -> Optional[AudioStream]:
+    """Feed one piece of a streamed utterance; returns the stream once it is ``final``/``audio_end``.
+
+    ``payload`` is the JSON message (``audio_chunk``, ``audio_start`` or
+    ``audio_end``); for a binary frame it is empty and the raw audio comes in
+    ``chunk``. An ``audio_start`` envelope or a binary frame opens a binary stream.
+    A chunk that cannot be decoded or takes the utterance past
+    ``stt_stream_max_bytes`` rejects the utterance with a ``stream_error``
+    event; the rest of it is ignored and no turn runs for it.
+    """
+    stream = streams.get(user_id)
+    if stream is None:
+        stream = AudioStream(
+            user_id,
+            payload.get("language", "en"),
+            payload.get("context"),
+            bool(payload.get("tts_stream")),
+            binary=chunk is not None or payload.get("type") == "audio_start",
+        )
+        streams[user_id] = stream
+
+    try:
+        if chunk:
+            stream.feed(chunk)
+        chunk_b64 = payload.get("audio_base64")
+        if chunk_b64:
+            stream.feed(AudioPayload.from_base64(chunk_b64).data)
+    except ValueError as exc:
+        stream.reject(str(exc))
+        await manager.send(user_id, {"type": "stream_error", "detail": str(exc)})
+
+    if not payload.get("final") and payload.get("type") != "audio_end":
+        return None
+    streams.pop(user_id)
+    return stream if stream.error is None else None
+
+
+async def _run_stream_turn(user_id: str, stream: AudioStream) -> Dict:
+    """Final STT for a streamed utterance, then NLU and the turn response (TTS is left to the caller)."""
+    stt_result = await stream.finish()
+    await manager.send(
+        user_id,
+        {
+            "type": "final_transcript",
+            "transcript": stt_result["transcript"],
+            "confidence": stt_result["confidence"],
+            "bytes_received": stt_result["bytes_received"],
+        },
+    )
+    return await dialogue_service.process_transcript(
+        user_id=user_id,
+        transcript=stt_result["transcript"],
+        language=stream.language,
+        context=stream.context,
+        synthesize=not stream.tts_stream,
+    )
+
+
+async def _stream_tts(user_id: str, text: str, language: str, binary: bool = False) -> None:
+    """Stream reply audio; in binary mode each chunk is one binary frame prefixed
+    with :data:`TTS_FRAME_HEADER`, otherwise a base64 ``tts_chunk`` event."""
+    seq = 0
+    async for segment, chunk in stream_speech(text, language):
+        if binary:
+            await manager.send_bytes(user_id, TTS_FRAME_HEADER.pack(segment, seq) + chunk)
+        else:
+            await manager.send(
+                user_id,
+                {
+                    "type": "tts_chunk",
+                    "segment": segment,
+                    "seq": seq,
+                    "audio_base64": base64.b64encode(chunk).decode(),
+                },
+            )
+        seq += 1
+    await manager.send(user_id, {"type": "tts_end", "chunks": seq})
+
+
+class TurnQueueStats:
+    def __init__(self) -> None:
+        self.enqueued = 0
+        self.completed = 0
+        self.dropped = 0
+        self.cancelled = 0
+        self.barge_ins = 0
+        self.max_depth = 0
+        self.pipelines: "set[TurnPipeline]" = set()
+
+    def snapshot(self) -> Dict:
+        return {
+            "active_pipelines": len(self.pipelines),
+            "queue_depth": sum(pipeline.depth for pipeline in self.pipelines),
+            "max_depth": self.max_depth,
+            "enqueued": self.enqueued,
+            "completed": self.completed,
+            "dropped": self.dropped,
+            "cancelled": self.cancelled,
+            "barge_ins": self.barge_ins,
+        }
+
+
+turn_queue_stats = TurnQueueStats()
+
+
+class TurnPipeline:
+    """Per-connection turn worker fed by the socket reader.
+
+    The reader keeps handling frames (control messages, audio chunks) while
+    a turn runs; complete utterances are queued (bounded, ``ws_turn_queue_size``)
+    and one worker task runs them in order, so responses keep their order.
+    A full queue drops the new turn with a ``turn_dropped`` event. ``cancel``
+    aborts the running turn (the cancellation propagates into in-flight
+    STT/NLU/TTS requests) and drops queued ones; ``barge_in`` only stops a
+    turn that is already speaking, so the new utterance is answered sooner.
+    """
+
+    def __init__(self, user_id: str, max_queue: int) -> None:
+        self.user_id = user_id
+        self._queue: "asyncio.Queue[Tuple[Callable[[], Awaitable[Dict]], str, bool, bool]]" = asyncio.Queue(
+            maxsize=max_queue
+        )
+        self._current: Optional[asyncio.Task] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._closing = False
+        self.speaking = False
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        turn_queue_stats.pipelines.add(self)
+        self._worker = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        self._closing = True
+        turn_queue_stats.pipelines.discard(self)
+        self.cancel(drop_pending=True, count=False)
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+
+    async def submit(
+        self, run: Callable[[], Awaitable[Dict]], language: str, tts_stream: bool, binary: bool = False
+    ) -> bool:
+        if self._queue.full():
+            turn_queue_stats.dropped += 1
+            await manager.send(self.user_id, {"type": "turn_dropped", "reason": "queue_full"})
+            return False
+        self._queue.put_nowait((run, language, tts_stream, binary))
+        turn_queue_stats.enqueued += 1
+        turn_queue_stats.max_depth = max(turn_queue_stats.max_depth, self._queue.qsize())
+        return True
+
+    def cancel(self, drop_pending: bool = True, count: bool = True) -> int:
+        dropped = 0
+        if drop_pending:
+            while not self._queue.empty():
+                self._queue.get_nowait()
+                dropped += 1
+        if self._current is not None and not self._current.done():
+            self._current.cancel()
+            dropped += 1
+        if count:
+            turn_queue_stats.cancelled += dropped
+        return dropped
+
+    def barge_in(self) -> bool:
+        """Stop the reply audio of the running turn, if any; queued turns are kept."""
+        if not self.speaking or self._current is None or self._current.done():
+            return False
+        self._current.cancel()
+        turn_queue_stats.barge_ins += 1
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            run, language, tts_stream, binary = await self._queue.get()
+            self._current = asyncio.create_task(self._turn(run, language, tts_stream, binary))
+            try:
+                await self._current
+                turn_queue_stats.completed += 1
+            except asyncio.CancelledError:
+                if self._closing:
+                    raise
+                event = "tts_interrupted" if self.speaking else "turn_cancelled"
+                await manager.send(self.user_id, {"type": event})
+            except Exception as exc:  # pylint: disable=broad-except
+                print(f"[VOICE WS] Turn failed for {self.user_id}: {exc}")
+                await manager.send(self.user_id, {"type": "turn_error", "detail": str(exc)})
+            finally:
+                self.speaking = False
+                self._current = None
+
+    async def _turn(self, run: Callable[[], Awaitable[Dict]], language: str, tts_stream: bool, binary: bool) -> None:
+        response = await run()
+        await manager.send(self.user_id, response)
+        if tts_stream:
+            self.speaking = True
+            await _stream_tts(self.user_id, response["dialogue"]["text"], language, binary)
+
+
+class _SocketAuth:
+    """Identity bound to one socket; the JWT is only decoded again once it expires."""
+
+    def __init__(self, user: Dict, claims: Dict) -> None:
+        self.user = user
+        self.expires_at = float(claims.get("exp", 0))
+
+    @property
+    def user_id(self) -> str:
+        return self.user["user_id"]
+
+    @property
+    def expired(self) -> bool:
+        return time.time() >= self.expires_at
+
+
+async def _authenticate(token: Optional[str]) -> _SocketAuth:
+    user, claims = await authenticate_token(token)
+    return _SocketAuth(user, claims)
+
+
+async def _receive(websocket: WebSocket, last_seen: float) -> Optional[Union[dict, bytes]]:
+    """Next frame (parsed JSON, or raw bytes for a binary frame), or ``None`` after
+    an unanswered heartbeat past the idle timeout.
+
+    Every ``ws_heartbeat_seconds`` of silence the server sends a ``ping``;
+    clients reply with any frame (``{"type": "ping"}`` is answered with ``pong``).
+    """
+    settings = get_settings()
+    while True:
+        try:
+            message = await asyncio.wait_for(websocket.receive(), settings.ws_heartbeat_seconds)
+        except asyncio.TimeoutError:
+            if time.monotonic() - last_seen >= settings.ws_idle_timeout_seconds:
+                return None
+            await websocket.send_json({"type": "ping"})
+            continue
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+        if message.get("bytes") is not None:
+            return message["bytes"]
+        return json.loads(message["text"])
 
 
 @router.websocket("/ws/voice")
-async def voice_websocket(websocket: WebSocket) -> None:
-    user_id = None
+async def voice_websocket(websocket: WebSocket, token: Optional[str] = None) -> None:
+    """Voice channel.
+
+    The connection is authenticated once: with the ``token`` query parameter,
+    or with the first frame (``{"type": "auth", "token"}`` or any message
+    carrying ``token``). The identity is then bound to the socket; frames no
+    longer need a token, and a new one is only required once the access token
+    expires (send ``{"type": "auth", "token"}``, or include ``token`` in the
+    next message).
+
+    Two message shapes are accepted:
+
+    * ``{"audio_base64", "language", "context"}`` – a complete utterance,
+      answered with a single turn response.
+    * ``{"type": "audio_chunk", "audio_base64", "final"}`` – one piece of a
+      streamed utterance. ``partial_transcript`` events are pushed while
+      audio arrives; the chunk flagged ``final`` (or an ``audio_end`` message)
+      triggers a ``final_transcript`` event followed by the turn response.
+      An oversized or undecodable utterance is answered with ``stream_error``
+      and dropped; the socket stays open.
+
+    Either shape may set ``"tts_stream": true``; the turn response then has
+    ``tts: null`` and is followed by ``tts_chunk`` events (one sentence
+    ``segment`` after another) and a closing ``tts_end``.
+
+    Turns run on a per-connection worker (:class:`TurnPipeline`), so frames
+    keep being read while a turn is processed and replies arrive in order.
+    ``{"type": "cancel"}`` aborts the running turn and drops queued ones
+    (answered with ``cancelled``); starting a new utterance while the reply
+    audio is still streaming (or ``{"type": "barge_in"}``) stops that audio
+    with a ``tts_interrupted`` event.
+
+    Binary mode skips base64 entirely: send a ``{"type": "audio_start",
+    "language", "context"}`` envelope (optional), then the audio as binary
+    frames, then ``{"type": "audio_end"}``. The reply audio comes back as
+    binary frames (:data:`TTS_FRAME_HEADER` + audio) between the turn
+    response and ``tts_end``; all other events stay JSON.
+
+    The server may also push ``reminder_due`` events at any time (see
+    ``app/services/reminders.py``), and sends ``ping`` after
+    ``ws_heartbeat_seconds`` of silence; sockets idle for
+    ``ws_idle_timeout_seconds`` are closed.
+    """
+    settings = get_settings()
+    await websocket.accept()
+    pending: Optional[dict] = None
+    try:
+        if not token:
+            pending = await asyncio.wait_for(websocket.receive_json(), settings.ws_auth_timeout_seconds)
+            token = pending.get("token")
+        auth = await _authenticate(token)
+    except (asyncio.TimeoutError, HTTPException, WebSocketDisconnect, ValueError, KeyError):
+        await _close_quietly(websocket, code=4401, reason="Authentication required")
+        return
+
+    user_id = auth.user_id
+    if not await manager.connect(user_id, websocket):
+        await _close_quietly(websocket, code=1013, reason="Too many connections")
+        return
+    await websocket.send_json({"type": "ready", "user_id": user_id})
+    if pending is not None and pending.get("type") == "auth":
+        pending = None
+
+    streams: Dict[str, AudioStream] = {}
+    pipeline = TurnPipeline(user_id, settings.ws_turn_queue_size)
+    pipeline.start()
+    last_seen = time.monotonic()
     try:
         while True:
-            payload = await websocket.receive_json()
-            token = payload.get("token")
-            if not token:
-                await websocket.close(code=4401)
-                return
-            user = await get_user_from_token(token)
-            user_id = user["user_id"]
-            if user_id not in manager.connections:
-                await manager.connect(user_id, websocket)
-            response = await dialogue_service.process_voice_turn(
-                user_id=user_id,
-                audio_base64=payload["audio_base64"],
-                language=payload.get("language", "en"),
+            if pending is not None:
+                payload, pending = pending, None
+            else:
+                payload = await _receive(websocket, last_seen)
+                if payload is None:
+                    await _close_quietly(websocket, code=4408, reason="Idle timeout")
+                    break
+            last_seen = time.monotonic()
+
+            if isinstance(payload, bytes):
+                if auth.expired:
+                    await _close_quietly(websocket, code=4401, reason="Token expired")
+                    break
+                if user_id not in streams:
+                    pipeline.barge_in()
+                await _feed_audio(user_id, {}, streams, chunk=payload)
+                continue
+
+            if auth.expired:
+                try:
+                    auth = await _authenticate(payload.get("token"))
+                except HTTPException:
+                    await _close_quietly(websocket, code=4401, reason="Token expired")
+                    break
+                if auth.user_id != user_id:
+                    await _close_quietly(websocket, code=4403, reason="Token is for another user")
+                    break
+
+            message_type = payload.get("type")
+            if message_type == "ping":
+                await websocket.send_json({"type": "pong"})
+                continue
+            if message_type == "auth":
+                continue
+            if message_type == "cancel":
+                for stream in streams.values():
+                    stream.cancel()
+                streams.clear()
+                await websocket.send_json({"type": "cancelled", "turns": pipeline.cancel()})
+                continue
+            if message_type == "barge_in":
+                pipeline.barge_in()
+                continue
+            if message_type in ("audio_start", "audio_chunk", "audio_end"):
+                if user_id not in streams:
+                    # The user started speaking again: stop the reply that is playing.
+                    pipeline.barge_in()
+                stream = await _feed_audio(user_id, payload, streams)
+                if stream is not None:
+                    await pipeline.submit(
+                        functools.partial(_run_stream_turn, user_id, stream),
+                        stream.language,
+                        stream.tts_stream,
+                        stream.binary,
+                    )
+                continue
+
+            pipeline.barge_in()
+            tts_stream = bool(payload.get("tts_stream"))
+            language = payload.get("language", "en")
+            await pipeline.submit(
+                functools.partial(
+                    dialogue_service.process_voice_turn,
+                    user_id=user_id,
+                    audio=AudioPayload.from_base64(payload["audio_base64"]),
+                    language=language,
+                    context=payload.get("context"),
+                    synthesize=not tts_stream,
+                ),
+                language,
+                tts_stream,
             )
-            await manager.send(user_id, response)
     except WebSocketDisconnect:
-        if user_id:
-            manager.disconnect(user_id)
-
+        pass
+    finally:
+        for stream in streams.values():
+            stream.cancel()
+        await pipeline.close()
+        manager.disconnect(user_id, websocket)
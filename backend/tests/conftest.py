@@ -0,0 +1,11 @@
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from app import db
+
+
+@pytest.fixture
+async def database(monkeypatch):
+    """In-memory Mongo behind ``app.db.get_database``."""
+    monkeypatch.setattr(db, "_client", AsyncMongoMockClient())
+    return await db.get_database()
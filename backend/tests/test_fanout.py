@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from app.ws.fanout import Fanout, LocalFanoutBackend, LocalHub
+from app.ws.voice_socket import VoiceConnectionManager
+
+USER = "user_001"
+
+
+class FakeSocket:
+    def __init__(self):
+        self.sent = []
+        self.closed_with = None
+
+    async def send_json(self, payload):
+        if self.closed_with is not None:
+            raise RuntimeError("socket closed")
+        self.sent.append(payload)
+
+    async def close(self, code=1000, reason=""):
+        self.closed_with = code
+
+
+def _worker(hub, name):
+    fanout = Fanout(LocalFanoutBackend(name, hub), name, presence_ttl=60.0, flush_interval=0.005, max_batch=16)
+    return VoiceConnectionManager(max_connections=10, fanout=fanout)
+
+
+@pytest.fixture
+async def workers():
+    hub = LocalHub()
+    managers = [_worker(hub, "worker_a"), _worker(hub, "worker_b")]
+    for manager in managers:
+        await manager.start()
+    yield managers
+    for manager in managers:
+        await manager.stop()
+
+
+async def test_send_reaches_the_worker_holding_the_socket(workers):
+    holder, other = workers
+    socket = FakeSocket()
+    await holder.connect(USER, socket)
+
+    assert await other.send(USER, {"type": "reminder_due"})
+    assert socket.sent == [{"type": "reminder_due"}]
+    assert other.fanout.stats()["delivered_remote"] == 1
+
+
+async def test_send_to_a_user_offline_everywhere_is_not_published(workers):
+    _, other = workers
+
+    assert not await other.send(USER, {"type": "reminder_due"})
+    assert other.fanout.stats()["offline"] == 1
+    assert other.fanout.stats()["delivered_remote"] == 0
+
+
+async def test_sends_in_one_tick_share_a_batch(workers):
+    holder, other = workers
+    await holder.connect(USER, FakeSocket())
+
+    results = await asyncio.gather(*(other.send(USER, {"n": n}) for n in range(3)))
+
+    assert results == [True, True, True]
+    assert other.fanout.stats()["batches"] == 1
+
+
+async def test_connecting_on_another_worker_evicts_the_old_socket(workers):
+    first, second = workers
+    old, new = FakeSocket(), FakeSocket()
+    await first.connect(USER, old)
+
+    await second.connect(USER, new)
+    await asyncio.sleep(0)
+
+    assert old.closed_with == 4409
+    assert USER not in first.connections
+    assert await first.send(USER, {"type": "ping"})
+    assert new.sent == [{"type": "ping"}]
+
+
+async def test_fast_reconnect_keeps_the_new_presence(workers, monkeypatch):
+    holder, other = workers
+    await holder.connect(USER, FakeSocket())
+    backend = holder.fanout.backend
+    clear_presence = backend.clear_presence
+
+    async def slow_clear_presence(user_id, worker_id):
+        await asyncio.sleep(0.02)
+        await clear_presence(user_id, worker_id)
+
+    monkeypatch.setattr(backend, "clear_presence", slow_clear_presence)
+
+    holder.disconnect(USER)
+    socket = FakeSocket()
+    await holder.connect(USER, socket)
+    await asyncio.sleep(0.05)
+
+    assert await other.send(USER, {"type": "reminder_due"})
+    assert socket.sent == [{"type": "reminder_due"}]
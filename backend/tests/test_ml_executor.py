@@ -0,0 +1,43 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from app.ml.executor import MLExecutor
+
+
+@pytest.fixture
+def executor():
+    executor = MLExecutor(
+        thread_workers=2, process_workers=0, stage_concurrency={"speaker": 1}, default_concurrency=4, max_queue=1
+    )
+    yield executor
+    executor.shutdown()
+
+
+async def test_calls_past_the_queue_limit_are_shed(executor):
+    release = threading.Event()
+    running = asyncio.create_task(executor.run_in_thread("speaker", release.wait))
+    waiting = asyncio.create_task(executor.run_in_thread("speaker", release.wait))
+    await asyncio.sleep(0.05)
+
+    with pytest.raises(HTTPException) as shed:
+        await executor.run_in_thread("speaker", release.wait)
+    release.set()
+    await asyncio.gather(running, waiting)
+
+    assert shed.value.status_code == 503
+    assert shed.value.headers["Retry-After"] == "1"
+    stats = executor.stats()["stages"]["speaker"]
+    assert (stats["shed"], stats["completed"]) == (1, 2)
+
+
+async def test_a_busy_stage_does_not_block_another(executor):
+    release = threading.Event()
+    running = asyncio.create_task(executor.run_in_thread("speaker", release.wait))
+    await asyncio.sleep(0.05)
+
+    assert await executor.run_in_thread("preprocess", sum, [1, 2, 3]) == 6
+    release.set()
+    await running
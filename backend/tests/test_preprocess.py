@@ -0,0 +1,56 @@
+import struct
+
+import numpy as np
+import pytest
+
+from app.ml.preprocess import _encode_wav, parse_wav, preprocess_audio
+
+
+def _wav(samples: np.ndarray, sample_rate: int = 16000) -> bytes:
+    return _encode_wav(samples, sample_rate)
+
+
+def _tone(seconds: float = 0.5, sample_rate: int = 16000) -> np.ndarray:
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    return (0.5 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def test_parse_wav_round_trip():
+    samples, rate = parse_wav(memoryview(_wav(_tone())))
+    assert rate == 16000
+    assert samples.shape == (8000, 1)
+    assert np.allclose(samples[:, 0], _tone(), atol=1e-3)
+
+
+@pytest.mark.parametrize("cut", [12, 16, 20, 24, 30, 36, 40, 43])
+def test_parse_wav_truncated_header_returns_none(cut):
+    assert parse_wav(memoryview(_wav(_tone())[:cut])) is None
+
+
+def test_parse_wav_truncated_data_keeps_whole_frames():
+    data = _wav(_tone())
+    samples, _ = parse_wav(memoryview(data[:44 + 1001]))
+    assert samples.shape == (500, 1)
+
+
+def test_parse_wav_rejects_inconsistent_block_align():
+    data = bytearray(_wav(_tone()))
+    struct.pack_into("<H", data, 32, 3)  # block_align for 16-bit mono must be 2
+    assert parse_wav(memoryview(bytes(data))) is None
+
+
+def test_parse_wav_rejects_chunk_running_past_the_buffer():
+    data = bytearray(_wav(_tone()))
+    struct.pack_into("<I", data, 16, 0xFFFF)  # fmt chunk size
+    assert parse_wav(memoryview(bytes(data))) is None
+
+
+def test_parse_wav_rejects_non_wav():
+    assert parse_wav(memoryview(b"\x1aE\xdf\xa3" + bytes(100))) is None
+
+
+def test_preprocess_passes_truncated_upload_through():
+    data = _wav(_tone())[:30]
+    result = preprocess_audio(data)
+    assert result.skipped
+    assert result.audio.data == data
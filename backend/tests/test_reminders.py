@@ -0,0 +1,129 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services import banking, reminders
+from app.services.reminders import ReminderScheduler
+
+
+class Recorder:
+    def __init__(self):
+        self.sent = []
+
+    async def __call__(self, user_id, event):
+        self.sent.append((user_id, event["reminder_id"]))
+        return True
+
+
+def _reminder(user_id, reminder_id="rem_1", next_run=None):
+    return {
+        "reminder_id": reminder_id,
+        "user_id": user_id,
+        "title": "Pay rent",
+        "schedule_iso": "2024-01-01T00:00:00",
+        "next_run": next_run or datetime.utcnow() - timedelta(seconds=1),
+        "channel": "push",
+        "created_at": datetime.utcnow(),
+    }
+
+
+@pytest.fixture
+async def scheduler(database):
+    scheduler = ReminderScheduler(horizon_seconds=600)
+    recorder = Recorder()
+    scheduler._notify = recorder
+    scheduler.recorder = recorder
+    return scheduler
+
+
+async def test_due_reminder_fires_and_is_marked(database, scheduler):
+    await database.reminders.insert_one(_reminder("user_a"))
+
+    await scheduler._load_window()
+    await scheduler._fire_due()
+
+    assert scheduler.recorder.sent == [("user_a", "rem_1")]
+    assert (await database.reminders.find_one({"user_id": "user_a"}))["notified_at"] is not None
+    # Already notified: a reload does not pick it up again.
+    await scheduler._load_window()
+    assert scheduler.stats()["pending"] == 0
+
+
+async def test_same_reminder_id_for_two_users_at_the_same_time(database, scheduler):
+    next_run = datetime.utcnow() - timedelta(seconds=1)
+    await database.reminders.insert_many([_reminder("user_a", next_run=next_run), _reminder("user_b", next_run=next_run)])
+
+    await scheduler._load_window()
+    assert scheduler.stats()["pending"] == 2
+    await scheduler._fire_due()
+
+    assert sorted(scheduler.recorder.sent) == [("user_a", "rem_1"), ("user_b", "rem_1")]
+
+
+async def test_due_reminders_are_notified_concurrently(database, scheduler):
+    next_run = datetime.utcnow() - timedelta(seconds=1)
+    await database.reminders.insert_many([_reminder(f"user_{i}", next_run=next_run) for i in range(3)])
+    # Every notify waits for the others, so this only finishes if they run together.
+    barrier = asyncio.Barrier(3)
+
+    async def notify(user_id, event):
+        await barrier.wait()
+        return True
+
+    scheduler._notify = notify
+    await scheduler._load_window()
+    await asyncio.wait_for(scheduler._fire_due(), 1.0)
+
+    assert scheduler.stats()["delivered"] == 3
+
+
+async def test_cancel_only_unschedules_the_owners_reminder(database, scheduler, monkeypatch):
+    monkeypatch.setattr(reminders, "_scheduler", scheduler)
+    await database.reminders.insert_many([_reminder("user_a"), _reminder("user_b")])
+    await scheduler._load_window()
+
+    await banking.delete_reminder("user_a", "rem_1")
+    await scheduler._fire_due()
+
+    assert scheduler.recorder.sent == [("user_b", "rem_1")]
+
+
+async def test_each_reminder_fires_on_one_worker_only(database):
+    workers = [ReminderScheduler(horizon_seconds=600) for _ in range(3)]
+    recorder = Recorder()
+    for worker in workers:
+        worker._notify = recorder
+    await database.reminders.insert_one(_reminder("user_a"))
+
+    for worker in workers:
+        await worker._load_window()
+    await asyncio.gather(*(worker._fire_due() for worker in workers))
+
+    assert recorder.sent == [("user_a", "rem_1")]
+    assert sum(worker.fired for worker in workers) == 1
+
+
+async def test_scheduled_reminder_is_pushed_when_due(database, monkeypatch):
+    scheduler = ReminderScheduler(horizon_seconds=600)
+    monkeypatch.setattr(reminders, "_scheduler", scheduler)
+    recorder = Recorder()
+    scheduler.start(recorder)
+    try:
+        await asyncio.sleep(0)
+        due = datetime.utcnow() + timedelta(milliseconds=100)
+        response = await banking.create_reminder("user_a", "Pay rent", due.isoformat(), "push")
+        for _ in range(50):
+            if recorder.sent:
+                break
+            await asyncio.sleep(0.02)
+    finally:
+        await scheduler.stop()
+
+    assert recorder.sent == [("user_a", response.reminder_id)]
+
+
+async def test_reminder_ids_are_unique(database):
+    first = await banking.create_reminder("user_a", "Rent", "2030-01-01T00:00:00", "push")
+    second = await banking.create_reminder("user_b", "Rent", "2030-01-01T00:00:00", "push")
+    assert first.reminder_id != second.reminder_id
@@ -0,0 +1,57 @@
+import threading
+
+import numpy as np
+
+from app.ml.speaker_index import SpeakerIndex
+
+DIM = 16
+
+
+def _vectors(count, seed):
+    return np.random.default_rng(seed).normal(size=(count, DIM)).astype(np.float32)
+
+
+def test_exact_search_returns_the_enrolled_speaker_first():
+    index = SpeakerIndex(dim=DIM, capacity=4)
+    vectors = _vectors(10, seed=1)
+    for i, vector in enumerate(vectors):
+        index.upsert(f"user_{i}", vector)
+
+    matches = index.search(vectors[3], k=3)
+
+    assert matches[0][0] == "user_3"
+    assert len(matches) == 3
+
+
+def test_enrolment_during_threaded_search_is_safe():
+    index = SpeakerIndex(dim=DIM, capacity=8)
+    for i, vector in enumerate(_vectors(100, seed=2)):
+        index.upsert(f"seed_{i}", vector)
+    probes = _vectors(20, seed=3)
+    errors = []
+    done = threading.Event()
+
+    def search():
+        while not done.is_set():
+            for probe in probes:
+                try:
+                    index.search(probe, k=5, approximate=True, nlist=8, nprobe=2)
+                    index.search(probe, k=5)
+                except Exception as exc:  # pylint: disable=broad-except
+                    errors.append(exc)
+                    return
+
+    searchers = [threading.Thread(target=search) for _ in range(2)]
+    for searcher in searchers:
+        searcher.start()
+    try:
+        for i, vector in enumerate(_vectors(3000, seed=4)):
+            index.upsert(f"user_{i}", vector)
+            if i % 3 == 0:
+                index.remove(f"user_{i // 2}")
+    finally:
+        done.set()
+        for searcher in searchers:
+            searcher.join()
+
+    assert errors == []
@@ -0,0 +1,182 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from pymongo import ASCENDING
+from pymongo.errors import AutoReconnect
+
+from app.config import Settings
+from app.services import banking, spend
+from app.services.spend import MemorySpendTracker
+
+USER = "user_001"
+
+
+@pytest.fixture
+async def bank(database, monkeypatch):
+    monkeypatch.setattr(spend, "_tracker", MemorySpendTracker(window_hours=24))
+    await database.transactions.create_index(
+        [("user_id", ASCENDING), ("idempotency_key", ASCENDING)], unique=True
+    )
+    await database.users.insert_one({"user_id": USER, "balances": {"savings": 1000.0}, "daily_limit": 5000.0})
+    await database.sessions.insert_one({"user_id": USER})
+    return database
+
+
+async def _open_session(database, amount, session_id="transfer_1", mfa_required=False):
+    await database.sessions.update_one(
+        {"user_id": USER},
+        {
+            "$set": {
+                "transfer_session": {
+                    "session_id": session_id,
+                    "payload": {"user_id": USER, "amount": amount, "counterparty": "Rahul", "channel": "UPI"},
+                    "mfa_required": mfa_required,
+                }
+            }
+        },
+    )
+
+
+async def _balance(database):
+    return (await database.users.find_one({"user_id": USER}))["balances"]["savings"]
+
+
+async def test_confirm_then_replay_returns_the_same_transaction(bank):
+    await _open_session(bank, 300.0)
+
+    first = await banking.confirm_transfer(USER, "transfer_1", None, False, "key-1")
+    replay = await banking.confirm_transfer(USER, "transfer_1", None, False, "key-1")
+
+    assert first["status"] == "SUCCESS"
+    assert replay["txn_id"] == first["txn_id"]
+    assert replay["status"] == "SUCCESS"
+    assert await _balance(bank) == 700.0
+    assert await bank.transactions.count_documents({"user_id": USER}) == 1
+    assert await spend.get_spend_tracker().spent(USER) == 300.0
+
+
+async def test_confirm_makes_three_writes(bank, monkeypatch):
+    await _open_session(bank, 300.0)
+    collection_type = type(bank.users)
+    writes = []
+    for name in ("insert_one", "update_one", "find_one_and_update", "delete_one"):
+        original = getattr(collection_type, name)
+
+        async def counted(self, *args, _original=original, _name=name, **kwargs):
+            writes.append((self.name, _name))
+            return await _original(self, *args, **kwargs)
+
+        monkeypatch.setattr(collection_type, name, counted)
+
+    await banking.confirm_transfer(USER, "transfer_1", None, False, "key-1")
+
+    assert writes == [
+        ("sessions", "find_one_and_update"),
+        ("transactions", "insert_one"),
+        ("users", "update_one"),
+    ]
+
+
+async def test_concurrent_confirms_debit_once(bank):
+    await _open_session(bank, 300.0)
+
+    results = await asyncio.gather(
+        *(banking.confirm_transfer(USER, "transfer_1", None, False, "key-1") for _ in range(5)),
+        return_exceptions=True,
+    )
+
+    txn_ids = {result["txn_id"] for result in results if isinstance(result, dict)}
+    assert len(txn_ids) == 1
+    assert await _balance(bank) == 700.0
+
+
+async def test_replay_while_in_flight_sees_the_pending_record(bank):
+    await bank.transactions.insert_one(
+        {"txn_id": "txn_pending", "user_id": USER, "status": "PENDING", "idempotency_key": "key-1", "session_id": "transfer_1"}
+    )
+
+    replay = await banking.confirm_transfer(USER, "transfer_1", None, False, "key-1")
+
+    assert replay["txn_id"] == "txn_pending"
+    assert replay["status"] == "PENDING"
+
+
+async def test_key_reused_on_a_new_session_is_rejected_without_debit(bank):
+    await _open_session(bank, 300.0)
+    await banking.confirm_transfer(USER, "transfer_1", None, False, "key-1")
+    await _open_session(bank, 200.0, session_id="transfer_2")
+
+    with pytest.raises(HTTPException) as exc:
+        await banking.confirm_transfer(USER, "transfer_2", None, False, "key-1")
+
+    assert exc.value.status_code == 409
+    assert await _balance(bank) == 700.0
+    assert await spend.get_spend_tracker().spent(USER) == 300.0
+    # The second session is untouched and can still be confirmed with a fresh key.
+    second = await banking.confirm_transfer(USER, "transfer_2", None, False, "key-2")
+    assert second["status"] == "SUCCESS"
+    assert await _balance(bank) == 500.0
+
+
+async def test_insufficient_funds_rolls_everything_back(bank):
+    await _open_session(bank, 5000.0)
+
+    with pytest.raises(HTTPException) as exc:
+        await banking.confirm_transfer(USER, "transfer_1", None, False, "key-1")
+
+    assert exc.value.status_code == 400
+    assert await _balance(bank) == 1000.0
+    assert await spend.get_spend_tracker().spent(USER) == 0.0
+    assert await bank.transactions.count_documents({}) == 0
+    session = await bank.sessions.find_one({"user_id": USER})
+    assert session["transfer_session"]["session_id"] == "transfer_1"
+
+
+async def test_missing_mfa_leaves_no_record(bank):
+    await _open_session(bank, 300.0, mfa_required=True)
+
+    with pytest.raises(HTTPException) as exc:
+        await banking.confirm_transfer(USER, "transfer_1", None, False, "key-1")
+
+    assert exc.value.status_code == 401
+    assert await bank.transactions.count_documents({}) == 0
+    assert (await banking.confirm_transfer(USER, "transfer_1", "123456", False, "key-1"))["status"] == "SUCCESS"
+
+
+async def test_unknown_session_is_404(bank):
+    with pytest.raises(HTTPException) as exc:
+        await banking.confirm_transfer(USER, "transfer_missing", None, False)
+    assert exc.value.status_code == 404
+    assert await bank.transactions.count_documents({}) == 0
+
+
+async def test_failure_during_debit_leaves_a_pending_record(bank, monkeypatch):
+    await _open_session(bank, 300.0)
+    collection_type = type(bank.users)
+    update_one = collection_type.update_one
+    outage = {"active": True}
+
+    async def flaky_update(self, *args, **kwargs):
+        if outage["active"] and self.name == "users":
+            raise AutoReconnect("connection reset")
+        return await update_one(self, *args, **kwargs)
+
+    monkeypatch.setattr(collection_type, "update_one", flaky_update)
+    with pytest.raises(AutoReconnect):
+        await banking.confirm_transfer(USER, "transfer_1", None, False, "key-1")
+    outage["active"] = False
+
+    # Whether the debit landed is unknown, so the key stays claimed and nothing is retried.
+    replay = await banking.confirm_transfer(USER, "transfer_1", None, False, "key-1")
+    assert replay["status"] == "PENDING"
+    assert replay["amount"] == 300.0
+    assert (await banking.get_transactions(USER)).transactions == []
+
+
+def test_memory_spend_tracker_is_refused_with_several_workers(monkeypatch):
+    monkeypatch.setattr(spend, "_tracker", None)
+    monkeypatch.setattr(spend, "get_settings", lambda: Settings(spend_tracker_backend="memory", web_concurrency=4))
+
+    with pytest.raises(RuntimeError):
+        spend.get_spend_tracker()
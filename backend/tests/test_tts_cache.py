@@ -0,0 +1,49 @@
+import asyncio
+import os
+
+from app.ml.tts_cache import CachedAudio, TTSCache
+
+CLIP = CachedAudio(audio=b"\x01" * 100, duration_seconds=1.5)
+
+
+async def test_disk_hit_after_restart(tmp_path):
+    await TTSCache(max_bytes=1000, directory=str(tmp_path)).put("hello", CLIP)
+
+    cache = TTSCache(max_bytes=1000, directory=str(tmp_path))
+
+    assert await cache.get("hello") == CLIP
+    assert cache.stats()["disk_hits"] == 1
+
+
+async def test_unreadable_disk_entry_is_a_miss(tmp_path):
+    cache = TTSCache(max_bytes=1000, directory=str(tmp_path))
+    os.mkdir(cache._path("broken"))
+
+    assert await cache.get("broken") is None
+    assert cache.stats()["misses"] == 1
+
+
+async def test_concurrent_writes_of_one_key_leave_a_whole_file(tmp_path):
+    cache = TTSCache(max_bytes=1000, directory=str(tmp_path))
+    clips = [CachedAudio(audio=bytes([n]) * 5000, duration_seconds=float(n)) for n in range(8)]
+
+    await asyncio.gather(*(asyncio.to_thread(cache._write_disk, "same", clip) for clip in clips))
+
+    assert cache._read_disk("same") in clips
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
+
+
+async def test_disk_tier_prunes_least_recently_used_files(tmp_path):
+    # Each file is 108 bytes (8-byte header); three fit under 90% of the 400-byte cap.
+    cache = TTSCache(max_bytes=0, directory=str(tmp_path), disk_max_bytes=400)
+    for n, key in enumerate(["a", "b", "c"]):
+        await cache.put(key, CLIP)
+        os.utime(cache._path(key), (n, n))
+    os.utime(cache._path("a"), (10, 10))
+
+    await cache.put("d", CLIP)
+
+    assert sorted(name[0] for name in os.listdir(tmp_path)) == ["a", "c", "d"]
+    stats = cache.stats()
+    assert stats["disk_evictions"] == 1
+    assert stats["disk_bytes"] == 3 * 108 <= stats["disk_max_bytes"]
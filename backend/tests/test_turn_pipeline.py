@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from app.ws import voice_socket
+from app.ws.voice_socket import TurnPipeline
+
+USER = "user_001"
+
+
+@pytest.fixture
+async def pipeline(monkeypatch):
+    sent = []
+    speaking = asyncio.Event()
+    hold_tts = asyncio.Event()
+
+    async def send(user_id, payload):
+        sent.append(payload.get("type") or payload["dialogue"]["text"])
+        return True
+
+    async def stream_tts(user_id, text, language, binary=False):
+        speaking.set()
+        await hold_tts.wait()
+        sent.append("tts_end")
+
+    monkeypatch.setattr(voice_socket.manager, "send", send)
+    monkeypatch.setattr(voice_socket, "_stream_tts", stream_tts)
+    pipeline = TurnPipeline(USER, max_queue=2)
+    pipeline.sent = sent
+    pipeline.speaking_event = speaking
+    pipeline.hold_tts = hold_tts
+    pipeline.start()
+    yield pipeline
+    await pipeline.close()
+
+
+def _reply(text, started=None, release=None):
+    async def run():
+        if started is not None:
+            started.set()
+        if release is not None:
+            await release.wait()
+        return {"dialogue": {"text": text}}
+
+    return run
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def test_turns_run_in_order(pipeline):
+    pipeline.hold_tts.set()
+    await pipeline.submit(_reply("first"), "en", tts_stream=False)
+    await pipeline.submit(_reply("second"), "en", tts_stream=False)
+    await _settle()
+
+    assert pipeline.sent == ["first", "second"]
+
+
+async def test_cancel_stops_the_running_turn_and_drops_queued_ones(pipeline):
+    started, release = asyncio.Event(), asyncio.Event()
+    await pipeline.submit(_reply("slow", started, release), "en", tts_stream=False)
+    await started.wait()
+    await pipeline.submit(_reply("queued"), "en", tts_stream=False)
+
+    assert pipeline.cancel() == 2
+    await _settle()
+
+    assert pipeline.sent == ["turn_cancelled"]
+    assert pipeline.depth == 0
+
+
+async def test_full_queue_drops_the_new_turn(pipeline):
+    started, release = asyncio.Event(), asyncio.Event()
+    await pipeline.submit(_reply("slow", started, release), "en", tts_stream=False)
+    await started.wait()
+    assert await pipeline.submit(_reply("a"), "en", tts_stream=False)
+    assert await pipeline.submit(_reply("b"), "en", tts_stream=False)
+
+    assert not await pipeline.submit(_reply("c"), "en", tts_stream=False)
+    assert pipeline.sent == ["turn_dropped"]
+
+
+async def test_barge_in_is_ignored_before_the_reply_speaks(pipeline):
+    started, release = asyncio.Event(), asyncio.Event()
+    await pipeline.submit(_reply("thinking", started, release), "en", tts_stream=True)
+    await started.wait()
+
+    assert not pipeline.barge_in()
+
+
+async def test_barge_in_interrupts_speech_and_keeps_the_queue(pipeline):
+    await pipeline.submit(_reply("long answer"), "en", tts_stream=True)
+    await pipeline.speaking_event.wait()
+    await pipeline.submit(_reply("next question"), "en", tts_stream=False)
+
+    assert pipeline.barge_in()
+    await _settle()
+
+    assert pipeline.sent == ["long answer", "tts_interrupted", "next question"]
@@ -0,0 +1,91 @@
+import asyncio
+from datetime import datetime
+
+from pymongo import InsertOne, UpdateOne
+
+from app.services import write_behind
+from app.services.write_behind import Increment, WriteBehindQueue
+
+
+def test_increments_to_one_document_are_merged():
+    queue = WriteBehindQueue(max_batch=100, flush_interval=0.01, max_queue=100)
+    balance = {"minute": datetime(2024, 1, 1, 12, 0), "intent": "balance"}
+    loan = {"minute": datetime(2024, 1, 1, 12, 0), "intent": "loan"}
+    audit = InsertOne({"event": "dialogue_turn"})
+    batch = [
+        ("turn_metrics", Increment(balance, {"turns": 1, "total_ms.nlu": 2.0})),
+        ("audit_log", audit),
+        ("turn_metrics", Increment(dict(balance), {"turns": 1, "total_ms.nlu": 3.0})),
+        ("turn_metrics", Increment(loan, {"turns": 1})),
+    ]
+
+    grouped = queue._group(batch)
+
+    assert queue.merged == 1
+    assert grouped == {
+        "turn_metrics": [
+            UpdateOne(balance, {"$inc": {"turns": 2, "total_ms.nlu": 5.0}}, upsert=True),
+            UpdateOne(loan, {"$inc": {"turns": 1}}, upsert=True),
+        ],
+        "audit_log": [audit],
+    }
+    # The queued operations themselves are not mutated by the merge.
+    assert batch[0][1].inc == {"turns": 1, "total_ms.nlu": 2.0}
+
+
+class FakeDatabase:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def __getitem__(self, name):
+        return self.collection
+
+
+class RecordingCollection:
+    def __init__(self):
+        self.written = []
+        self.hang = asyncio.Event()
+
+    async def bulk_write(self, operations, ordered=True):
+        if self.hang.is_set():
+            await asyncio.Event().wait()
+        self.written.extend(operations)
+
+
+async def test_worker_survives_a_failed_batch(monkeypatch):
+    collection = RecordingCollection()
+    failures = [RuntimeError("database unavailable")]
+
+    async def get_database():
+        if failures:
+            raise failures.pop()
+        return FakeDatabase(collection)
+
+    monkeypatch.setattr(write_behind, "get_database", get_database)
+    queue = WriteBehindQueue(max_batch=1, flush_interval=0.01, max_queue=10)
+    queue.start()
+    await queue.enqueue("audit_log", InsertOne({"n": 1}))
+    await queue.enqueue("audit_log", InsertOne({"n": 2}))
+    await queue.stop()
+
+    assert queue.errors == 1
+    assert collection.written == [InsertOne({"n": 2})]
+
+
+async def test_stop_gives_up_on_a_stuck_worker_with_a_full_queue(monkeypatch):
+    collection = RecordingCollection()
+    collection.hang.set()
+
+    async def get_database():
+        return FakeDatabase(collection)
+
+    monkeypatch.setattr(write_behind, "get_database", get_database)
+    queue = WriteBehindQueue(max_batch=1, flush_interval=0.01, max_queue=1)
+    queue.start()
+    await queue.enqueue("audit_log", InsertOne({"n": 1}))
+    await asyncio.sleep(0.02)
+    await queue.enqueue("audit_log", InsertOne({"n": 2}))
+
+    await asyncio.wait_for(queue.stop(timeout=0.05), 1.0)
+
+    assert not queue.running